@@ -0,0 +1,625 @@
+#!/usr/bin/env python
+
+"""Benchmark suite of pygenia.
+
+Measures, on the shipped examples and on synthetic populations:
+
+* build time of the agents, through the full build path and through
+  prototype cloning,
+* rational cycles per second of AffectiveAgent.run,
+* cost of an affective turn (appraisal) in DefaultEngine and EmpathicEngine,
+* memory per agent,
+* wall time of the example scenarios,
+* calls and time of each step of the cycles in the example scenarios,
+* run time of the example scenarios while tracing their affective
+  trajectories to compressed chunk files,
+* throughput of a parameter sweep over the example scenarios, run serially
+  and over a process pool,
+* import time of pygenia in a fresh interpreter, checking that a PAD-only
+  agent starts without pandas or scipy.
+
+Everything runs offline. Results are written as JSON so they can be compared
+between releases:
+
+    python benchmarks/run_benchmarks.py --output results.json
+    python benchmarks/run_benchmarks.py --quick
+
+Timings report the minimum and the median of the repetitions.
+"""
+
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import runpy
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import agentspeak  # noqa: E402
+import agentspeak.runtime  # noqa: E402
+import agentspeak.stdlib  # noqa: E402
+import numpy as np  # noqa: E402
+
+import pygenia  # noqa: E402
+import pygenia.affective_agent  # noqa: E402
+import pygenia.cognitive_engine.default_engine  # noqa: E402
+import pygenia.cognitive_engine.empathic_engine  # noqa: E402
+import pygenia.emotion_models.pa  # noqa: E402
+import pygenia.empathic_agent  # noqa: E402
+import pygenia.empathic_environment  # noqa: E402
+import pygenia.environment  # noqa: E402
+import pygenia.sweep  # noqa: E402
+
+EXAMPLES = os.path.join(ROOT, "examples")
+
+# Synthetic agent: a concern on a counter and a goal that updates it until
+# the limit is reached, so every rational cycle also feeds the affective one.
+SYNTHETIC_SOURCE = """
+concern__(X) :- count(N) & N > 0 & X = 0.8 | count(0) & X = 0.2.
+
+count(0).
+
+limit(%(limit)d).
+
+!loop.
+
++!loop : count(N) & limit(L) & N < L
+<-
+    -count(N);
+    M = N + 1;
+    +count(M);
+    !loop.
+
++!loop <- .print_afflb.
+"""
+
+SCENARIOS = {
+    "affect_categories": "affect_categories/env_affect_categories.py",
+    "desirability": "desirability/test.py",
+    "ultimatum_game": "ultimatum_game/environment.py",
+    "prisoner_dilemma": "prisoner_dilemma/environment.py",
+}
+
+
+# Run in a fresh interpreter: imports pygenia, builds and runs a PAD-only
+# agent and reports the times and the heavy modules that were loaded.
+IMPORT_SCRIPT = """
+import json, resource, sys, time
+start = time.perf_counter()
+import agentspeak, agentspeak.stdlib
+import pygenia.affective_agent
+import pygenia.environment
+imported = time.perf_counter()
+env = pygenia.environment.Environment()
+env.build_agents(
+    agentspeak.StringSource("pad", %(source)r),
+    1,
+    agentspeak.stdlib.actions,
+    agent_cls=pygenia.affective_agent.AffectiveAgent,
+)
+env.run()
+ran = time.perf_counter()
+print(json.dumps({
+    "import_seconds": imported - start,
+    "build_and_run_seconds": ran - imported,
+    "max_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "heavy_modules": sorted(
+        name for name in %(heavy)r if name in sys.modules
+    ),
+}))
+"""
+
+HEAVY_MODULES = ("numpy", "pandas", "scipy")
+
+
+def summarize(samples, per=1):
+    """
+    This function is used to summarize the repetitions of a measure
+
+    Args:
+        samples (list): Measured seconds of each repetition
+        per (int): Number of operations of each repetition
+
+    Returns:
+        dict: Minimum and median seconds per operation and the repetitions
+    """
+    return {
+        "min": min(samples) / per,
+        "median": statistics.median(samples) / per,
+        "repeat": len(samples),
+    }
+
+
+def synthetic_source(limit):
+    return agentspeak.StringSource(
+        "synthetic", SYNTHETIC_SOURCE % {"limit": limit}
+    )
+
+
+class CountingAgent(pygenia.affective_agent.AffectiveAgent):
+    """
+    This class is used to count the rational cycles of an affective agent
+    """
+
+    cycles = 0
+
+    def rational_step(self) -> bool:
+        CountingAgent.cycles += 1
+        return super(CountingAgent, self).rational_step()
+
+
+def bench_build(sizes, repeat):
+    """
+    This function is used to measure the build time of synthetic populations
+
+    Returns:
+        dict: Seconds per agent of the full and the cloned build paths
+    """
+    results = {}
+    for size in sizes:
+        full, cloned = [], []
+        for _ in range(repeat):
+            env = pygenia.environment.Environment()
+            start = time.perf_counter()
+            for _ in range(min(size, 200)):
+                env.build_agents(
+                    synthetic_source(10),
+                    1,
+                    agentspeak.stdlib.actions,
+                    pygenia.affective_agent.AffectiveAgent,
+                )
+            full.append((time.perf_counter() - start) / min(size, 200))
+
+            env = pygenia.environment.Environment()
+            start = time.perf_counter()
+            env.build_agents(
+                synthetic_source(10),
+                size,
+                agentspeak.stdlib.actions,
+                pygenia.affective_agent.AffectiveAgent,
+            )
+            cloned.append((time.perf_counter() - start) / size)
+        results[str(size)] = {
+            "full_per_agent": summarize(full),
+            "cloned_per_agent": summarize(cloned),
+        }
+    return results
+
+
+def bench_cycles(sizes, steps, repeat):
+    """
+    This function is used to measure the rational cycles per second of
+    populations running the synthetic agent
+
+    Returns:
+        dict: Cycles per second and cycles of each population size
+    """
+    results = {}
+    for size in sizes:
+        samples = []
+        for _ in range(repeat):
+            env = pygenia.environment.Environment()
+            env.build_agents(
+                synthetic_source(steps), size, agentspeak.stdlib.actions, CountingAgent
+            )
+            CountingAgent.cycles = 0
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                env.run()
+                elapsed = time.perf_counter() - start
+            samples.append((elapsed, CountingAgent.cycles))
+        best = min(samples)
+        results[str(size)] = {
+            "cycles": best[1],
+            "cycles_per_second": best[1] / best[0],
+            "seconds": summarize([elapsed for elapsed, _ in samples]),
+        }
+    return results
+
+
+def bench_default_appraisal(events, repeat):
+    """
+    This function is used to measure an affective turn of DefaultEngine
+
+    Returns:
+        dict: Seconds per appraised belief event
+    """
+    samples = []
+    for _ in range(repeat):
+        env = pygenia.environment.Environment()
+        with open(os.path.join(EXAMPLES, "desirability", "agent1.asl")) as source:
+            agent = env.build_agents(
+                source, 1, agentspeak.stdlib.actions, pygenia.affective_agent.AffectiveAgent
+            )[0]
+        samples.append(time_affective_turns(agent, agentspeak.Literal("me", (1,)), events))
+    return summarize(samples, events)
+
+
+def bench_empathic_appraisal(events, repeat):
+    """
+    This function is used to measure an affective turn of EmpathicEngine
+
+    Returns:
+        dict: Seconds per appraised belief event
+    """
+    samples = []
+    annotations = frozenset(
+        [
+            agentspeak.Literal("subject", (agentspeak.Literal("lily"),)),
+            agentspeak.Literal("target", (agentspeak.Literal("self"),)),
+            agentspeak.Literal("affective_relevant"),
+        ]
+    )
+    belief = agentspeak.Literal("weather", (agentspeak.Literal("sunny"),), annotations)
+    for _ in range(repeat):
+        env = pygenia.empathic_environment.EmpathicEnvironment()
+        with open(
+            os.path.join(EXAMPLES, "affect_categories", "agent1.asl")
+        ) as source:
+            agent = env.build_agents(
+                source,
+                1,
+                agentspeak.stdlib.actions,
+                agent_cls=pygenia.empathic_agent.EmpathicAgent,
+                em_engine_cls=pygenia.cognitive_engine.empathic_engine.EmpathicEngine,
+                affst_cls=pygenia.emotion_models.pa.PAModel,
+            )[0]
+        samples.append(time_affective_turns(agent, belief, events))
+    return summarize(samples, events)
+
+
+def time_affective_turns(agent, belief, events):
+    """
+    This function is used to time the affective turns that appraise belief events
+
+    Only the affective turns are timed: the belief is added and removed
+    between them, and the rational events it creates are discarded.
+
+    Returns:
+        float: Total seconds of the affective turns
+    """
+    elapsed = 0.0
+    with contextlib.redirect_stdout(io.StringIO()):
+        # Discard the initial events of the agent.
+        agent.affective_step()
+        for i in range(events):
+            trigger = (
+                agentspeak.Trigger.addition if i % 2 == 0 else agentspeak.Trigger.removal
+            )
+            agent.call(
+                trigger,
+                agentspeak.GoalType.belief,
+                belief,
+                agentspeak.runtime.Intention(),
+                delayed=True,
+            )
+            agent.circumstance.set_events([])
+            start = time.perf_counter()
+            agent.affective_step()
+            elapsed += time.perf_counter() - start
+    return elapsed
+
+
+def bench_memory(sizes):
+    """
+    This function is used to measure the memory allocated by each agent
+
+    Returns:
+        dict: Bytes per agent of the full and the cloned build paths
+    """
+    results = {}
+    for size in sizes:
+        measures = {}
+        for path, count in (("full", min(size, 200)), ("cloned", size)):
+            env = pygenia.environment.Environment()
+            gc.collect()
+            tracemalloc.start()
+            if path == "full":
+                for _ in range(count):
+                    env.build_agents(
+                        synthetic_source(10),
+                        1,
+                        agentspeak.stdlib.actions,
+                        pygenia.affective_agent.AffectiveAgent,
+                    )
+            else:
+                env.build_agents(
+                    synthetic_source(10),
+                    count,
+                    agentspeak.stdlib.actions,
+                    pygenia.affective_agent.AffectiveAgent,
+                )
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            measures[path + "_bytes_per_agent"] = current / count
+            measures[path + "_peak_bytes_per_agent"] = peak / count
+        results[str(size)] = measures
+    return results
+
+
+def bench_scenarios(names, repeat):
+    """
+    This function is used to measure the shipped example scenarios
+
+    Returns:
+        dict: Build and run seconds of each scenario
+    """
+    results = {}
+    for name in names:
+        build, run = [], []
+        for _ in range(repeat):
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                scenario = runpy.run_path(
+                    os.path.join(EXAMPLES, SCENARIOS[name]), run_name="benchmark"
+                )
+                build.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                scenario["env"].run()
+                run.append(time.perf_counter() - start)
+        results[name] = {"build": summarize(build), "run": summarize(run)}
+    return results
+
+
+def bench_phases(names):
+    """
+    This function is used to profile the steps of the cycles in the example scenarios
+
+    Returns:
+        dict: Calls and seconds of each step of each scenario (see PhaseProfiler)
+    """
+    results = {}
+    for name in names:
+        with contextlib.redirect_stdout(io.StringIO()):
+            scenario = runpy.run_path(
+                os.path.join(EXAMPLES, SCENARIOS[name]), run_name="benchmark"
+            )
+            profiler = scenario["env"].enable_profiling()
+            scenario["env"].run()
+        results[name] = profiler.summary()
+    return results
+
+
+def bench_tracing(names, repeat):
+    """
+    This function is used to measure the example scenarios while their trajectories are traced
+
+    Returns:
+        dict: Run seconds with and without tracing and traced rows of each scenario
+    """
+    results = {}
+    for name in names:
+        plain, traced, rows = [], [], 0
+        for _ in range(repeat):
+            for tracing in (False, True):
+                with contextlib.redirect_stdout(
+                    io.StringIO()
+                ), tempfile.TemporaryDirectory() as path:
+                    scenario = runpy.run_path(
+                        os.path.join(EXAMPLES, SCENARIOS[name]), run_name="benchmark"
+                    )
+                    if tracing:
+                        scenario["env"].enable_tracing(path=path)
+                    start = time.perf_counter()
+                    scenario["env"].run()
+                    if tracing:
+                        rows = scenario["env"].disable_tracing().rows
+                        traced.append(time.perf_counter() - start)
+                    else:
+                        plain.append(time.perf_counter() - start)
+        results[name] = {
+            "run": summarize(plain),
+            "traced_run": summarize(traced),
+            "rows": rows,
+        }
+    return results
+
+
+def bench_sweep(names, runs, repeat):
+    """
+    This function is used to measure a sweep of empathic levels over the example scenarios
+
+    The serial sweep builds and runs each scenario in turn, as a shell loop
+    would. The pooled sweep runs the same runs with a SweepRunner.
+
+    Returns:
+        dict: Seconds of the serial and pooled sweeps and runs per second of each scenario
+    """
+    levels = [index / max(runs - 1, 1) for index in range(runs)]
+    parameters = [{"*": {"empathic_level": level}} for level in levels]
+    results = {}
+    for name in names:
+        serial, pooled = [], []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for run_parameters in parameters:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    scenario = runpy.run_path(
+                        os.path.join(EXAMPLES, SCENARIOS[name]), run_name="benchmark"
+                    )
+                    pygenia.sweep.apply_parameters(scenario["env"], run_parameters)
+                    scenario["env"].run()
+            serial.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                scenario = runpy.run_path(
+                    os.path.join(EXAMPLES, SCENARIOS[name]), run_name="benchmark"
+                )
+                runner = pygenia.sweep.SweepRunner(scenario["env"])
+                failed = [
+                    result for result in runner.run(parameters) if result.error
+                ]
+            if failed:
+                raise RuntimeError("sweep of %s failed: %s" % (name, failed[0].error))
+            pooled.append(time.perf_counter() - start)
+        results[name] = {
+            "runs": runs,
+            "workers": runner.workers,
+            "serial": summarize(serial),
+            "pooled": summarize(pooled),
+            "serial_runs_per_second": runs / min(serial),
+            "pooled_runs_per_second": runs / min(pooled),
+        }
+    return results
+
+
+def bench_imports(repeat):
+    """
+    This function is used to measure the start of a PAD-only agent in fresh interpreters
+
+    Raises:
+        RuntimeError: If the agent loads pandas or scipy
+
+    Returns:
+        dict: Import and build seconds, maximum resident memory and loaded heavy modules
+    """
+    script = IMPORT_SCRIPT % {
+        "source": SYNTHETIC_SOURCE % {"limit": 10},
+        "heavy": HEAVY_MODULES,
+    }
+    env = dict(os.environ, PYTHONPATH=ROOT, PYGENIA_CACHE_DIR="")
+    samples = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", script],
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        samples.append(json.loads(output.splitlines()[-1]))
+
+    heavy_modules = sorted(
+        {name for sample in samples for name in sample["heavy_modules"]}
+    )
+    if heavy_modules:
+        raise RuntimeError("a PAD-only agent imported: %s" % ", ".join(heavy_modules))
+    return {
+        "import": summarize([sample["import_seconds"] for sample in samples]),
+        "build_and_run": summarize(
+            [sample["build_and_run_seconds"] for sample in samples]
+        ),
+        "max_rss_kib": max(sample["max_rss_kib"] for sample in samples),
+        "heavy_modules": heavy_modules,
+    }
+
+
+def metadata():
+    """
+    This function is used to describe the machine and the versions measured
+
+    Returns:
+        dict: Metadata of the results
+    """
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "pygenia": pygenia.__version__,
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", help="file of the JSON results (stdout by default)")
+    parser.add_argument(
+        "--quick", action="store_true", help="smaller populations and fewer repetitions"
+    )
+    parser.add_argument("--repeat", type=int, help="repetitions of each measure")
+    parser.add_argument(
+        "--only",
+        nargs="+",
+        choices=[
+            "build",
+            "cycles",
+            "appraisal",
+            "memory",
+            "scenarios",
+            "phases",
+            "tracing",
+            "sweep",
+            "imports",
+        ],
+        help="run only some of the benchmarks",
+    )
+    args = parser.parse_args(argv)
+
+    repeat = args.repeat or (1 if args.quick else 3)
+    sizes = [10, 100] if args.quick else [10, 100, 1000]
+    scenarios = ["affect_categories", "desirability", "ultimatum_game"]
+    if not args.quick:
+        # Spends most of its time in .wait, so only in the full suite.
+        scenarios.append("prisoner_dilemma")
+    selected = set(
+        args.only
+        or [
+            "build",
+            "cycles",
+            "appraisal",
+            "memory",
+            "scenarios",
+            "phases",
+            "tracing",
+            "sweep",
+            "imports",
+        ]
+    )
+
+    results = {}
+    if "build" in selected:
+        results["build"] = bench_build(sizes, repeat)
+    if "cycles" in selected:
+        results["cycles"] = bench_cycles(sizes, 20, repeat)
+    if "appraisal" in selected:
+        events = 200 if args.quick else 2000
+        results["appraisal"] = {
+            "default_engine": bench_default_appraisal(events, repeat),
+            "empathic_engine": bench_empathic_appraisal(events, repeat),
+        }
+    if "memory" in selected:
+        results["memory"] = bench_memory(sizes)
+    if "scenarios" in selected:
+        results["scenarios"] = bench_scenarios(scenarios, repeat)
+    if "phases" in selected:
+        results["phases"] = bench_phases(scenarios)
+    if "tracing" in selected:
+        results["tracing"] = bench_tracing(scenarios, repeat)
+    if "sweep" in selected:
+        results["sweep"] = bench_sweep(scenarios, 4 if args.quick else 16, repeat)
+    if "imports" in selected:
+        results["imports"] = bench_imports(max(repeat, 3))
+
+    report = json.dumps({"metadata": metadata(), "results": results}, indent=2)
+    if args.output:
+        with open(args.output, "w") as output:
+            output.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
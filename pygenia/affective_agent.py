@@ -2,6 +2,8 @@ from __future__ import print_function
 
 import asyncio
 import collections
+import copy
+import functools
 from typing import Iterator
 
 import agentspeak
@@ -22,13 +24,34 @@ from pygenia.utils import (
     BuildQueryVisitor,
 )
 from pygenia.cognitive_engine.default_engine import DefaultEngine
-from pygenia.cognitive_engine.circumstance import Circumstance
+from pygenia.cognitive_engine.affective_memory import AffectiveMemory
+from pygenia.cognitive_engine.circumstance import (
+    BoundedQueue,
+    Circumstance,
+    belief_event_key,
+)
 from pygenia.cognitive_engine.rational_processes import RationalCycle
 
 LOGGER = agentspeak.get_logger(__name__)
 C = {}
 
 
+def copy_index(index):
+    """
+    This function is used to copy a plan, rule or concern index without copying its items
+
+    Args:
+        index (dict): Index to copy.
+
+    Returns:
+        collections.defaultdict: The copied index.
+    """
+    index_copy = collections.defaultdict(lambda: [])
+    for key, items in index.items():
+        index_copy[key] = list(items)
+    return index_copy
+
+
 class AffectiveAgent(agentspeak.runtime.Agent):
     """
     This class is a subclass of the Agent class.
@@ -70,6 +93,8 @@ class AffectiveAgent(agentspeak.runtime.Agent):
 
         # Circunstance definition
         self.circumstance = Circumstance()
+        if hasattr(env, "schedule_deadline"):
+            self.circumstance.on_timer = functools.partial(env.schedule_deadline, self)
 
         self.rational_cycle.set_circumstance(self.circumstance)
 
@@ -79,13 +104,100 @@ class AffectiveAgent(agentspeak.runtime.Agent):
         self.concerns = (
             collections.defaultdict(lambda: []) if concerns is None else concerns
         )
+        # Concerns by the (functor, arity) of the beliefs they read, and
+        # concerns whose dependencies are unknown (see add_concern)
+        self.concern_index = collections.defaultdict(list)
+        self.unindexed_concerns = []
+        for concern_list in self.concerns.values():
+            for concern in concern_list:
+                self._index_concern(concern)
+
+        # Number of changes of the beliefs of each (functor, arity), and the
+        # last value of each concern with the versions it was computed with
+        self.belief_versions = collections.defaultdict(int)
+        self.concern_cache = {}
+
+        # Intentions waiting for an event and their waiters, by the trigger,
+        # goal type, functor and arity of the event (see register_waiter)
+        self.waiting_intentions = {}
+        # Number of indexed entries, and the number that triggers the
+        # removal of the entries that no longer wait (see prune_waiters)
+        self._waiting_entries = 0
+        self._waiting_limit = 64
+
+        # Belief events that can not change any concern are only appraised
+        # when this is True (see is_concern_relevant)
+        self.appraise_irrelevant_events = True
+
+        # Affective memory definition (⟨event 𝜀, affective value av⟩), bounded
+        # by set_memory_limits
+        self.Mem = AffectiveMemory()
+        # Arguments of the last call to set_memory_limits, if any
+        self.memory_limits = None
+
+        # Belief events waiting for the affective cycle (unbounded by default,
+        # see set_queue_limits)
+        self.event_queue = BoundedQueue(
+            key=belief_event_key, name="affective event queue of %s" % name
+        )
+        self.event_queue.on_full = self._drain_affective_events
+        self.circumstance._events.name = "event queue of %s" % name
+        self._draining = False
+        # Arguments of the last call to set_queue_limits, if any
+        self.queue_limits = None
 
-        # Affective memory definition (⟨event 𝜀, affective value av⟩)
-        self.Mem = []
+        self.personality_emotion_matrix = {}
 
-        self.event_queue = []
+        # Scheduler that drives the agent, if any (see pygenia.scheduler)
+        self.scheduler = None
 
-        self.personality_emotion_matrix = {}
+        # Profiler of the cycle steps, if any (see pygenia.profiling)
+        self.profiler = None
+
+        # Recorder of the affective trajectory, if any (see pygenia.tracing)
+        self.tracer = None
+
+    def clone(self, name):
+        """
+        This method is used to create a new agent from this prototype.
+
+        The plans, rules and compiled concerns are shared with the prototype
+        (the plan, rule and concern indexes are copied so tellHow, untellHow
+        and add_concern only change the clone). The mood and the personality are cloned, and the
+        circumstance, the event queue and the affective memory start empty.
+        Beliefs and goals are not copied, see Environment.clone_agent.
+
+        Args:
+            name (str): Name of the new agent.
+
+        Returns:
+            AffectiveAgent: The new agent.
+        """
+        agent = self.__class__(
+            self.env,
+            name,
+            rules=copy_index(self.rules),
+            plans=copy_index(self.plans),
+            concerns=copy_index(self.concerns),
+        )
+        agent.personality_emotion_matrix = self.personality_emotion_matrix
+        agent.appraise_irrelevant_events = self.appraise_irrelevant_events
+
+        if self.emotional_engine is not None:
+            mood = self.emotional_engine.affective_info.get_mood()
+            agent.set_emotional_engine(type(self.emotional_engine), type(mood))
+            agent.emotional_engine.affective_info.set_mood(mood.clone())
+
+        if self.personality is not None:
+            agent.personality = self.personality.clone()
+
+        if self.queue_limits is not None:
+            agent.set_queue_limits(*self.queue_limits)
+
+        if self.memory_limits is not None:
+            agent.set_memory_limits(*self.memory_limits)
+
+        return agent
 
     def set_personality_emotion_matrix(self, personality_emotion_matrix):
         self.personality_emotion_matrix = personality_emotion_matrix
@@ -97,6 +209,7 @@ class AffectiveAgent(agentspeak.runtime.Agent):
         self.emotional_engine.set_concerns(self.concerns)
         # TODO set the event_queue of default engine to this queue
         self.emotional_engine.set_event_queue(self.event_queue)
+        self.emotional_engine.set_memory(self.Mem)
 
     def set_personality_cls(self, personality_cls):
         self.personality = personality_cls()
@@ -139,11 +252,16 @@ class AffectiveAgent(agentspeak.runtime.Agent):
 
         If the event is a askHow addition, we ask the agent how to do it.
         """
+        # Resume the agent if it is parked in a scheduler.
+        if self.scheduler is not None:
+            self.scheduler.wake(self)
+
         # Modify beliefs.
         if goal_type == agentspeak.GoalType.belief:
             # We recieve a belief and the affective cycle is activated.
             # We need to provide to the sunction the term and the Trigger type.
-            self.event_queue.append((term, trigger))
+            if self.appraise_irrelevant_events or self.is_concern_relevant(term):
+                self.event_queue.append((term, trigger))
             # self.appraisal((term, trigger),0)
             if trigger == agentspeak.Trigger.addition:
                 self.add_belief(term, calling_intention.scope)
@@ -159,20 +277,7 @@ class AffectiveAgent(agentspeak.runtime.Agent):
             raise AslError("expected literal")
 
         # Wake up waiting intentions.
-        for intention_stack in self.circumstance.get_intentions():
-            if not intention_stack:
-                continue
-            intention = intention_stack[-1]
-
-            if not intention.waiter or not intention.waiter.event:
-                continue
-            event = intention.waiter.event
-
-            if event.trigger != trigger or event.goal_type != goal_type:
-                continue
-
-            if agentspeak.unifies_annotated(event.head, frozen):
-                intention.waiter = None
+        self.wake_waiters(trigger, goal_type, frozen)
 
         # If the goal is an achievement and the trigger is an removal, then the agent will delete the goal from his list of intentions
         if (
@@ -192,6 +297,9 @@ class AffectiveAgent(agentspeak.runtime.Agent):
                 if intention.head_term.functor == term.functor:
                     if agentspeak.unifies(term.args, intention.head_term.args):
                         intention_stack.remove(intention)
+                        # The intention no longer waits (see prune_waiters)
+                        intention.waiter = None
+                        self.circumstance.resume_intention(intention)
             return True
 
         # If the goal is an tellHow and the trigger is an addition, then the agent will add the goal received as string to his list of plans
@@ -287,8 +395,9 @@ class AffectiveAgent(agentspeak.runtime.Agent):
             for plan in plans:
                 for differents in plan:
                     if ("@" + str(differents.annotation[0].functor)).startswith(label):
-                        delete_plan.append(differents)
-            for differents in delete_plan:
+                        delete_plan.append((plan, differents))
+            # Remove each plan from its own entry of the plan index
+            for plan, differents in delete_plan:
                 plan.remove(differents)
             return True
 
@@ -314,6 +423,54 @@ class AffectiveAgent(agentspeak.runtime.Agent):
             concern (Concern): Concern to be added.
         """
         self.concerns[(concern.head.functor, len(concern.head.args))].append(concern)
+        self._index_concern(concern)
+
+    def _index_concern(self, concern):
+        dependencies = getattr(concern, "dependencies", None)
+        if dependencies is None:
+            self.unindexed_concerns.append(concern)
+        else:
+            for signature in dependencies:
+                self.concern_index[signature].append(concern)
+
+    def add_belief(self, term, scope):
+        super(AffectiveAgent, self).add_belief(term, scope)
+        self.belief_versions[(term.functor, len(term.args))] += 1
+
+    def remove_belief(self, term, intention):
+        found = super(AffectiveAgent, self).remove_belief(term, intention)
+        if found:
+            self.belief_versions[(term.functor, len(term.args))] += 1
+        return found
+
+    def concern_cache_key(self, concern):
+        """
+        This method is used to get the versions of the beliefs a concern depends on
+
+        Args:
+            concern (Concern): The concern
+
+        Returns:
+            tuple: Versions of the dependencies of the concern, None if its value can not be cached
+        """
+        if not getattr(concern, "cacheable", False):
+            return None
+        versions = self.belief_versions
+        return tuple(versions.get(signature, 0) for signature in concern.dependencies)
+
+    def is_concern_relevant(self, term) -> bool:
+        """
+        This method is used to know if a belief can change the value of any concern
+
+        Args:
+            term (Literal): The belief
+
+        Returns:
+            bool: True if a concern reads the belief or has unknown dependencies, False otherwise
+        """
+        if self.unindexed_concerns:
+            return True
+        return (term.functor, len(term.args)) in self.concern_index
 
     def applyConcernForDeletion(self, event, concern):
         """
@@ -338,6 +495,79 @@ class AffectiveAgent(agentspeak.runtime.Agent):
 
         return concern_value
 
+    def register_waiter(self, intention):
+        """
+        This method is used to index an intention that waits for an event
+
+        Args:
+            intention (agentspeak.runtime.Intention): The intention, with its waiter set
+        """
+        waiter = intention.waiter
+        if waiter is None or waiter.event is None:
+            return
+        event = waiter.event
+        key = (event.trigger, event.goal_type, event.head.functor, len(event.head.args))
+        self.waiting_intentions.setdefault(key, []).append((intention, waiter))
+        self._waiting_entries += 1
+        if self._waiting_entries > self._waiting_limit:
+            self.prune_waiters()
+
+    def prune_waiters(self):
+        """
+        This method is used to drop the indexed intentions that no longer wait
+
+        Their waiter timed out, or the intention was removed, without the
+        event ever happening. It is called by register_waiter whenever the
+        index has doubled since the last pruning, so the index stays
+        proportional to the intentions that wait.
+        """
+        live = 0
+        for key, waiting in list(self.waiting_intentions.items()):
+            still_waiting = [
+                (intention, waiter)
+                for intention, waiter in waiting
+                if intention.waiter is waiter
+            ]
+            if still_waiting:
+                self.waiting_intentions[key] = still_waiting
+                live += len(still_waiting)
+            else:
+                del self.waiting_intentions[key]
+        self._waiting_entries = live
+        self._waiting_limit = max(64, 2 * live)
+
+    def wake_waiters(self, trigger, goal_type, frozen):
+        """
+        This method is used to resume the intentions waiting for an event
+
+        Only the intentions indexed under the trigger, goal type, functor and
+        arity of the event are unified with it. Entries whose waiter was
+        already released (e.g. by its timeout) are dropped.
+
+        Args:
+            trigger (agentspeak.Trigger): Trigger of the event
+            goal_type (agentspeak.GoalType): Goal type of the event
+            frozen (agentspeak.Literal): Term of the event
+        """
+        key = (trigger, goal_type, frozen.functor, len(frozen.args))
+        waiting = self.waiting_intentions.get(key)
+        if not waiting:
+            return
+        still_waiting = []
+        for intention, waiter in waiting:
+            if intention.waiter is not waiter:
+                continue
+            if agentspeak.unifies_annotated(waiter.event.head, frozen):
+                intention.waiter = None
+                self.circumstance.resume_intention(intention)
+            else:
+                still_waiting.append((intention, waiter))
+        self._waiting_entries -= len(waiting) - len(still_waiting)
+        if still_waiting:
+            self.waiting_intentions[key] = still_waiting
+        else:
+            del self.waiting_intentions[key]
+
     def waiters(self) -> Iterator[agentspeak.runtime.Waiter]:
         """
         This method is used to get the waiters of the intentions
@@ -351,6 +581,109 @@ class AffectiveAgent(agentspeak.runtime.Agent):
             if intention and intention[-1].waiter
         )
 
+    def set_queue_limits(
+        self,
+        capacity=None,
+        policy="drop_oldest",
+        affective_capacity=None,
+        affective_policy=None,
+    ):
+        """
+        This method is used to bound the event queues of the agent
+
+        The policy decides what happens when an event arrives at a full queue
+        (see OverflowPolicy): "drop_oldest" discards the oldest event,
+        "coalesce" replaces the queued event of the same belief (functor and
+        arity) and "block" keeps the new event back until the agent selects
+        a queued event, so no event is lost. Held events are not selected from
+        inside the step that raised them: they wait for the next selection of
+        events (SelEv).
+
+        Args:
+            capacity (int): Maximum number of events of the circumstance, None for no limit
+            policy (str): Overflow policy of the circumstance
+            affective_capacity (int): Maximum number of events of the affective cycle, defaults to capacity
+            affective_policy (str): Overflow policy of the affective cycle, defaults to policy
+        """
+        self.queue_limits = (capacity, policy, affective_capacity, affective_policy)
+        self.circumstance._events.configure(capacity, policy)
+        self.event_queue.configure(
+            capacity if affective_capacity is None else affective_capacity,
+            policy if affective_policy is None else affective_policy,
+        )
+
+    def queue_depths(self) -> dict:
+        """
+        This method is used to get the depth and the overflow counters of the event queues
+
+        Returns:
+            dict: Stats of the circumstance ("events") and affective ("affective") queues
+        """
+        return {
+            "events": self.circumstance._events.stats(),
+            "affective": self.event_queue.stats(),
+        }
+
+    def set_memory_limits(self, capacity=1024, max_age=None):
+        """
+        This method is used to set the retention of the affective memory
+
+        Events that leave the memory are still counted in its summaries (see
+        AffectiveMemory.summary).
+
+        Args:
+            capacity (int): Maximum number of remembered events, None for no limit
+            max_age (float): Seconds an event is remembered, None for no limit
+        """
+        self.memory_limits = (capacity, max_age)
+        self.Mem.configure(capacity, max_age)
+
+    def _drain_affective_events(self, queue):
+        # Backpressure of the affective queue: appraise one queued event.
+        if self._draining or self.emotional_engine is None:
+            return
+        self._draining = True
+        try:
+            self.affective_step()
+        finally:
+            self._draining = False
+
+    def has_pending_work(self) -> bool:
+        """
+        This method is used to know if the agent has something to do
+
+        Returns:
+            bool: True if the agent has pending events or a runnable intention, False otherwise
+        """
+        if self.event_queue or self.circumstance.get_events():
+            return True
+        return self.circumstance.has_runnable_intention(self.env)
+
+    def affective_step(self) -> None:
+        """
+        This method is used to run a turn of the affective cycle
+        """
+        self.emotional_engine.current_step_ast = "Appr"
+        self.emotional_engine.affective_transition_system()
+
+    def rational_step(self) -> bool:
+        """
+        This method is used to run a turn of the rational cycle
+
+        Returns:
+            bool: True if the agent selected an intention, False otherwise
+        """
+        if len(self.circumstance.get_events()) > 0:
+            for i in range(len(self.circumstance.get_events())):
+                self.rational_cycle.set_current_step("SelEv")
+                self.rational_cycle.applySemanticRuleDeliberate()
+
+        self.rational_cycle.set_current_step("SelInt")
+        selected = self.rational_cycle.step()
+        if self.tracer is not None:
+            self.tracer.record(self)
+        return selected
+
     def run(self, affective_turns=1, rational_turns=1) -> None:
         """
         This method is used to run a cycle of the agent
@@ -367,22 +700,14 @@ class AffectiveAgent(agentspeak.runtime.Agent):
             async def affective():
                 while not end_event.is_set():
                     await sem_affective.acquire()
-                    self.emotional_engine.current_step_ast = "Appr"
-                    self.emotional_engine.affective_transition_system()
+                    self.affective_step()
                     release_sem(sem_rational, rational_turns, sem_affective.locked())
 
             # Rational cycle
             async def rational():
                 while not end_event.is_set():
                     await sem_rational.acquire()
-                    if len(self.circumstance.get_events()) > 0:
-                        for i in range(len(self.circumstance.get_events())):
-                            self.rational_cycle.set_current_step("SelEv")
-                            self.rational_cycle.applySemanticRuleDeliberate()
-
-                    self.rational_cycle.set_current_step("SelInt")
-
-                    if not self.rational_cycle.step():
+                    if not self.rational_step():
                         end_event.set()
 
                     release_sem(sem_affective, affective_turns, sem_rational.locked())
@@ -0,0 +1,455 @@
+import collections.abc
+
+import numpy as np
+
+# Links are keyed by source * _SHIFT + target
+_SHIFT = 1 << 32
+
+AFFECTIVE_LINK = "affective_link"
+
+
+class AffectiveLinkStore:
+    """
+    This class is used to store the affective links of the empathic agents
+    as a sparse directed graph.
+
+    Agents, and the other agents they know, get consecutive integer ids. A
+    link is a key (source id * 2**32 + target id) in a sorted array, with its
+    weight in a parallel array, so a link takes 16 bytes and the links of a
+    source are contiguous. New links are kept in a dict and merged into the
+    arrays in batches (see merge), so building the graph one link at a time
+    does not copy the arrays on every link.
+
+    Links are updated as EmpathicAgent.update_affective_link has always done:
+    an existing link moves by the interaction value times the empathic level
+    of the source, clipped to [-1, 1], and a new link starts at the
+    interaction value.
+
+    Args:
+        merge_threshold (int): Number of new links kept out of the arrays
+
+    Attributes:
+        names (list): Name of each id
+        ids (dict): Id of each name
+    """
+
+    def __init__(self, merge_threshold=4096):
+        self.names = []
+        self.ids = {}
+        self.merge_threshold = merge_threshold
+        self._keys = np.empty(0, dtype=np.int64)
+        self._weights = np.empty(0, dtype=np.float64)
+        self._new = {}
+
+    def __len__(self):
+        return len(self._keys) + len(self._new)
+
+    def id_of(self, name) -> int:
+        """
+        This method is used to get the id of an agent, giving it one if it has none
+
+        Args:
+            name (str): Name of the agent
+
+        Returns:
+            int: The id of the agent
+        """
+        agent_id = self.ids.get(name)
+        if agent_id is None:
+            agent_id = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return agent_id
+
+    def _find(self, key):
+        i = int(np.searchsorted(self._keys, key))
+        if i < len(self._keys) and self._keys[i] == key:
+            return i
+        return None
+
+    def link(self, source, target) -> float:
+        """
+        This method is used to get the weight of a link
+
+        Args:
+            source (int): Id of the source agent
+            target (int): Id of the target agent
+
+        Raises:
+            KeyError: If there is no such link
+
+        Returns:
+            float: The weight of the link
+        """
+        key = source * _SHIFT + target
+        weight = self._new.get(key)
+        if weight is not None:
+            return weight
+        i = self._find(key)
+        if i is None:
+            raise KeyError((source, target))
+        return float(self._weights[i])
+
+    def has_link(self, source, target) -> bool:
+        key = source * _SHIFT + target
+        return key in self._new or self._find(key) is not None
+
+    def set_link(self, source, target, weight):
+        """
+        This method is used to set the weight of a link, adding it if it is new
+
+        Args:
+            source (int): Id of the source agent
+            target (int): Id of the target agent
+            weight (float): The weight of the link
+        """
+        key = source * _SHIFT + target
+        i = None if key in self._new else self._find(key)
+        if i is not None:
+            self._weights[i] = weight
+        else:
+            self._add(key, weight)
+
+    def _add(self, key, weight):
+        self._new[key] = weight
+        if len(self._new) >= self.merge_threshold:
+            self.merge()
+
+    def remove_link(self, source, target):
+        """
+        This method is used to remove a link
+
+        Args:
+            source (int): Id of the source agent
+            target (int): Id of the target agent
+
+        Raises:
+            KeyError: If there is no such link
+        """
+        key = source * _SHIFT + target
+        if self._new.pop(key, None) is not None:
+            return
+        i = self._find(key)
+        if i is None:
+            raise KeyError((source, target))
+        self._keys = np.delete(self._keys, i)
+        self._weights = np.delete(self._weights, i)
+
+    def update_link(self, source, target, interaction_value, empathic_level) -> float:
+        """
+        This method is used to update a link with an interaction
+
+        Args:
+            source (int): Id of the source agent
+            target (int): Id of the target agent
+            interaction_value (float): Value of the interaction
+            empathic_level (float): Empathic level of the source agent
+
+        Returns:
+            float: The new weight of the link
+        """
+        key = source * _SHIFT + target
+        weight = self._new.get(key)
+        if weight is not None:
+            weight = max(-1, min(1, weight + interaction_value * empathic_level))
+            self._new[key] = weight
+            return weight
+        i = self._find(key)
+        if i is None:
+            self._add(key, interaction_value)
+            return interaction_value
+        weight = max(
+            -1, min(1, float(self._weights[i]) + interaction_value * empathic_level)
+        )
+        self._weights[i] = weight
+        return weight
+
+    def update_links(self, sources, targets, interaction_values, empathic_levels):
+        """
+        This method is used to update many links at once, as update_link
+
+        Interactions on the same link are applied in order, one round per
+        interaction.
+
+        Args:
+            sources (Sequence[int]): Id of the source agent of each interaction
+            targets (Sequence[int]): Id of the target agent of each interaction
+            interaction_values (Sequence[float]): Value of each interaction
+            empathic_levels (Union[float, Sequence[float]]): Empathic level of
+                the source agent of each interaction
+        """
+        keys = np.asarray(sources, dtype=np.int64) * _SHIFT + np.asarray(
+            targets, dtype=np.int64
+        )
+        if len(keys) == 0:
+            return
+        values = np.asarray(interaction_values, dtype=np.float64)
+        levels = np.broadcast_to(
+            np.asarray(empathic_levels, dtype=np.float64), values.shape
+        )
+        self.merge()
+
+        # Rank of each interaction among the interactions of its link
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+        group_sizes = np.diff(np.r_[starts, len(keys)])
+        ranks = np.empty(len(keys), dtype=np.int64)
+        ranks[order] = np.arange(len(keys)) - np.repeat(starts, group_sizes)
+
+        for rank in range(int(group_sizes.max())):
+            selected = ranks == rank
+            round_keys = keys[selected]
+            round_values = values[selected]
+            positions = np.searchsorted(self._keys, round_keys)
+            found = positions < len(self._keys)
+            found[found] = self._keys[positions[found]] == round_keys[found]
+
+            positions = positions[found]
+            self._weights[positions] = np.clip(
+                self._weights[positions]
+                + round_values[found] * levels[selected][found],
+                -1,
+                1,
+            )
+            if not found.all():
+                self._insert(round_keys[~found], round_values[~found])
+
+    def _insert(self, keys, weights):
+        order = np.argsort(keys, kind="stable")
+        keys, weights = keys[order], weights[order]
+        positions = np.searchsorted(self._keys, keys)
+        self._keys = np.insert(self._keys, positions, keys)
+        self._weights = np.insert(self._weights, positions, weights)
+
+    def merge(self):
+        """
+        This method is used to move the new links into the sorted arrays
+        """
+        if not self._new:
+            return
+        keys = np.fromiter(self._new.keys(), dtype=np.int64, count=len(self._new))
+        weights = np.fromiter(
+            self._new.values(), dtype=np.float64, count=len(self._new)
+        )
+        self._new = {}
+        self._insert(keys, weights)
+
+    def _range(self, source):
+        return (
+            int(np.searchsorted(self._keys, source * _SHIFT)),
+            int(np.searchsorted(self._keys, (source + 1) * _SHIFT)),
+        )
+
+    def links_of(self, source) -> tuple:
+        """
+        This method is used to get the links of an agent
+
+        Args:
+            source (int): Id of the source agent
+
+        Returns:
+            tuple: Ids of the target agents and weights of the links, as arrays
+        """
+        self.merge()
+        start, end = self._range(source)
+        return self._keys[start:end] - source * _SHIFT, self._weights[start:end]
+
+    def decay(self, factor, source=None):
+        """
+        This method is used to weaken the links, e.g. as time goes by
+
+        Args:
+            factor (float): Factor of the weights
+            source (int): Id of the agent whose links decay, None for every link
+        """
+        self.merge()
+        if source is None:
+            self._weights *= factor
+        else:
+            start, end = self._range(source)
+            self._weights[start:end] *= factor
+
+    def prune(self, threshold) -> int:
+        """
+        This method is used to remove the weak links
+
+        Args:
+            threshold (float): Links whose weight is under this value in absolute value are removed
+
+        Returns:
+            int: Number of removed links
+        """
+        self.merge()
+        keep = np.abs(self._weights) >= threshold
+        removed = len(keep) - int(np.count_nonzero(keep))
+        if removed:
+            self._keys = self._keys[keep]
+            self._weights = self._weights[keep]
+        return removed
+
+    def strongest(self, k, source=None) -> list:
+        """
+        This method is used to get the strongest links
+
+        Args:
+            k (int): Number of links
+            source (int): Id of the agent whose links are ranked, None for every link
+
+        Returns:
+            list: (source name, target name, weight) of the links, strongest first
+        """
+        return self._top(k, source, -1.0)
+
+    def weakest(self, k, source=None) -> list:
+        """
+        This method is used to get the weakest links (the most negative first)
+
+        Args:
+            k (int): Number of links
+            source (int): Id of the agent whose links are ranked, None for every link
+
+        Returns:
+            list: (source name, target name, weight) of the links, weakest first
+        """
+        return self._top(k, source, 1.0)
+
+    def _top(self, k, source, sign):
+        self.merge()
+        start, end = (0, len(self._keys)) if source is None else self._range(source)
+        weights = self._weights[start:end] * sign
+        k = min(k, len(weights))
+        if k <= 0:
+            return []
+        if k < len(weights):
+            selected = np.argpartition(weights, k - 1)[:k]
+        else:
+            selected = np.arange(len(weights))
+        selected = selected[np.argsort(weights[selected], kind="stable")]
+        keys = self._keys[start:end][selected]
+        return [
+            (self.names[key // _SHIFT], self.names[key % _SHIFT], weight)
+            for key, weight in zip(
+                keys.tolist(), self._weights[start:end][selected].tolist()
+            )
+        ]
+
+
+class LinkedOthers(collections.abc.MutableMapping):
+    """
+    This class is used to access the other agents of an empathic agent whose
+    affective links are in an AffectiveLinkStore as if they were the others
+    dict: {other name: {"affective_link": weight, ...}}.
+
+    Other attributes than the affective link are kept in the view.
+
+    Args:
+        store (AffectiveLinkStore): The link store
+        source (int): Id of the agent in the store
+        attributes (dict): Other attributes of each other agent
+    """
+
+    __slots__ = ("store", "source", "attributes")
+
+    def __init__(self, store, source, attributes=None):
+        self.store = store
+        self.source = source
+        self.attributes = attributes or {}
+
+    def __getitem__(self, other):
+        target = self.store.ids.get(other)
+        if other not in self.attributes and (
+            target is None or not self.store.has_link(self.source, target)
+        ):
+            raise KeyError(other)
+        return LinkAttributes(self, other)
+
+    def __setitem__(self, other, attributes):
+        attributes = dict(attributes)
+        if AFFECTIVE_LINK in attributes:
+            self.store.set_link(
+                self.source, self.store.id_of(other), attributes.pop(AFFECTIVE_LINK)
+            )
+        if attributes:
+            self.attributes[other] = attributes
+
+    def __delitem__(self, other):
+        self[other]  # KeyError if the agent is unknown
+        target = self.store.ids.get(other)
+        if target is not None and self.store.has_link(self.source, target):
+            self.store.remove_link(self.source, target)
+        self.attributes.pop(other, None)
+
+    def __iter__(self):
+        targets, _ = self.store.links_of(self.source)
+        names = [self.store.names[target] for target in targets.tolist()]
+        linked = set(names)
+        return iter(names + [other for other in self.attributes if other not in linked])
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return repr({other: dict(self[other]) for other in self})
+
+
+class LinkAttributes(collections.abc.MutableMapping):
+    """
+    This class is used to access the attributes of another agent of a
+    LinkedOthers view, with its affective link in the link store
+
+    Args:
+        others (LinkedOthers): The view of the other agents
+        other (str): Name of the other agent
+    """
+
+    __slots__ = ("others", "other")
+
+    def __init__(self, others, other):
+        self.others = others
+        self.other = other
+
+    def __getitem__(self, attribute):
+        if attribute == AFFECTIVE_LINK:
+            store = self.others.store
+            target = store.ids.get(self.other)
+            if target is None:
+                raise KeyError(attribute)
+            try:
+                return store.link(self.others.source, target)
+            except KeyError:
+                raise KeyError(attribute)
+        return self.others.attributes.get(self.other, {})[attribute]
+
+    def __setitem__(self, attribute, value):
+        if attribute == AFFECTIVE_LINK:
+            store = self.others.store
+            store.set_link(self.others.source, store.id_of(self.other), value)
+        else:
+            self.others.attributes.setdefault(self.other, {})[attribute] = value
+
+    def __delitem__(self, attribute):
+        if attribute == AFFECTIVE_LINK:
+            store = self.others.store
+            target = store.ids.get(self.other)
+            if target is None:
+                raise KeyError(attribute)
+            try:
+                store.remove_link(self.others.source, target)
+            except KeyError:
+                raise KeyError(attribute)
+        else:
+            del self.others.attributes.get(self.other, {})[attribute]
+
+    def __iter__(self):
+        attributes = list(self.others.attributes.get(self.other, ()))
+        store = self.others.store
+        target = store.ids.get(self.other)
+        if target is not None and store.has_link(self.others.source, target):
+            attributes.insert(0, AFFECTIVE_LINK)
+        return iter(attributes)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return repr(dict(self))
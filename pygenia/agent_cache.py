@@ -0,0 +1,273 @@
+from __future__ import print_function
+
+import enum
+import hashlib
+import io
+import os
+import pickle
+
+import agentspeak
+
+import pygenia
+import pygenia.lexer
+import pygenia.parser
+
+LOGGER = agentspeak.get_logger(__name__)
+
+_parser_version = None
+
+
+def parser_version() -> str:
+    """
+    This function is used to get the version of the parser used to build the cache keys
+
+    The version changes whenever pygenia, python-agentspeak or the source of
+    the lexer and the parser change, so stale entries are never reused.
+
+    Returns:
+        str: The version of the parser
+    """
+    global _parser_version
+    if _parser_version is None:
+        digest = hashlib.sha256()
+        digest.update(pygenia.__version__.encode("utf-8"))
+        digest.update(getattr(agentspeak, "__version__", "").encode("utf-8"))
+        for module in (pygenia.lexer, pygenia.parser):
+            with open(module.__file__, "rb") as module_source:
+                digest.update(module_source.read())
+        _parser_version = digest.hexdigest()
+    return _parser_version
+
+
+class AstPickler(pickle.Pickler):
+    """
+    This class is used to pickle the ast of an agent
+
+    The operators of the parser are enums whose values do not compare equal
+    once unpickled, so enum members are pickled by name.
+    """
+
+    def reducer_override(self, obj):
+        if isinstance(obj, enum.Enum):
+            return getattr, (type(obj), obj.name)
+        return NotImplemented
+
+
+def _file_digest(path) -> str:
+    with open(path, "rb") as included_file:
+        return hashlib.sha256(included_file.read()).hexdigest()
+
+
+def include_digests(includes) -> tuple:
+    """
+    This function is used to get the digests of the files included by a source
+
+    Args:
+        includes (list): Paths of the included files, as the parser opened them
+
+    Returns:
+        tuple: The path, absolute path and content digest of each file
+    """
+    return tuple(
+        (path, os.path.abspath(path), _file_digest(path))
+        for path in dict.fromkeys(includes)
+    )
+
+
+def includes_unchanged(digests) -> bool:
+    """
+    This function is used to know if the files included by a source are still the same
+
+    Args:
+        digests (tuple): Digests of the included files (see include_digests)
+
+    Returns:
+        bool: False if a file was edited or removed, or if its relative path
+        now points to another file, True otherwise
+    """
+    for path, absolute_path, digest in digests:
+        if os.path.abspath(path) != absolute_path:
+            return False
+        try:
+            if _file_digest(path) != digest:
+                return False
+        except OSError:
+            return False
+    return True
+
+
+class AgentCache:
+    """
+    This class is used to cache the parsed ast of the agents
+
+    Entries are keyed by the name and the content of the source and by the
+    version of the parser. The digests of the files pulled in with
+    { include(...) } are kept with each entry, and an entry is parsed again
+    when one of them changed. Entries are kept in memory and, if a directory
+    is given, on disk so they can be reused by later processes. Every lookup
+    returns a new copy of the ast, so agents never share it.
+
+    Only use directories that are not writable by untrusted users, since the
+    entries are pickles.
+
+    Args:
+        directory (str): Directory of the on-disk cache, None to keep it in memory only
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, name, text) -> str:
+        """
+        This method is used to get the key of a source
+
+        Args:
+            name (str): Name of the source
+            text (str): Content of the source
+
+        Returns:
+            str: The key of the source
+        """
+        digest = hashlib.sha256()
+        digest.update(parser_version().encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(str(name).encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(text.encode("utf-8"))
+        return digest.hexdigest()
+
+    def parse(self, source, log):
+        """
+        This method is used to parse a source, reusing the cached ast if possible
+
+        Args:
+            source (file): Source of the agent, read until the end
+            log (agentspeak.Log): Log of the parser
+
+        Returns:
+            AstAgent: The ast of the agent
+        """
+        text = "".join(source)
+        key = self.key(source.name, text)
+
+        entry = self.entries.get(key)
+        ast_agent = None
+        if entry is None:
+            entry, ast_agent = self._load(key)
+        if entry is not None and includes_unchanged(entry[1]):
+            self.entries[key] = entry
+            self.hits += 1
+            if ast_agent is None:
+                ast_agent = pickle.loads(entry[0])
+            return ast_agent
+
+        self.misses += 1
+        string_source = agentspeak.StringSource(source.name, text)
+        tokens = pygenia.lexer.TokenStream(string_source, log)
+        ast_agent = pygenia.parser.parse(source.name, tokens, log)
+        log.throw()
+
+        buffer = io.BytesIO()
+        AstPickler(buffer, protocol=pickle.HIGHEST_PROTOCOL).dump(ast_agent)
+        entry = (buffer.getvalue(), include_digests(ast_agent.includes))
+        self.entries[key] = entry
+        self._store(key, entry)
+        return ast_agent
+
+    def clear(self):
+        """
+        This method is used to remove the entries kept in memory
+        """
+        self.entries = {}
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".pickle")
+
+    def _load(self, key):
+        # The entry and its decoded ast, which is only decoded once
+        if not self.directory:
+            return None, None
+        try:
+            with open(self._path(key), "rb") as entry_file:
+                data, digests = pickle.loads(entry_file.read())
+            ast_agent = pickle.loads(data)
+        except FileNotFoundError:
+            return None, None
+        except Exception as err:
+            LOGGER.warning("ignoring unreadable agent cache entry %s: %s", key, err)
+            return None, None
+        return (data, digests), ast_agent
+
+    def _store(self, key, entry):
+        if not self.directory:
+            return
+        data = pickle.dumps(entry, protocol=pickle.HIGHEST_PROTOCOL)
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temporary file first so concurrent runs never read
+            # half-written entries.
+            tmp_path = "%s.%d.tmp" % (path, os.getpid())
+            with open(tmp_path, "wb") as entry:
+                entry.write(data)
+            os.replace(tmp_path, path)
+        except OSError as err:
+            LOGGER.warning("could not write agent cache entry %s: %s", key, err)
+
+
+def default_directory():
+    """
+    This function is used to get the directory of the default on-disk cache
+
+    The on-disk cache is opt-in: it is only used if the PYGENIA_CACHE_DIR
+    environment variable names a directory (or if a cache with a directory is
+    set with set_cache). Otherwise the parsed agents are only cached in memory.
+
+    Returns:
+        str: The directory, or None if the on-disk cache is disabled
+    """
+    return os.environ.get("PYGENIA_CACHE_DIR") or None
+
+
+_cache = None
+
+
+def get_cache() -> AgentCache:
+    """
+    This function is used to get the agent cache shared by the environments
+
+    Returns:
+        AgentCache: The shared agent cache
+    """
+    global _cache
+    if _cache is None:
+        _cache = AgentCache(default_directory())
+    return _cache
+
+
+def set_cache(cache):
+    """
+    This function is used to replace the agent cache shared by the environments
+
+    Args:
+        cache (AgentCache): The new cache, None to go back to the default one
+    """
+    global _cache
+    _cache = cache
+
+
+def parse(source, log):
+    """
+    This function is used to parse a source with the shared agent cache
+
+    Args:
+        source (file): Source of the agent
+        log (agentspeak.Log): Log of the parser
+
+    Returns:
+        AstAgent: The ast of the agent
+    """
+    return get_cache().parse(source, log)
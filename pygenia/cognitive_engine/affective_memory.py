@@ -0,0 +1,286 @@
+import bisect
+import collections
+import itertools
+
+
+# An affectively relevant event remembered by the agent, with the time it was
+# appraised, its concern value and the affective labels of the agent after it
+MemoryRecord = collections.namedtuple(
+    "MemoryRecord", ["time", "event", "value", "emotions"]
+)
+
+
+def memory_event_key(event):
+    """
+    This function is used to get the key of an affective event in the memory
+
+    Args:
+        event (tuple): The term and the trigger of the belief event
+
+    Returns:
+        tuple: The functor and arity of the event
+    """
+    term = event[0]
+    return (term.functor, len(term.args))
+
+
+class AffectiveMemory:
+    """
+    This class is used to represent the affective memory of an agent
+    (⟨event 𝜀, affective value av⟩).
+
+    The last events are kept in a buffer bounded by a capacity and by a
+    maximum age. Events that leave the buffer are not lost completely: every
+    remembered event is also folded into a summary of its functor and of each
+    of its affective labels (count, first and last time and mean value), so
+    long runs keep a constant amount of memory per agent.
+
+    Records are kept in time order and indexed by functor, so the records of
+    a functor and the records of a time window are found without scanning
+    the whole buffer. The buffer is a list whose evicted head is only
+    removed once it is as long as the rest, so records are read by index in
+    constant time and evicted in amortized constant time.
+
+    Args:
+        capacity (int): Maximum number of records, None for an unbounded buffer
+        max_age (float): Seconds a record is kept, None to keep it until the buffer is full
+
+    Attributes:
+        evicted (int): Number of records that have left the buffer
+    """
+
+    # Evicted records kept at the head of the buffer before it is compacted
+    _MIN_COMPACT = 64
+
+    def __init__(self, capacity=1024, max_age=None):
+        self._records = []
+        self._times = []
+        # Index of the oldest remembered record in _records and _times
+        self._head = 0
+        self._by_functor = collections.defaultdict(collections.deque)
+        self._functor_summary = {}
+        self._emotion_summary = {}
+        self.capacity = None
+        self.max_age = None
+        self.evicted = 0
+        self.configure(capacity, max_age)
+
+    def configure(self, capacity=1024, max_age=None):
+        """
+        This method is used to change the retention of the memory
+
+        Records over the new capacity are evicted, the oldest first.
+
+        Args:
+            capacity (int): Maximum number of records, None for an unbounded buffer
+            max_age (float): Seconds a record is kept, None to keep it until the buffer is full
+
+        Raises:
+            ValueError: If the capacity or the maximum age is not positive
+        """
+        if capacity is not None and capacity < 1:
+            raise ValueError("memory capacity must be positive, got: %r" % capacity)
+        if max_age is not None and max_age <= 0:
+            raise ValueError("memory max_age must be positive, got: %r" % max_age)
+        self.capacity = capacity
+        self.max_age = max_age
+        while capacity is not None and len(self) > capacity:
+            self._evict()
+        if self:
+            self.expire(self._times[-1])
+
+    def append(self, event, time, value=None, emotions=()):
+        """
+        This method is used to remember an affectively relevant event
+
+        Args:
+            event (tuple): The term and the trigger of the event
+            time (float): Time at which the event was appraised
+            value (float): Concern value of the event, if any
+            emotions (Iterable[str]): Affective labels of the agent after the event
+        """
+        record = MemoryRecord(time, event, value, tuple(emotions))
+        if self.capacity is not None and len(self) >= self.capacity:
+            self._evict()
+        # Records are kept in time order even if the clock goes back
+        if self and time < self._times[-1]:
+            time = self._times[-1]
+            record = record._replace(time=time)
+        self._records.append(record)
+        self._times.append(time)
+        key = memory_event_key(event)
+        self._by_functor[key].append(record)
+
+        self._summarize(self._functor_summary, key, record)
+        for emotion in record.emotions:
+            self._summarize(self._emotion_summary, emotion, record)
+        self.expire(time)
+
+    @staticmethod
+    def _summarize(summaries, key, record):
+        summary = summaries.get(key)
+        if summary is None:
+            summary = summaries[key] = {
+                "count": 0,
+                "first": record.time,
+                "last": record.time,
+                "value_sum": 0.0,
+                "value_count": 0,
+            }
+        summary["count"] += 1
+        summary["last"] = record.time
+        if record.value is not None:
+            summary["value_sum"] += record.value
+            summary["value_count"] += 1
+
+    def _evict(self):
+        record = self._records[self._head]
+        self._head += 1
+        if self._head >= self._MIN_COMPACT and 2 * self._head >= len(self._records):
+            del self._records[: self._head]
+            del self._times[: self._head]
+            self._head = 0
+        key = memory_event_key(record.event)
+        records = self._by_functor[key]
+        records.popleft()
+        if not records:
+            del self._by_functor[key]
+        self.evicted += 1
+
+    def expire(self, now):
+        """
+        This method is used to evict the records older than the maximum age
+
+        Args:
+            now (float): Current time
+        """
+        if self.max_age is None:
+            return
+        limit = now - self.max_age
+        while self and self._times[self._head] < limit:
+            self._evict()
+
+    def clear(self, summaries=False):
+        """
+        This method is used to forget the remembered events
+
+        Args:
+            summaries (bool): True to also forget the summaries of the functors and labels
+        """
+        self._records.clear()
+        self._times.clear()
+        self._head = 0
+        self._by_functor.clear()
+        if summaries:
+            self._functor_summary.clear()
+            self._emotion_summary.clear()
+            self.evicted = 0
+
+    def by_functor(self, functor, arity=None) -> list:
+        """
+        This method is used to get the remembered events of a functor
+
+        Args:
+            functor (str): Functor of the events
+            arity (int): Arity of the events, None for any arity
+
+        Returns:
+            list: The records of the events, oldest first
+        """
+        if arity is not None:
+            return list(self._by_functor.get((functor, arity), ()))
+        records = [
+            record
+            for key, functor_records in self._by_functor.items()
+            if key[0] == functor
+            for record in functor_records
+        ]
+        records.sort(key=lambda record: record.time)
+        return records
+
+    def window(self, start=None, end=None) -> list:
+        """
+        This method is used to get the remembered events of a time window
+
+        Args:
+            start (float): Start of the window, None for the oldest record
+            end (float): End of the window (included), None for the newest record
+
+        Returns:
+            list: The records of the events, oldest first
+        """
+        times = self._times
+        first = self._head
+        if start is not None:
+            first = bisect.bisect_left(times, start, first)
+        last = len(times)
+        if end is not None:
+            last = bisect.bisect_right(times, end, first)
+        return self._records[first:last]
+
+    def summary(self, functor=None, arity=None, emotion=None) -> dict:
+        """
+        This method is used to get the summary of the events remembered so far
+
+        Evicted records are still counted in the summaries.
+
+        Args:
+            functor (str): Functor to summarize, with arity
+            arity (int): Arity of the functor
+            emotion (str): Affective label to summarize
+
+        Returns:
+            dict: Count, first and last time and mean value of the functor or
+            label (None if it was never remembered), or, without arguments,
+            the summaries of every functor and label with the counters of the buffer
+        """
+        if functor is not None:
+            return self._summary_of(self._functor_summary.get((functor, arity)))
+        if emotion is not None:
+            return self._summary_of(self._emotion_summary.get(emotion))
+        return {
+            "records": len(self),
+            "capacity": self.capacity,
+            "max_age": self.max_age,
+            "evicted": self.evicted,
+            "functors": {
+                key: self._summary_of(summary)
+                for key, summary in self._functor_summary.items()
+            },
+            "emotions": {
+                key: self._summary_of(summary)
+                for key, summary in self._emotion_summary.items()
+            },
+        }
+
+    @staticmethod
+    def _summary_of(summary):
+        if summary is None:
+            return None
+        return {
+            "count": summary["count"],
+            "first": summary["first"],
+            "last": summary["last"],
+            "mean_value": (
+                summary["value_sum"] / summary["value_count"]
+                if summary["value_count"]
+                else None
+            ),
+        }
+
+    def __len__(self):
+        return len(self._records) - self._head
+
+    def __bool__(self):
+        return len(self._records) > self._head
+
+    def __iter__(self):
+        return itertools.islice(self._records, self._head, None)
+
+    def __getitem__(self, index):
+        size = len(self)
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError("memory index out of range")
+        return self._records[self._head + index]
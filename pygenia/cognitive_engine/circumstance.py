@@ -1,32 +1,428 @@
 import collections
+import enum
+import heapq
+
+import agentspeak
 from agentspeak.runtime import Event
 
 
+class OverflowPolicy(enum.Enum):
+    """
+    This class is used to represent what a full queue does with a new item
+
+    - block: keep the new item back, out of the queue, until an item leaves
+      the queue (see BoundedQueue.held), so no item is lost. on_full is
+      called first and may make room.
+    - drop_oldest: discard the oldest item
+    - coalesce: replace the queued item with the same key (see BoundedQueue.key),
+      or discard the oldest item if there is none
+    """
+
+    block = "block"
+    drop_oldest = "drop_oldest"
+    coalesce = "coalesce"
+
+
+class BoundedQueue:
+    """
+    This class is used to represent a deque-backed queue with an optional
+    capacity and an overflow policy.
+
+    Items are appended on the right. pop takes the newest item and popleft
+    the oldest, both in constant time, as do len and indexing at both ends.
+    Items held back by the block policy enter the queue, oldest first, as
+    soon as an item leaves it, so the owner of the queue is never run again
+    from inside append.
+
+    Args:
+        capacity (int): Maximum number of items, None for an unbounded queue
+        policy (Union[OverflowPolicy, str]): What to do when the queue is full
+        key (callable): Key of the items that can be coalesced, None if an item can not be coalesced
+        name (str): Name of the queue, used in errors
+
+    Attributes:
+        on_full (callable): Called with the queue when it is full and the policy is block
+        held (deque): Items kept back by the block policy, oldest first
+        dropped (int): Number of discarded items
+        coalesced (int): Number of items replaced by a newer one
+        max_depth (int): Maximum number of items the queue has held
+    """
+
+    def __init__(self, capacity=None, policy=OverflowPolicy.drop_oldest, key=None, name="queue"):
+        self._items = collections.deque()
+        self.capacity = None
+        self.policy = OverflowPolicy.drop_oldest
+        self.key = key
+        self.name = name
+        self.on_full = None
+        self.held = collections.deque()
+        self.dropped = 0
+        self.coalesced = 0
+        self.max_depth = 0
+        self.configure(capacity, policy)
+
+    def configure(self, capacity=None, policy=OverflowPolicy.drop_oldest):
+        """
+        This method is used to change the capacity and the overflow policy
+
+        Items over the new capacity are discarded, the oldest first, or held
+        back with the block policy. Held items enter the queue if there is
+        room, or under the new policy if it is not block.
+
+        Args:
+            capacity (int): Maximum number of items, None for an unbounded queue
+            policy (Union[OverflowPolicy, str]): What to do when the queue is full
+
+        Raises:
+            ValueError: If the capacity is not positive or the policy is unknown
+        """
+        if capacity is not None and capacity < 1:
+            raise ValueError("queue capacity must be positive, got: %r" % capacity)
+        self.capacity = capacity
+        self.policy = OverflowPolicy(policy)
+        while capacity is not None and len(self._items) > capacity:
+            if self.policy is OverflowPolicy.block:
+                self.held.appendleft(self._items.pop())
+            else:
+                self._items.popleft()
+                self.dropped += 1
+        if self.policy is OverflowPolicy.block:
+            self._admit()
+        else:
+            # Held items are added under the new policy
+            held, self.held = self.held, collections.deque()
+            for item in held:
+                self.append(item)
+
+    def is_full(self) -> bool:
+        return self.capacity is not None and len(self._items) >= self.capacity
+
+    def append(self, item):
+        """
+        This method is used to add an item, applying the overflow policy if the queue is full
+
+        Args:
+            item: The item to add
+        """
+        if self.held or self.is_full():
+            if self._overflow(item):
+                return
+        self._items.append(item)
+        if len(self._items) > self.max_depth:
+            self.max_depth = len(self._items)
+
+    def _overflow(self, item) -> bool:
+        # True if the item was dropped or held back
+        if self.policy is OverflowPolicy.block:
+            if self.on_full is not None and not self.held:
+                self.on_full(self)
+            if self.held or self.is_full():
+                self.held.append(item)
+                return True
+            return False
+
+        if self.policy is OverflowPolicy.coalesce and self.key is not None:
+            key = self.key(item)
+            if key is not None:
+                for i in range(len(self._items) - 1, -1, -1):
+                    if self.key(self._items[i]) == key:
+                        del self._items[i]
+                        self.coalesced += 1
+                        return False
+
+        self._items.popleft()
+        self.dropped += 1
+        return False
+
+    def _admit(self):
+        held = self.held
+        while held and not self.is_full():
+            self._items.append(held.popleft())
+        if len(self._items) > self.max_depth:
+            self.max_depth = len(self._items)
+
+    def pop(self):
+        item = self._items.pop()
+        if self.held:
+            self._admit()
+        return item
+
+    def popleft(self):
+        item = self._items.popleft()
+        if self.held:
+            self._admit()
+        return item
+
+    def clear(self):
+        self._items.clear()
+        self._admit()
+
+    def remove(self, item):
+        self._items.remove(item)
+        if self.held:
+            self._admit()
+
+    def stats(self) -> dict:
+        """
+        This method is used to get the depth and the overflow counters of the queue
+
+        Returns:
+            dict: Depth, capacity, maximum depth, held, dropped and coalesced items
+        """
+        return {
+            "depth": len(self._items),
+            "capacity": self.capacity,
+            "max_depth": self.max_depth,
+            "held": len(self.held),
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+        }
+
+    def __len__(self):
+        return len(self._items)
+
+    def __bool__(self):
+        return bool(self._items)
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __contains__(self, item):
+        return item in self._items
+
+    def __getitem__(self, index):
+        return self._items[index]
+
+    def __delitem__(self, index):
+        del self._items[index]
+        if self.held:
+            self._admit()
+
+
+def event_key(event):
+    """
+    This function is used to get the key of a rational event for coalescing
+
+    Only belief events are coalesced: goals are never discarded in favour of
+    a newer goal.
+
+    Args:
+        event (Event): The event
+
+    Returns:
+        tuple: The trigger, functor and arity of a belief event, None otherwise
+    """
+    if event.goal_type != agentspeak.GoalType.belief:
+        return None
+    return (event.trigger, event.head.functor, len(event.head.args))
+
+
+def belief_event_key(event):
+    """
+    This function is used to get the key of an affective event for coalescing
+
+    Args:
+        event (tuple): The term and the trigger of the belief event
+
+    Returns:
+        tuple: The trigger, functor and arity of the event
+    """
+    term, trigger = event
+    return (trigger, term.functor, len(term.args))
+
+
 class Circumstance:
     """
     A class representing a circumstance, which encapsulates intentions, events, and actions.
 
     Attributes:
     - _intentions: A deque (double-ended queue) containing intentions.
-    - _events: A list containing events.
+    - _events: A bounded queue containing events (see BoundedQueue).
     - _actions: A list containing actions.
+
+    Intentions are scheduled with a ready queue (see select_intention):
+    - _runnable: Intention stacks that may run, in round-robin order.
+    - _blocked: Intentions that wait and their stacks, by the id of the intention.
+    - _timers: Heap of the deadlines of the blocked intentions.
     """
 
     def __init__(self):
         self._intentions = collections.deque()
-        self._events: Event = []
+        self._events = BoundedQueue(key=event_key, name="event queue")
         self._actions = []
 
+        self._live = set()
+        self._runnable = collections.deque()
+        self._blocked = {}
+        self._timers = []
+        # Breaks the ties between timers, in the order they were set
+        self._timer_sequence = 0
+        # Called with each new deadline of a blocked intention, if set
+        self.on_timer = None
+
+    def __getstate__(self):
+        # The live and blocked intentions are indexed by id, which does not
+        # survive pickling (see pygenia.snapshot): save the objects instead.
+        state = self.__dict__.copy()
+        state["_live"] = [
+            intention_stack
+            for intention_stack in self._intentions
+            if id(intention_stack) in self._live
+        ]
+        state["_blocked"] = list(self._blocked.values())
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._live = {id(intention_stack) for intention_stack in state["_live"]}
+        self._blocked = {
+            id(intention): (intention, intention_stack)
+            for intention, intention_stack in state["_blocked"]
+        }
+
     # Getter and setter methods for _intentions
     def get_intentions(self):
         return self._intentions
 
     def set_intentions(self, intentions):
         self._intentions = intentions
+        self._live = {id(intention) for intention in intentions}
+        self._runnable = collections.deque(intentions)
+        self._blocked = {}
+        self._timers = []
 
     # Method to add an intention
     def add_intention(self, intention):
         self._intentions.append(intention)
+        self._live.add(id(intention))
+        self._runnable.append(intention)
+
+    def select_intention(self, env):
+        """
+        This method is used to select the next intention stack to run, in round robin
+
+        Stacks whose top intention waits are moved to the blocked intentions
+        until their waiter fires (see resume_intention and release_timers).
+
+        Args:
+            env (agentspeak.runtime.Environment): Environment, used to poll the deadlines
+
+        Returns:
+            deque: The selected intention stack, None if no intention can run
+        """
+        if not self.has_runnable_intention(env):
+            return None
+        intention_stack = self._runnable.popleft()
+        self._runnable.append(intention_stack)
+        return intention_stack
+
+    def has_runnable_intention(self, env) -> bool:
+        """
+        This method is used to know if an intention can run, blocking the ones that wait
+
+        Args:
+            env (agentspeak.runtime.Environment): Environment, used to poll the deadlines
+
+        Returns:
+            bool: True if an intention stack can run, False otherwise
+        """
+        if self._timers:
+            self.release_timers(env.time())
+        runnable = self._runnable
+        while runnable:
+            intention_stack = runnable[0]
+            if id(intention_stack) not in self._live:
+                runnable.popleft()
+                continue
+            if not intention_stack:
+                runnable.popleft()
+                self.delete_intention(intention_stack)
+                continue
+            intention = intention_stack[-1]
+            waiter = intention.waiter
+            if waiter is not None:
+                if waiter.poll(env):
+                    intention.waiter = None
+                else:
+                    runnable.popleft()
+                    self._block(intention_stack, intention, waiter)
+                    continue
+            return True
+        return False
+
+    def _block(self, intention_stack, intention, waiter):
+        # The intention is kept with its stack, so its id is not reused
+        # while it is blocked
+        self._blocked[id(intention)] = (intention, intention_stack)
+        if waiter.until is not None:
+            self._timer_sequence += 1
+            heapq.heappush(
+                self._timers, (waiter.until, self._timer_sequence, intention)
+            )
+            if self.on_timer is not None:
+                self.on_timer(waiter.until)
+
+    def resume_intention(self, intention):
+        """
+        This method is used to make a blocked intention runnable again
+
+        Args:
+            intention (agentspeak.runtime.Intention): The intention whose waiter fired or that was removed
+        """
+        if not self.is_blocked(intention):
+            return
+        _, intention_stack = self._blocked.pop(id(intention))
+        if id(intention_stack) in self._live:
+            self._runnable.append(intention_stack)
+
+    def is_blocked(self, intention) -> bool:
+        """
+        This method is used to know if an intention waits in the blocked intentions
+
+        Args:
+            intention (agentspeak.runtime.Intention): The intention
+
+        Returns:
+            bool: True if the intention is blocked, False otherwise
+        """
+        blocked = self._blocked.get(id(intention))
+        return blocked is not None and blocked[0] is intention
+
+    def release_timers(self, now):
+        """
+        This method is used to resume the intentions whose deadline has passed
+
+        Args:
+            now (float): Current time of the environment
+        """
+        timers = self._timers
+        while timers and timers[0][0] < now:
+            until, _, intention = heapq.heappop(timers)
+            waiter = intention.waiter
+            if waiter is not None and waiter.until == until:
+                intention.waiter = None
+            if intention.waiter is None:
+                self.resume_intention(intention)
+
+    def next_deadline(self):
+        """
+        This method is used to get the earliest deadline of the blocked intentions
+
+        Returns:
+            float: The earliest deadline, None if no blocked intention has one
+        """
+        timers = self._timers
+        while timers:
+            until, _, intention = timers[0]
+            waiter = intention.waiter
+            if (
+                self.is_blocked(intention)
+                and waiter is not None
+                and waiter.until == until
+            ):
+                return until
+            heapq.heappop(timers)
+        return None
 
     # Method to search for an intention
     def search_intention(self, intention):
@@ -36,6 +432,7 @@ class Circumstance:
     def delete_intention(self, intention):
         try:
             self._intentions.remove(intention)
+            self._live.discard(id(intention))
         except ValueError:
             print("Intention not found.")
 
@@ -44,7 +441,9 @@ class Circumstance:
         return self._events
 
     def set_events(self, events):
-        self._events = events
+        self._events.clear()
+        for event in events:
+            self._events.append(event)
 
     # Method to add an event
     def add_event(self, event):
@@ -95,5 +494,14 @@ class Circumstance:
         except IndexError:
             print("Index out of range.")
 
+    def pop_event(self):
+        """
+        This method is used to remove and return the oldest event
+
+        Returns:
+            Event: The oldest event
+        """
+        return self._events.popleft()
+
     def get_num_events(self):
         return len(self._events)
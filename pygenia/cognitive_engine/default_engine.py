@@ -34,9 +34,18 @@ class DefaultEngine(EmotionalEngine):
             "Cope": self.applyCope,
         }
 
+        profiler = self.agent.profiler
         flag = True
         while flag and self.current_step_ast in options:
-            flag = options[self.current_step_ast]()
+            if profiler is None:
+                flag = options[self.current_step_ast]()
+            else:
+                flag = profiler.call(
+                    self.agent.name,
+                    "affective",
+                    self.current_step_ast,
+                    options[self.current_step_ast],
+                )
 
         return True
 
@@ -60,7 +69,7 @@ class DefaultEngine(EmotionalEngine):
             self.eventProcessedInCycle = True
 
         if self.cleanAffectivelyRelevantEvents():
-            self.Mem = []
+            self.Mem.clear()
 
         # The next step is Update Aff State
         self.current_step_ast = "UpAs"
@@ -73,7 +82,7 @@ class DefaultEngine(EmotionalEngine):
         if self.eventProcessedInCycle:
             self.update_affective_state()
         if self.isAffectRelevantEvent(self.currentEvent):
-            self.Mem.append(self.currentEvent)
+            self.remember_event(self.currentEvent)
         self.current_step_ast = "SelCs"
         return True
 
@@ -341,6 +350,8 @@ class DefaultEngine(EmotionalEngine):
 
 
 class PairEventDesirability:
+    __slots__ = ("event", "av")
+
     def __init__(self, event):
         self.event = event
         self.av = {}
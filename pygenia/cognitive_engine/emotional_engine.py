@@ -14,6 +14,7 @@ from pygenia.cognitive_engine.temporal_information import (
     TemporalAffectiveInformation,
 )
 from pygenia.cognitive_engine.circumstance import Circumstance
+from pygenia.cognitive_engine.affective_memory import AffectiveMemory
 
 
 class EmotionalEngine:
@@ -27,6 +28,8 @@ class EmotionalEngine:
         self.agent = agent
         self.affective_lavels = []
         self.concern_value = None
+        # Affectively relevant events (see set_memory)
+        self.Mem = AffectiveMemory()
 
     def set_agent(self, agent):
         self.agent = agent
@@ -108,6 +111,16 @@ class EmotionalEngine:
         if not isinstance(term, agentspeak.Literal):
             raise AslError("expected concern literal, got: '%s'" % term)
 
+        # The value of the concern itself, with no bindings, is cached until
+        # a belief it depends on changes.
+        cache_key = None
+        if term is concern.head and not intention.scope:
+            cache_key = self.agent.concern_cache_key(concern)
+            if cache_key is not None:
+                cached = self.agent.concern_cache.get(concern)
+                if cached is not None and cached[0] == cache_key:
+                    return cached[1]
+
         query = TermQuery(term)
 
         try:
@@ -115,13 +128,34 @@ class EmotionalEngine:
             concern_value = " ".join(
                 asl_str(agentspeak.freeze(t, intention.scope, {})) for t in term.args
             )
-            return concern_value
         except StopIteration:
-            return False
+            concern_value = False
+
+        if cache_key is not None:
+            self.agent.concern_cache[concern] = (cache_key, concern_value)
+        return concern_value
 
     def set_event_queue(self, event_queue):
         self.event_queue = event_queue
 
+    def set_memory(self, memory):
+        self.Mem = memory
+
+    def remember_event(self, event, concern_value=None):
+        """
+        This method is used to add an affectively relevant event to the affective memory
+
+        Args:
+            event (tuple): The appraised event
+            concern_value (float): Concern value of the event, if any
+        """
+        self.Mem.append(
+            event,
+            self.agent.env.time(),
+            concern_value,
+            self.affective_info.get_mood().get_affective_labels(),
+        )
+
     def set_concerns(self, concerns):
         self.concerns = concerns
 
@@ -142,19 +176,59 @@ class EmotionalEngine:
         )
 
     def get_concern_value(self):
-        print("---___", self.concern_value)
         return self.concern_value
 
 
 class Concern:
     """
     This class is used to represent the concern of the agent
+
+    Args:
+        head (Literal): Head of the concern
+        query (Query): Compiled body of the concern
+        variables (dict): Variables of the head and the body of the concern
+        dependencies (frozenset): (functor, arity) of the beliefs read by the
+            concern, None if they are unknown (see ConcernDependencyVisitor)
+        cacheable (bool): True if the value of the concern only depends on the
+            beliefs of its dependencies, so it can be cached between belief changes
     """
 
-    def __init__(self, head, query):
+    __slots__ = ("head", "query", "variables", "dependencies", "cacheable")
+
+    def __init__(
+        self, head, query, variables=None, dependencies=None, cacheable=False
+    ):
         self.head = head
         self.query = query
-        self.predicates = None
+        self.variables = tuple(variables.values()) if variables else ()
+        self.dependencies = dependencies
+        self.cacheable = cacheable and dependencies is not None
+
+    def depends_on(self, term) -> bool:
+        """
+        This method is used to know if a belief can change the value of the concern
+
+        Args:
+            term (Literal): The belief
+
+        Returns:
+            bool: True if the concern reads the belief or its dependencies are unknown, False otherwise
+        """
+        if self.dependencies is None:
+            return True
+        return (term.functor, len(term.args)) in self.dependencies
+
+    def is_bound(self, scope) -> bool:
+        """
+        This method is used to know if any variable of the concern is bound
+
+        Args:
+            scope (dict): Scope of the evaluation
+
+        Returns:
+            bool: True if the concern can not be evaluated in place, False otherwise
+        """
+        return any(var in scope for var in self.variables)
 
     def __str__(self):
         return "%s :- %s" % (self.head, self.query)
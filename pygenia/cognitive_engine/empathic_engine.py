@@ -7,7 +7,7 @@ import agentspeak.runtime
 import agentspeak.stdlib
 import agentspeak.util
 from pygenia.emotion_models.affective_state import AffectiveState
-from pygenia.emotion_models.pa import Point
+from pygenia.emotion_models.point import Point
 
 
 LOGGER = agentspeak.get_logger(__name__)
@@ -21,7 +21,6 @@ class EmpathicEngine(EmotionalEngine):
         self.target = None
         self.interaction_value = None
         self.empathic_concern_value = None
-        self.Mem = []
         self.empathic_emotions = []
         self.selected_emotions = []
 
@@ -45,9 +44,18 @@ class EmpathicEngine(EmotionalEngine):
             "UpAs": self.applyUpdateAffState,
         }
 
+        profiler = self.agent.profiler
         flag = True
         while flag == True and self.current_step_ast in options:
-            flag = options[self.current_step_ast]()
+            if profiler is None:
+                flag = options[self.current_step_ast]()
+            else:
+                flag = profiler.call(
+                    self.agent.name,
+                    "affective",
+                    self.current_step_ast,
+                    options[self.current_step_ast],
+                )
 
         return True
 
@@ -64,7 +72,6 @@ class EmpathicEngine(EmotionalEngine):
 
                 if self.is_affective_relevant(self.event):
 
-                    self.Mem.append(self.event)
                     if self.target not in ["self", None]:
                         self.agent.update_affective_link(
                             self.target, self.interaction_value
@@ -110,7 +117,7 @@ class EmpathicEngine(EmotionalEngine):
         return True
 
     def empathic_appraisal(self):
-        affective_link = self.agent.get_other(self.target)["affective_link"]
+        affective_link = self.agent.get_affective_link(self.target)
         """
         self.empathic_concern_value = (
             self.concern_value
@@ -132,9 +139,7 @@ class EmpathicEngine(EmotionalEngine):
 
     def empathic_regulation(self):
         regulated_emotions = []
-        affective_link = affective_link = self.agent.get_other(self.target)[
-            "affective_link"
-        ]
+        affective_link = self.agent.get_affective_link(self.target)
         for emotion in self.affective_info.get_elicited_emotions():
             regulated_emotion: Point = self.agent.personality.emotion_regulation(
                 emotion
@@ -180,6 +185,8 @@ class EmpathicEngine(EmotionalEngine):
         """
         if self.eventProcessedInCycle:
             self.update_affective_state()
+            # Remembered once the affective state reflects the event
+            self.remember_event(self.currentEvent, self.concern_value)
         return False
 
     def appraisal(self, event, concern_value, concerns):
@@ -357,7 +364,7 @@ class EmpathicEngine(EmotionalEngine):
         concern = concerns[("concern__", 1)][0]
 
         if concern != None:
-            if event[0].functor in concern.predicates:
+            if concern.depends_on(event[0]):
                 if event[1].name == "addition":
                     # adding the new literal if the event is an addition of a belief
                     concernVal = self.applyConcernForAddition(event, concern)
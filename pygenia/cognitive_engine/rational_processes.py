@@ -47,6 +47,10 @@ class RationalCycle:
             "CtlInt": self.applyCtlInt,
             "ExecInt": self.applyExecInt,
         }
+        profiler = self.agent.profiler
+        if profiler is not None:
+            return self._profiled_step(profiler, options)
+
         if self.current_step == "SelInt":
             if not options[self.current_step]():
                 return False
@@ -57,6 +61,24 @@ class RationalCycle:
         else:
             return True
 
+    def _profiled_step(self, profiler, options):
+        # Same as step, timing each step with the profiler of the agent.
+        if self.current_step == "SelInt":
+            if not profiler.call(
+                self.agent.name, "rational", "SelInt", options["SelInt"]
+            ):
+                return False
+
+        if self.current_step in options:
+            return profiler.call(
+                self.agent.name,
+                "rational",
+                self.current_step,
+                options[self.current_step],
+            )
+        else:
+            return True
+
     def applySemanticRuleDeliberate(
         self, delayed=False, calling_intention=agentspeak.runtime.Intention
     ):
@@ -77,12 +99,20 @@ class RationalCycle:
             "AddIM": self.applyAddIM,
         }
 
+        profiler = self.agent.profiler
         flag = True
         while flag == True and self.current_step in options:
-            if self.current_step == "AddIM":
-                flag = options[self.current_step](delayed, calling_intention)
+            args = (delayed, calling_intention) if self.current_step == "AddIM" else ()
+            if profiler is None:
+                flag = options[self.current_step](*args)
             else:
-                flag = options[self.current_step]()
+                flag = profiler.call(
+                    self.agent.name,
+                    "rational",
+                    self.current_step,
+                    options[self.current_step],
+                    *args
+                )
         return True
 
     def applySelEv(self) -> bool:
@@ -95,11 +125,9 @@ class RationalCycle:
         # self.term = self.ast_goal.atom.accept(agentspeak.runtime.BuildTermVisitor({}))
         # if "E" in self.C and len(self.C["E"]) > 0:
         if self.circumstance.get_num_events() > 0:
-            # Select one event from the list of events and remove it from the list without using pop
-            event = self.circumstance.get_event_at_index(0)
+            # Select the oldest event and remove it from the queue
+            event = self.circumstance.pop_event()
             self.set_event(event)
-            # self.C["E"] = self.C["E"][1:]
-            self.circumstance.remove_event_at_index(0)
             self.frozen = agentspeak.freeze(
                 event.head, agentspeak.runtime.Intention().scope, {}
             )
@@ -114,33 +142,30 @@ class RationalCycle:
     def applyRelPl(self) -> bool:
         """
         This method is used to find the plans that are related to the current goal.
-        We say that a plan is related to a goal if both have the same functor
+        We say that a plan is related to a goal if both have the same trigger,
+        goal type, functor and number of arguments
 
         Returns:
             bool: True if the plans were found, False otherwise
 
-        - If the plans were found, the dictionary T["R"] will be filled with the plans found and the current step will be changed to "AppPl"
+        - The plans are looked up in the plan index of the agent (agent.plans),
+          which add_plan keys by (trigger, goal_type, functor, arity)
+        - If the plans were found, the list T["R"] will be filled with the plans found and the current step will be changed to "AppPl"
         - If not plans were found, the current step will be changed to "SelEv" to select a new event
         """
-        plans = self.agent.plans.values()
-        RelPlan = collections.defaultdict(lambda: [])
-        # TODO plans was self.plans.values()
-        for plan in plans:
-            for differents in plan:
-                if self.get_event().head.functor in differents.head.functor:
-                    RelPlan[
-                        (
-                            differents.trigger,
-                            differents.goal_type,
-                            differents.head.functor,
-                            len(differents.head.args),
-                        )
-                    ].append(differents)
-
-        if not RelPlan:
+        relevant_plans = self.agent.plans.get(
+            (
+                self.get_event().trigger,
+                self.get_event().goal_type,
+                self.frozen.functor,
+                len(self.frozen.args),
+            )
+        )
+
+        if not relevant_plans:
             self.current_step = "SelEv"
             return False
-        self.set_relevant_plans(RelPlan)
+        self.set_relevant_plans(relevant_plans)
         self.current_step = "AppPl"
         return True
 
@@ -159,14 +184,7 @@ class RationalCycle:
         - The current step will be changed to "SelAppl"
         - If not applicable plans were found, return False
         """
-        plans_list = self.get_relevant_plans()[
-            (
-                self.get_event().trigger,
-                self.get_event().goal_type,
-                self.frozen.functor,  # TODO frozen_functor was self.frozen.functor,
-                len(self.frozen.args),  # TODO frozen_args was (self.frozen.args,
-            )
-        ]
+        plans_list = self.get_relevant_plans()
 
         applicable_plans = [plan for plan in plans_list if self.check_affect(plan)]
         self.set_applicable_plans(applicable_plans)
@@ -200,6 +218,8 @@ class RationalCycle:
             ):
                 for _ in plan.context.execute(self.agent, self.get_intention()):
                     self.set_applicable_plan(plan)
+                    if self.agent.tracer is not None:
+                        self.agent.tracer.select_plan(self.agent, plan)
                     self.current_step = "AddIM"
                     return True
         return False
@@ -237,6 +257,9 @@ class RationalCycle:
         """
         This method is used to select the intention to execute
 
+        Runnable intention stacks are selected in round robin, the ones that
+        wait are skipped until their waiter fires (see Circumstance.select_intention).
+
         Raises:
             RuntimeError:  If the agent has no intentions
 
@@ -248,30 +271,10 @@ class RationalCycle:
 
         """
 
-        while (
-            self.circumstance.get_intentions()
-            and not self.circumstance.get_intentions()[0]
-        ):
-            self.circumstance.set_intentions(
-                self.circumstance.get_intentions().popleft()
-            )
-        # while self.C["I"] and not self.C["I"][0]:
-        # self.C["I"].popleft()
-        for intention_stack in self.circumstance.get_intentions():
-            if not intention_stack:
-                continue
-            intention = intention_stack[-1]
-            if intention.waiter is not None:
-                if intention.waiter.poll(self.agent.env):
-                    intention.waiter = None
-                else:
-                    continue
-            break
-        else:
-            return False
-
-        if not intention_stack:
+        intention_stack = self.circumstance.select_intention(self.agent.env)
+        if intention_stack is None:
             return False
+        intention = intention_stack[-1]
 
         instr = intention.instr
         self.intention_stack = intention_stack
@@ -297,6 +300,9 @@ class RationalCycle:
 
         try:
             if self.intention_selected.instr.f(self.agent, self.intention_selected):
+                # Index the intention if the instruction made it wait (.wait)
+                if self.intention_selected.waiter is not None:
+                    self.agent.register_waiter(self.intention_selected)
                 # We set the intention.instr to the instr.success
                 self.intention_selected.instr = self.intention_selected.instr.success
             else:
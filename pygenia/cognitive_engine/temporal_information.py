@@ -1,5 +1,4 @@
 from pygenia.emotion_models.pad import PAD
-from pygenia.emotion_models.pa import PAModel
 
 
 class TemporalRationalInformation:
@@ -80,6 +79,17 @@ class TemporalRationalInformation:
 
 
 class TemporalAffectiveInformation:
+    __slots__ = (
+        "temp_beliefs",
+        "Temp_beliefs",
+        "appraisal_variables",
+        "coping_strategies",
+        "appraised_emotions",
+        "elicited_emotions",
+        "mood",
+        "event",
+    )
+
     def __init__(self, affst_cls=PAD):
         self.temp_beliefs = {"Ba": [], "Br": [], "st": None}
         self.appraisal_variables = None
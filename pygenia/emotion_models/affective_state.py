@@ -6,11 +6,16 @@ class AffectiveState:
     This class is used to represent the affective state of the agent
     """
 
+    __slots__ = ("affective_labels", "population", "slot")
+
     components = None
     affectiveLabels = None
 
     def __init__(self):
         self.affective_labels = []
+        # Population store holding the mood, if any (see PopulationStore)
+        self.population = None
+        self.slot = None
 
     def update_affective_state(self, affective_info):
         """
@@ -31,5 +36,60 @@ class AffectiveState:
     def clone(self):
         pass
 
+    def bind_population(self, population):
+        """
+        This method is used to move the mood into a population store
+
+        Args:
+            population (PopulationStore): The population store
+        """
+        pass
+
+    @staticmethod
+    def batch_update_affective_state(values, emotions):
+        """
+        This method is used to update many moods at once
+
+        Args:
+            values (np.ndarray): (n, 3) pleasure, arousal and dominance of the moods
+            emotions (np.ndarray): (n, 3) pleasure, arousal and dominance of the emotions
+
+        Returns:
+            np.ndarray: (n, 3) updated moods
+        """
+        return values
+
+    def label_key(self):
+        """
+        This method is used to know which moods can be labelled together
+
+        Returns:
+            Hashable: Moods with the same key share their labelling parameters
+        """
+        return None
+
+    def batch_labels(self, values):
+        """
+        This method is used to get the affective labels of many moods
+
+        Args:
+            values (np.ndarray): (n, 3) pleasure, arousal and dominance of the moods
+
+        Returns:
+            list: The affective labels of each mood
+        """
+        return [[] for _ in values]
+
+    def get_values(self):
+        """
+        This method is used to get the dimensions of the affective state
+
+        Returns:
+            tuple: Pleasure, arousal and dominance, None if the model has no dimensions
+        """
+        return None
+
     def get_affective_labels(self):
+        if self.population is not None:
+            self.population.flush(self.slot)
         return self.affective_labels
@@ -1,35 +1,203 @@
+import copy
+import functools
 import math
 import os
-import pandas as pd
 import numpy as np
-from scipy.special import iv
 from pygenia.emotion_models.affective_state import AffectiveState
+from pygenia.emotion_models.point import Point
+from pygenia.language_models import read_table
+from pygenia.emotion_models.population import mask_labels
 
 this_path = os.path.dirname(os.path.abspath(__file__))
 
 
-class Point:
-    def __init__(self, pleasure, arousal):
-        self.pleasure = pleasure
-        self.arousal = arousal
+class PopulationPoint(Point):
+    """
+    This class is used to represent a point stored in a population store.
 
-    def set_pleasure(self, pleasure):
-        self.pleasure = pleasure
+    Args:
+        population (PopulationStore): The population store
+        slot (int): Row of the point in the store
+    """
 
-    def set_arousal(self, arousal):
-        self.arousal = arousal
+    __slots__ = ("population", "slot")
 
-    def get_pleasure(self):
-        return self.pleasure
+    def __init__(self, population, slot):
+        self.population = population
+        self.slot = slot
 
-    def get_arousal(self):
-        return self.arousal
+    @property
+    def pleasure(self):
+        self.population.flush(self.slot)
+        return float(self.population.values[self.slot, 0])
 
-    def __str__(self):
-        return f"({self.pleasure}, {self.arousal})"
+    @pleasure.setter
+    def pleasure(self, pleasure):
+        self.population.flush(self.slot)
+        self.population.values[self.slot, 0] = pleasure
 
-    def __repr__(self):
-        return f"Point({self.pleasure}, {self.arousal})"
+    @property
+    def arousal(self):
+        self.population.flush(self.slot)
+        return float(self.population.values[self.slot, 1])
+
+    @arousal.setter
+    def arousal(self, arousal):
+        self.population.flush(self.slot)
+        self.population.values[self.slot, 1] = arousal
+
+
+def bessel_i0(x):
+    # scipy is only imported when a PA language model is used
+    from scipy.special import iv
+
+    return iv(0, x)
+
+
+def von_mises(x, mu, kappa):
+    return np.exp(kappa * np.cos(x - mu)) / (2 * np.pi * bessel_i0(kappa))
+
+
+def read_only(array):
+    array = np.asarray(array, dtype=float)
+    array.flags.writeable = False
+    return array
+
+
+class PALanguageModel:
+    """
+    This class is used to represent the tables of a PA language model and its
+    fuzzy sets compiled into arrays.
+
+    Language models are loaded once per process by load_language_model and
+    shared by every agent that uses the same language, so they must not be
+    modified.
+
+    Args:
+        language (str): Name of the language model
+    """
+
+    def __init__(self, language):
+        self.language = language
+        self.emotion_parameters = read_table(
+            os.path.join(
+                this_path, "pa_language_models/emotion_label/" + language + ".csv"
+            )
+        )
+        self.intensity_parameters = read_table(
+            os.path.join(
+                this_path,
+                "pa_language_models/emotion_intensity/" + language + ".csv",
+            )
+        )
+        self.appraisal_parameters = read_table(
+            os.path.join(
+                this_path,
+                "pa_language_models/appraisal_variables/" + language + ".csv",
+            )
+        )
+        self.stimate_min_max()
+        self.compile_fuzzy_sets()
+
+    def stimate_min_max(self):
+        x_values = np.linspace(0, 2 * np.pi, 100)
+        max_values = []
+        min_values = []
+        for i in range(len(self.emotion_parameters["label"])):
+            y_values = von_mises(
+                x_values,
+                self.emotion_parameters["mean"][i],
+                1 / self.emotion_parameters["sd"][i],
+            )
+            max_values.append(np.max(y_values))
+            min_values.append(np.min(y_values))
+        self.emotion_parameters = self.emotion_parameters.with_columns(
+            max=max_values, min=min_values
+        )
+
+    def compile_fuzzy_sets(self):
+        """
+        This method is used to precompute the parameters of the emotion and
+        intensity fuzzy sets as arrays, so that fuzzification is a single
+        vectorized evaluation
+        """
+        self.emotion_labels = self.emotion_parameters["label"].tolist()
+        self.emotion_means = read_only(self.emotion_parameters["mean"])
+        self.emotion_kappas = read_only(1 / self.emotion_parameters["sd"])
+        self.emotion_normalizers = read_only(2 * np.pi * bessel_i0(self.emotion_kappas))
+        self.emotion_min = read_only(self.emotion_parameters["min"])
+        self.emotion_max = read_only(self.emotion_parameters["max"])
+
+        self.intensity_labels = self.intensity_parameters["label"].tolist()
+        self.intensity_a = read_only(self.intensity_parameters["a"])
+        self.intensity_d = read_only(self.intensity_parameters["d"])
+        self.intensity_rise = read_only(
+            self.intensity_parameters["b"] - self.intensity_parameters["a"]
+        )
+        self.intensity_fall = read_only(
+            self.intensity_parameters["d"] - self.intensity_parameters["c"]
+        )
+
+    def intensity_membership(self, points):
+        """
+        This method is used to evaluate the trapezoidal intensity fuzzy sets
+
+        Args:
+            points (np.ndarray): (n, 2) array of (pleasure, arousal) points
+
+        Returns:
+            np.ndarray: (n, len(intensity_labels)) membership values
+        """
+        intensity = (
+            np.round(
+                np.sqrt(points[:, 0] * points[:, 0] + points[:, 1] * points[:, 1])
+                * 1000.0
+            )
+            / 1000.0
+        )[:, None]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rise = np.where(
+                self.intensity_rise > 0,
+                (intensity - self.intensity_a) / self.intensity_rise,
+                math.inf,
+            )
+            fall = np.where(
+                self.intensity_fall > 0,
+                (self.intensity_d - intensity) / self.intensity_fall,
+                math.inf,
+            )
+        return np.maximum(np.minimum(np.minimum(rise, 1), fall), 0)
+
+    def emotion_membership(self, points):
+        """
+        This method is used to evaluate the normalized von Mises emotion fuzzy sets
+
+        Args:
+            points (np.ndarray): (n, 2) array of (pleasure, arousal) points
+
+        Returns:
+            np.ndarray: (n, len(emotion_labels)) membership values
+        """
+        degree = np.arctan2(points[:, 1], points[:, 0])[:, None]
+        y_values = (
+            np.exp(self.emotion_kappas * np.cos(degree - self.emotion_means))
+            / self.emotion_normalizers
+        )
+        return (y_values - self.emotion_min) / (self.emotion_max - self.emotion_min)
+
+
+@functools.lru_cache(maxsize=None)
+def load_language_model(language):
+    """
+    This function is used to get the shared PA language model of a language
+
+    Args:
+        language (str): Name of the language model
+
+    Returns:
+        PALanguageModel: The language model, parsed on first use
+    """
+    return PALanguageModel(language)
 
 
 class PAModel(AffectiveState):
@@ -38,7 +206,9 @@ class PAModel(AffectiveState):
         self.mood = Point(pleasure=0.0, arousal=0.0)
         self.emotion_parameters = None
         self.intensity_parameters = None
+        self.appraisal_parameters = None
         self.affective_labels = []
+        self.language_model = None
 
     def init_parameters(
         self,
@@ -54,26 +224,10 @@ class PAModel(AffectiveState):
                 "PA parameters must have 1 components give: '%d'" % len(parameters)
             )
 
-        self.emotion_parameters = self.load_csv(
-            os.path.join(
-                this_path, "pa_language_models/emotion_label/" + parameters[0] + ".csv"
-            )
-        )
-
-        self.intensity_parameters = self.load_csv(
-            os.path.join(
-                this_path,
-                "pa_language_models/emotion_intensity/" + parameters[0] + ".csv",
-            )
-        )
-
-        self.appraisal_parameters = self.load_csv(
-            os.path.join(
-                this_path,
-                "pa_language_models/appraisal_variables/" + parameters[0] + ".csv",
-            )
-        )
-        self.stimate_min_max()
+        self.language_model = load_language_model(parameters[0])
+        self.emotion_parameters = self.language_model.emotion_parameters
+        self.intensity_parameters = self.language_model.intensity_parameters
+        self.appraisal_parameters = self.language_model.appraisal_parameters
 
     def estimate_emotion(self, affective_info):
         affective_info.set_elicited_emotions(
@@ -85,6 +239,14 @@ class PAModel(AffectiveState):
         This method is used to update the affective state
 
         """
+        if self.population is not None:
+            # Queued and applied by PopulationStore.step
+            if len(emotions) > 0:
+                self.population.submit(
+                    self.slot, (emotions[0].pleasure, emotions[0].arousal, 0.0)
+                )
+            return
+
         if len(emotions) > 0:
             emotion = emotions[0]
             w_mood = 1
@@ -108,7 +270,7 @@ class PAModel(AffectiveState):
         ):
 
             pleasure, arousal = self.calculate_coordinates(
-                magnitude=0.5, angle=self.appraisal_parameters["angle"].iloc[0]
+                magnitude=0.5, angle=self.appraisal_parameters["angle"][0]
             )
             emotion.set_pleasure(emotion.get_pleasure() + pleasure)
             emotion.set_arousal(emotion.get_arousal() + arousal)
@@ -119,26 +281,26 @@ class PAModel(AffectiveState):
             if affective_info.get_appraisal_variables()["desirability"] > 0.5:
                 if affective_info.get_appraisal_variables()["likelihood"] < 1:
                     pleasure, arousal = self.calculate_coordinates(
-                        magnitude=0.5, angle=self.appraisal_parameters["angle"].iloc[1]
+                        magnitude=0.5, angle=self.appraisal_parameters["angle"][1]
                     )
                     emotion.set_pleasure(emotion.get_pleasure() + pleasure)
                     emotion.set_arousal(emotion.get_arousal() + arousal)
                 elif affective_info.get_appraisal_variables()["likelihood"] == 1:
                     pleasure, arousal = self.calculate_coordinates(
-                        magnitude=0.5, angle=self.appraisal_parameters["angle"].iloc[2]
+                        magnitude=0.5, angle=self.appraisal_parameters["angle"][2]
                     )
                     emotion.set_pleasure(emotion.get_pleasure() + pleasure)
                     emotion.set_arousal(emotion.get_arousal() + arousal)
             else:
                 if affective_info.get_appraisal_variables()["likelihood"] < 1:
                     pleasure, arousal = self.calculate_coordinates(
-                        magnitude=0.5, angle=self.appraisal_parameters["angle"].iloc[3]
+                        magnitude=0.5, angle=self.appraisal_parameters["angle"][3]
                     )
                     emotion.set_pleasure(emotion.get_pleasure() + pleasure)
                     emotion.set_arousal(emotion.get_arousal() + arousal)
                 elif affective_info.get_appraisal_variables()["likelihood"] == 1:
                     pleasure, arousal = self.calculate_coordinates(
-                        magnitude=0.5, angle=self.appraisal_parameters["angle"].iloc[4]
+                        magnitude=0.5, angle=self.appraisal_parameters["angle"][4]
                     )
                     emotion.set_pleasure(emotion.get_pleasure() + pleasure)
                     emotion.set_arousal(emotion.get_arousal() + arousal)
@@ -153,7 +315,7 @@ class PAModel(AffectiveState):
                     > 0.7
                 ):
                     pleasure, arousal = self.calculate_coordinates(
-                        magnitude=0.5, angle=self.appraisal_parameters["angle"].iloc[5]
+                        magnitude=0.5, angle=self.appraisal_parameters["angle"][5]
                     )
                     emotion.set_pleasure(emotion.get_pleasure() + pleasure)
                     emotion.set_arousal(emotion.get_arousal() + arousal)
@@ -182,9 +344,78 @@ class PAModel(AffectiveState):
         pass
 
     def clone(self):
-        pass
+        """
+        This method is used to clone the PA model
+
+        The language model is shared with the clone.
+
+        Returns:
+            PAModel: Cloned PA model
+        """
+        model = copy.copy(self)
+        model.mood = Point(pleasure=self.mood.pleasure, arousal=self.mood.arousal)
+        model.affective_labels = list(self.affective_labels)
+        model.population = None
+        model.slot = None
+        return model
+
+    def bind_population(self, population):
+        """
+        This method is used to move the mood into a population store
+
+        Args:
+            population (PopulationStore): The population store
+        """
+        if self.population is not None:
+            return
+        self.slot = population.bind(self, (self.mood.pleasure, self.mood.arousal, 0.0))
+        self.population = population
+        self.mood = PopulationPoint(population, self.slot)
+
+    @staticmethod
+    def batch_update_affective_state(values, emotions, w_mood=1, w_emotion=0.5):
+        """
+        This method is used to update many moods at once, with the same
+        weighted vector sum as update_affective_state
+
+        Args:
+            values (np.ndarray): (n, 3) moods, only pleasure and arousal are used
+            emotions (np.ndarray): (n, 3) emotions, only pleasure and arousal are used
+            w_mood (float): Weight of the moods
+            w_emotion (float): Weight of the emotions
+
+        Returns:
+            np.ndarray: (n, 3) updated moods
+        """
+        values = values.copy()
+        sums = values[:, :2] * w_mood + emotions[:, :2] * w_emotion
+        max_magnitude = np.max(np.abs(sums), axis=1, keepdims=True)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            sums = np.where(max_magnitude > 1, sums * (1 / max_magnitude), sums)
+        values[:, :2] = np.clip(sums, -1, 1)
+        return values
+
+    def label_key(self):
+        return id(self.language_model)
+
+    def batch_labels(self, values):
+        """
+        This method is used to get the emotion labels of many moods
+
+        Args:
+            values (np.ndarray): (n, 3) moods, only pleasure and arousal are used
+
+        Returns:
+            list: The best emotion labels of each mood
+        """
+        return self.fuzzify_emotion(values[:, :2])
+
+    def get_values(self):
+        return (self.mood.pleasure, self.mood.arousal, 0.0)
 
     def get_affective_labels(self):
+        if self.population is not None:
+            self.population.flush(self.slot)
         return self.affective_labels
 
     def emotion_degree(self, vector: Point):
@@ -203,109 +434,81 @@ class PAModel(AffectiveState):
             / 1000.0
         )
 
-    def load_csv(self, path):
-        return pd.read_csv(path, header=0)
+    @staticmethod
+    def as_points(vector):
+        """
+        This method is used to convert a point or a batch of points to an array
 
-    def stimate_min_max(self):
-        x_values = np.linspace(0, 2 * np.pi, 100)
-        max_values = []
-        min_values = []
-        for i in range(len(self.emotion_parameters["label"])):
-            y_values = self.von_mises(
-                x_values,
-                self.emotion_parameters["mean"].iloc[i],
-                1 / self.emotion_parameters["sd"].iloc[i],
-            )
-            max_values.append(np.max(y_values))
-            min_values.append(np.min(y_values))
-        self.emotion_parameters.loc[:, "max"] = max_values
-        self.emotion_parameters.loc[:, "min"] = min_values
-
-    def fuzzify_intensity(self, vector: Point):
-        intensity = self.emotion_intensity(vector)
-        values = []
-        for i in range(len(self.intensity_parameters["label"])):
-            values.append(
-                np.max(
-                    [
-                        np.min(
-                            [
-                                (
-                                    (intensity - self.intensity_parameters["a"].iloc[i])
-                                    / (
-                                        self.intensity_parameters["b"].iloc[i]
-                                        - self.intensity_parameters["a"].iloc[i]
-                                    )
-                                    if self.intensity_parameters["b"].iloc[i]
-                                    - self.intensity_parameters["a"].iloc[i]
-                                    > 0
-                                    else math.inf
-                                ),
-                                1,
-                                (
-                                    (self.intensity_parameters["d"].iloc[i] - intensity)
-                                    / (
-                                        self.intensity_parameters["d"].iloc[i]
-                                        - self.intensity_parameters["c"].iloc[i]
-                                    )
-                                    if self.intensity_parameters["d"].iloc[i]
-                                    - self.intensity_parameters["c"].iloc[i]
-                                    > 0
-                                    else math.inf
-                                ),
-                            ]
-                        ),
-                        0,
-                    ]
-                )
-            )
-        df_result = self.intensity_parameters.copy()[["label"]]
-        df_result.loc[:, "values"] = values
-        return df_result[df_result["values"] == df_result["values"].max()][
-            "label"
-        ].tolist()
-
-    def fuzzify_emotion(self, vector: Point):
-        degree = self.emotion_degree(vector)
-        values = []
-        for i in range(len(self.emotion_parameters["label"])):
-            y_value = self.von_mises(
-                degree,
-                self.emotion_parameters["mean"].iloc[i],
-                1 / self.emotion_parameters["sd"].iloc[i],
-            )
-            nomalized_y_value = (y_value - self.emotion_parameters["min"].iloc[i]) / (
-                self.emotion_parameters["max"].iloc[i]
-                - self.emotion_parameters["min"].iloc[i]
-            )
-            values.append(nomalized_y_value)
+        Args:
+            vector (Union[Point, array-like]): A point or an (n, 2) batch of (pleasure, arousal) points
 
-        df_result = self.emotion_parameters.copy()[["label"]]
-        df_result.loc[:, "values"] = values
-        return df_result[df_result["values"] == df_result["values"].max()][
-            "label"
-        ].tolist()
+        Returns:
+            Tuple[np.ndarray, bool]: The (n, 2) array and True if a single point was given
+        """
+        if isinstance(vector, Point):
+            return np.array([[vector.pleasure, vector.arousal]], dtype=float), True
+        return np.asarray(vector, dtype=float).reshape(-1, 2), False
 
-    def defuzzify_emotion(self, emotion: str, intensity: str):
-        angle = (
-            self.emotion_parameters.loc[self.emotion_parameters["label"] == emotion][
-                ["mean"]
-            ]
-            .iloc[0]
-            .iloc[0]
+    @staticmethod
+    def best_labels(labels, values, single):
+        """
+        This method is used to get the labels with the highest membership
+
+        Args:
+            labels (list): Labels of the fuzzy sets
+            values (np.ndarray): (n, len(labels)) membership values
+            single (bool): True to return the labels of a single point
+
+        Returns:
+            list: The best labels, or a list of them for each point
+        """
+        best = values == np.nanmax(values, axis=1, keepdims=True)
+        if single:
+            return [labels[i] for i in np.flatnonzero(best[0])]
+        return mask_labels(labels, best)
+
+    def fuzzify_intensity(self, vector):
+        """
+        This method is used to get the intensity labels of one or many points
+
+        Args:
+            vector (Union[Point, array-like]): A point or an (n, 2) batch of (pleasure, arousal) points
+
+        Returns:
+            list: The best intensity labels, or a list of them for each point
+        """
+        points, single = self.as_points(vector)
+        return self.best_labels(
+            self.language_model.intensity_labels,
+            self.language_model.intensity_membership(points),
+            single,
         )
 
+    def fuzzify_emotion(self, vector):
+        """
+        This method is used to get the emotion labels of one or many points
+
+        Args:
+            vector (Union[Point, array-like]): A point or an (n, 2) batch of (pleasure, arousal) points
+
+        Returns:
+            list: The best emotion labels, or a list of them for each point
+        """
+        points, single = self.as_points(vector)
+        return self.best_labels(
+            self.language_model.emotion_labels,
+            self.language_model.emotion_membership(points),
+            single,
+        )
+
+    def defuzzify_emotion(self, emotion: str, intensity: str):
+        angle = self.language_model.emotion_means[
+            self.language_model.emotion_labels.index(emotion)
+        ]
+
+        i = self.language_model.intensity_labels.index(intensity)
         magnitude = (
-            self.intensity_parameters.loc[
-                self.intensity_parameters["label"] == intensity
-            ][["b"]]
-            .iloc[0]
-            .iloc[0]
-            + self.intensity_parameters.loc[
-                self.intensity_parameters["label"] == intensity
-            ][["c"]]
-            .iloc[0]
-            .iloc[0]
+            self.intensity_parameters["b"][i] + self.intensity_parameters["c"][i]
         ) / 2
         return self.calculate_coordinates(magnitude, angle)
 
@@ -316,4 +519,4 @@ class PAModel(AffectiveState):
         return x_coordinate, y_coordinate
 
     def von_mises(self, x, mu, kappa):
-        return np.exp(kappa * np.cos(x - mu)) / (2 * np.pi * iv(0, kappa))
+        return von_mises(x, mu, kappa)
@@ -1,15 +1,133 @@
+import collections.abc
+import copy
 from enum import Enum
 import math
-import numpy as np
 
 from pygenia.emotion_models.affective_state import AffectiveState
 
 
+def sign(value):
+    # numpy.sign of a number, NaN included
+    if value != value:
+        return value
+    return (value > 0) - (value < 0)
+
+
+class AffectiveCategories:
+    """
+    This class is used to represent the affective categories of a PAD
+    compiled into arrays, so many moods are labelled with one containment
+    test against every category at once. A single mood is tested against
+    flat tuples of the same bounds, cheaper than array operations on one row.
+    The arrays (and numpy) are only built when many moods are labelled, by
+    a population store.
+
+    A category is a box with a [min, max] interval for the pleasure, the
+    arousal and the dominance. A category without bounds, or with a number
+    of intervals other than three, contains every mood, as it always has;
+    the latter are reported once, when they are compiled.
+
+    Args:
+        categories (dict): Intervals of each affective category, by label
+
+    Attributes:
+        labels (list): Labels of the categories, in order
+        lower (np.ndarray): (k, 3) lower bounds of the categories
+        upper (np.ndarray): (k, 3) upper bounds of the categories
+        key (str): Value of the categories, equal for equal categories
+    """
+
+    def __init__(self, categories):
+        self.source = categories
+        self.labels = list(categories.keys())
+        self._boxes = []
+        for acl, bounds in categories.items():
+            box = (-math.inf, math.inf) * 3
+            if bounds is not None and len(bounds) != 3:
+                print(
+                    "The number of components for the affective category "
+                    + acl
+                    + " must be the same as the number of the components for the affective state"
+                )
+            elif bounds is not None:
+                box = tuple(float(bound) for interval in bounds for bound in interval)
+            self._boxes.append((acl,) + box)
+        self._bounds = None
+        self.key = repr(sorted(categories.items()))
+
+    @property
+    def lower(self):
+        return self.bounds()[0]
+
+    @property
+    def upper(self):
+        return self.bounds()[1]
+
+    def bounds(self) -> tuple:
+        """
+        This method is used to get the bounds of the categories as arrays
+
+        Returns:
+            tuple: (k, 3) lower bounds and (k, 3) upper bounds of the categories
+        """
+        if self._bounds is None:
+            import numpy as np
+
+            boxes = np.array([box[1:] for box in self._boxes], dtype=float)
+            boxes = boxes.reshape(len(self._boxes), 3, 2)
+            self._bounds = (boxes[:, :, 0], boxes[:, :, 1])
+        return self._bounds
+
+    def contains(self, values) -> "np.ndarray":
+        """
+        This method is used to know which categories contain some moods
+
+        Args:
+            values (np.ndarray): (n, 3) pleasure, arousal and dominance of the moods
+
+        Returns:
+            np.ndarray: (n, k) True where a category contains a mood
+        """
+        values = values[:, None, :]
+        return ((values >= self.lower) & (values <= self.upper)).all(axis=2)
+
+    def label(self, p, a, d) -> list:
+        """
+        This method is used to get the labels of the categories that contain a mood
+
+        Args:
+            p (float): Pleasure of the mood
+            a (float): Arousal of the mood
+            d (float): Dominance of the mood
+
+        Returns:
+            list: Affective category labels
+        """
+        return [
+            label
+            for label, p0, p1, a0, a1, d0, d1 in self._boxes
+            if p0 <= p <= p1 and a0 <= a <= a1 and d0 <= d <= d1
+        ]
+
+
 class PAD(AffectiveState):
     """
     This class is used to represent the PAD of the agent
+
+    The pleasure, the arousal and the dominance are kept in p, a and d, or in
+    a population store once the PAD is bound to one (see bind_population).
     """
 
+    __slots__ = (
+        "p",
+        "a",
+        "d",
+        "displacement",
+        "affRevEventThreshold",
+        "affective_categories",
+        "_categories",
+    )
+
     class PADlabels(Enum):
         pleasure = 0
         arousal = 1
@@ -17,16 +135,12 @@ class PAD(AffectiveState):
 
     def __init__(self):
         super().__init__()
-        self.p = 0.0
-        self.a = 0.0
-        self.d = 0.0
         self.displacement = 0.5
         self.affRevEventThreshold = []
-        self.affective_dimensions = {}
-        self.affective_labels = []
         self.initAffectiveThreshold()
         self.set_affective_dimensions()
         self.affective_categories = None
+        self._categories = None
 
     def init_parameters(self, parameters=None):
         if parameters is not None:
@@ -41,6 +155,24 @@ class PAD(AffectiveState):
                 "happy": [[0, 1], [0, 1], [-1, 1]],
                 "sad": [[-1, 0], [-1, 0], [-1, 1]],
             }
+        self._categories = AffectiveCategories(self.affective_categories)
+
+    def compiled_categories(self) -> AffectiveCategories:
+        """
+        This method is used to get the affective categories compiled into arrays
+
+        The categories are compiled again if affective_categories was
+        replaced, but not if it was changed in place (call init_parameters).
+
+        Returns:
+            AffectiveCategories: The compiled affective categories
+        """
+        if (
+            self._categories is None
+            or self._categories.source is not self.affective_categories
+        ):
+            self._categories = AffectiveCategories(self.affective_categories)
+        return self._categories
 
     def is_affective_relevant(self, event):
         event.evaluate(
@@ -53,26 +185,106 @@ class PAD(AffectiveState):
         """
         This method is used to initialize the affective thresholds of the agent.
         """
-        self.affRevEventThreshold.append(PADExpression(0.8, "or", 0.8, "and", 0.0))
+        # The expression is never changed, so every PAD shares it
+        self.affRevEventThreshold.append(AFFECTIVE_THRESHOLD)
 
     def set_affective_dimensions(self):
         """
-        This method is used to set the affective labels
+        This method is used to set the affective dimensions to a neutral mood
+        """
+        self.p = 0.0
+        self.a = 0.0
+        self.d = 0.0
+
+    @property
+    def affective_dimensions(self):
         """
-        self.affective_dimensions.setdefault(self.PADlabels.pleasure, 0.0)
-        self.affective_dimensions.setdefault(self.PADlabels.arousal, 0.0)
-        self.affective_dimensions.setdefault(self.PADlabels.dominance, 0.0)
+        This method is used to get the dimensions of the PAD as a dict keyed by PADlabels
+
+        Returns:
+            PADDimensions: A view of the pleasure, the arousal and the dominance
+        """
+        return PADDimensions(self)
 
     def clone(self):
         """
         This method is used to clone the PAD
 
+        The thresholds and the affective categories are shared with the clone.
+
         Returns:
             PAD: Cloned PAD
         """
-        pad = self
+        pad = copy.copy(self)
+        pad.p, pad.a, pad.d = self.get_values()
+        pad.affective_labels = list(self.affective_labels)
+        pad.population = None
+        pad.slot = None
         return pad
 
+    def bind_population(self, population):
+        """
+        This method is used to move the PAD into a population store
+
+        Args:
+            population (PopulationStore): The population store
+        """
+        if self.population is not None:
+            return
+        self.slot = population.bind(
+            self, (self.get_pleasure(), self.get_arousal(), self.get_dominance())
+        )
+        self.population = population
+
+    @staticmethod
+    def batch_update_affective_state(values, emotions, displacement=0.5):
+        """
+        This method is used to update many PAD moods at once, with the same
+        pull and push rule as update_affective_state
+
+        Args:
+            values (np.ndarray): (n, 3) pleasure, arousal and dominance of the moods
+            emotions (np.ndarray): (n, 3) pleasure, arousal and dominance of the emotions
+            displacement (float): Displacement of the moods towards the emotions
+
+        Returns:
+            np.ndarray: (n, 3) updated moods
+        """
+        import numpy as np
+
+        same_octant = np.all(np.sign(values) == np.sign(emotions), axis=1)
+        between = np.any(
+            ((values < 0) & (emotions > values)) | ((values > 0) & (emotions < values)),
+            axis=1,
+        )
+        pull = (between | ~same_octant)[:, None]
+        difference = np.where(pull, emotions - values, values - emotions)
+        values = np.clip(values + difference * displacement, -1.0, 1.0)
+        return np.rint(values * 10.0) / 10.0
+
+    def label_key(self):
+        # Agents usually get equal but distinct category dicts, so moods are
+        # grouped by the value of their categories.
+        return self.compiled_categories().key
+
+    def batch_labels(self, values):
+        """
+        This method is used to get the affective category labels of many moods
+        with the affective categories of this PAD
+
+        Args:
+            values (np.ndarray): (n, 3) pleasure, arousal and dominance of the moods
+
+        Returns:
+            list: Affective category labels of each mood.
+        """
+        from pygenia.emotion_models.population import mask_labels
+
+        categories = self.compiled_categories()
+        if not categories.labels:
+            return [[] for _ in values]
+        return mask_labels(categories.labels, categories.contains(values))
+
     @staticmethod
     def sameOctant(as1, as2):
         """
@@ -88,9 +300,9 @@ class PAD(AffectiveState):
         result = False
         if as1 is not None and as2 is not None:
             result = (
-                np.sign(as1.get_pleasure()) == np.sign(as2.get_pleasure())
-                and np.sign(as1.get_arousal()) == np.sign(as2.get_arousal())
-                and np.sign(as1.get_dominance()) == np.sign(as2.get_dominance())
+                sign(as1.get_pleasure()) == sign(as2.get_pleasure())
+                and sign(as1.get_arousal()) == sign(as2.get_arousal())
+                and sign(as1.get_dominance()) == sign(as2.get_dominance())
             )
         return result
 
@@ -135,22 +347,50 @@ class PAD(AffectiveState):
         return result
 
     def get_pleasure(self):
-        return self.affective_dimensions[self.PADlabels.pleasure]
+        if self.population is not None:
+            self.population.flush(self.slot)
+            return float(self.population.values[self.slot, 0])
+        return self.p
 
     def setP(self, p):
-        self.affective_dimensions[self.PADlabels.pleasure] = p
+        if self.population is not None:
+            self.population.flush(self.slot)
+            self.population.values[self.slot, 0] = p
+        else:
+            self.p = p
 
     def get_arousal(self):
-        return self.affective_dimensions[self.PADlabels.arousal]
+        if self.population is not None:
+            self.population.flush(self.slot)
+            return float(self.population.values[self.slot, 1])
+        return self.a
 
     def setA(self, a):
-        self.affective_dimensions[self.PADlabels.arousal] = a
+        if self.population is not None:
+            self.population.flush(self.slot)
+            self.population.values[self.slot, 1] = a
+        else:
+            self.a = a
 
     def get_dominance(self):
-        return self.affective_dimensions[self.PADlabels.dominance]
+        if self.population is not None:
+            self.population.flush(self.slot)
+            return float(self.population.values[self.slot, 2])
+        return self.d
 
     def setD(self, d):
-        self.affective_dimensions[self.PADlabels.dominance] = d
+        if self.population is not None:
+            self.population.flush(self.slot)
+            self.population.values[self.slot, 2] = d
+        else:
+            self.d = d
+
+    def get_values(self):
+        if self.population is not None:
+            self.population.flush(self.slot)
+            p, a, d = self.population.values[self.slot].tolist()
+            return (p, a, d)
+        return (self.p, self.a, self.d)
 
     def estimate_emotion(self, affective_info):
         affective_info.set_elicited_emotions(
@@ -160,7 +400,22 @@ class PAD(AffectiveState):
     def update_affective_state(self, emotions):
         """
         This method is used to update the affective state.
+
+        If the PAD is in a population store, the update is queued and applied
+        by PopulationStore.step.
         """
+        if self.population is not None:
+            if emotions is not None:
+                self.population.submit(
+                    self.slot,
+                    (
+                        emotions.get_pleasure(),
+                        emotions.get_arousal(),
+                        emotions.get_dominance(),
+                    ),
+                )
+            return
+
         self.displacement = 0.5
         calculated_as = (
             emotions
@@ -241,57 +496,7 @@ class PAD(AffectiveState):
         Returns:
             list: Affective category label.
         """
-
-        result = []
-        matches = True
-        r = None
-        for acl in self.affective_categories.keys():
-            matches = True
-            if self.affective_categories[acl] != None:
-                if len(self.affective_categories[acl]) == len(
-                    self.affective_dimensions
-                ):
-
-                    matches = (
-                        matches
-                        and self.affective_dimensions[self.PADlabels.pleasure]
-                        >= self.affective_categories[acl][
-                            self.PADlabels.pleasure.value
-                        ][0]
-                        and self.affective_dimensions[self.PADlabels.pleasure]
-                        <= self.affective_categories[acl][
-                            self.PADlabels.pleasure.value
-                        ][1]
-                        and self.affective_dimensions[self.PADlabels.arousal]
-                        >= self.affective_categories[acl][self.PADlabels.arousal.value][
-                            0
-                        ]
-                        and self.affective_dimensions[self.PADlabels.arousal]
-                        <= self.affective_categories[acl][self.PADlabels.arousal.value][
-                            1
-                        ]
-                        and self.affective_dimensions[self.PADlabels.dominance]
-                        >= self.affective_categories[acl][
-                            self.PADlabels.dominance.value
-                        ][0]
-                        and self.affective_dimensions[self.PADlabels.dominance]
-                        <= self.affective_categories[acl][
-                            self.PADlabels.dominance.value
-                        ][1]
-                    )
-
-                else:
-                    try:
-                        raise Exception(
-                            "The number of components for the affective category "
-                            + acl
-                            + " must be the same as the number of the components for the affective state"
-                        )
-                    except Exception as e:
-                        print(e)
-            if matches:
-                result.append(acl)
-        return result
+        return self.compiled_categories().label(*self.get_values())
 
     def deriveASFromAppraisalVariables(self, affective_info):
         """
@@ -332,47 +537,74 @@ class PAD(AffectiveState):
                     > 0.7
                 ):
                     em.append("anger")
-        result = PAD()
-        result.setP(0.0)
-        result.setA(0.0)
-        result.setD(0.0)
-
+        p = a = d = 0.0
         for e in em:
             if e == "anger":
-                result.setP(result.get_pleasure() - 0.51)
-                result.setA(result.get_arousal() + 0.59)
-                result.setD(result.get_dominance() + 0.25)
+                p -= 0.51
+                a += 0.59
+                d += 0.25
             elif e == "fear":
-                result.setP(result.get_pleasure() - 0.64)
-                result.setA(result.get_arousal() + 0.60)
-                result.setD(result.get_dominance() - 0.43)
+                p -= 0.64
+                a += 0.60
+                d -= 0.43
             elif e == "hope":
-                result.setP(result.get_pleasure() + 0.2)
-                result.setA(result.get_arousal() + 0.2)
-                result.setD(result.get_dominance() - 0.1)
+                p += 0.2
+                a += 0.2
+                d -= 0.1
             elif e == "joy":
-                result.setP(result.get_pleasure() + 0.76)
-                result.setA(result.get_arousal() + 0.48)
-                result.setD(result.get_dominance() + 0.35)
+                p += 0.76
+                a += 0.48
+                d += 0.35
             elif e == "sadness":
-                result.setP(result.get_pleasure() - 0.63)
-                result.setA(result.get_arousal() - 0.27)
-                result.setD(result.get_dominance() - 0.33)
+                p -= 0.63
+                a -= 0.27
+                d -= 0.33
             elif e == "surprise":
-                result.setP(result.get_pleasure() + 0.4)
-                result.setA(result.get_arousal() + 0.67)
-                result.setD(result.get_dominance() - 0.13)
+                p += 0.4
+                a += 0.67
+                d -= 0.13
 
         # Averaging
         if len(em) > 0:
-            result.setP(result.get_pleasure() / len(em))
-            result.setA(result.get_arousal() / len(em))
-            result.setD(result.get_dominance() / len(em))
+            result = PAD()
+            result.p = p / len(em)
+            result.a = a / len(em)
+            result.d = d / len(em)
         else:
             result = None
         return result
 
 
+class PADDimensions(collections.abc.MutableMapping):
+    """
+    This class is used to access the dimensions of a PAD as a dict keyed by
+    PAD.PADlabels, wherever they are stored.
+
+    Args:
+        pad (PAD): The PAD
+    """
+
+    __slots__ = ("pad",)
+
+    def __init__(self, pad):
+        self.pad = pad
+
+    def __getitem__(self, label):
+        return self.pad.get_values()[label.value]
+
+    def __setitem__(self, label, value):
+        (self.pad.setP, self.pad.setA, self.pad.setD)[label.value](value)
+
+    def __delitem__(self, label):
+        raise TypeError("the dimensions of a PAD can not be removed")
+
+    def __iter__(self):
+        return iter(PAD.PADlabels)
+
+    def __len__(self):
+        return len(PAD.PADlabels)
+
+
 class PADExpression:
     """
     This class is used to represent the PAD expressions.
@@ -380,6 +612,8 @@ class PADExpression:
     PAD = {Pleasure, Arousal, Dominance}
     """
 
+    __slots__ = ("PThreshold", "operator1", "AThreshold", "operator2", "DThreshold")
+
     def __init__(self, pThres, op1, aThres, op2, dThres):
         """
         Constructor of the PADExpression class.
@@ -419,3 +653,7 @@ class PADExpression:
         else:
             result = result or (p <= self.AThreshold)
         return result
+
+
+# Threshold of the affectively relevant events of every PAD
+AFFECTIVE_THRESHOLD = PADExpression(0.8, "or", 0.8, "and", 0.0)
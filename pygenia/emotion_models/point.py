@@ -0,0 +1,24 @@
+class Point:
+    __slots__ = ("pleasure", "arousal")
+
+    def __init__(self, pleasure, arousal):
+        self.pleasure = pleasure
+        self.arousal = arousal
+
+    def set_pleasure(self, pleasure):
+        self.pleasure = pleasure
+
+    def set_arousal(self, arousal):
+        self.arousal = arousal
+
+    def get_pleasure(self):
+        return self.pleasure
+
+    def get_arousal(self):
+        return self.arousal
+
+    def __str__(self):
+        return f"({self.pleasure}, {self.arousal})"
+
+    def __repr__(self):
+        return f"Point({self.pleasure}, {self.arousal})"
@@ -0,0 +1,181 @@
+import collections
+
+import numpy as np
+
+
+def mask_labels(labels, masks):
+    """
+    This function is used to get the labels selected by each row of a mask
+
+    Rows are grouped by pattern, so the labels of large populations are built
+    once per distinct pattern.
+
+    Args:
+        labels (list): Labels of the columns
+        masks (np.ndarray): (n, len(labels)) boolean mask
+
+    Returns:
+        list: A new list of labels for each row
+    """
+    if len(masks) == 0:
+        return []
+    if masks.shape[1] < 63:
+        # Encode each row as an integer, much faster to group than rows
+        codes = masks.astype(np.int64) @ (np.int64(1) << np.arange(masks.shape[1]))
+        codes, first, inverse = np.unique(
+            codes, return_index=True, return_inverse=True
+        )
+        patterns = masks[first]
+    else:
+        patterns, inverse = np.unique(masks, axis=0, return_inverse=True)
+    pattern_labels = [
+        [labels[i] for i in np.flatnonzero(pattern)] for pattern in patterns
+    ]
+    return [list(pattern_labels[i]) for i in inverse.reshape(-1).tolist()]
+
+
+class PopulationStore:
+    """
+    This class is used to store the moods of a population of agents in
+    contiguous arrays and to update them in batch.
+
+    Each bound mood owns a row of the values array, whose columns are the
+    pleasure, arousal and dominance of the mood. Bound moods do not update
+    themselves when they receive an emotion: the emotion is queued and every
+    pending update is applied by step, grouped by affective model, as one
+    vectorized operation. A mood that is read before the next step (e.g. by
+    the plan selection of its agent) applies its own queued emotions first
+    (see flush), so agents always see the same moods as without the store.
+
+    Args:
+        capacity (int): Initial number of rows of the values array
+    """
+
+    PLEASURE = 0
+    AROUSAL = 1
+    DOMINANCE = 2
+
+    def __init__(self, capacity=1024):
+        self.values = np.zeros((max(1, capacity), 3))
+        self.moods = []
+        self.pending = collections.defaultdict(list)
+        # Called with the store when the first update of a tick is queued
+        self.on_pending = None
+
+    def __len__(self):
+        return len(self.moods)
+
+    def bind(self, mood, values=(0.0, 0.0, 0.0)) -> int:
+        """
+        This method is used to reserve a row for a mood
+
+        Args:
+            mood (AffectiveState): The mood to store
+            values (tuple): Initial pleasure, arousal and dominance of the mood
+
+        Returns:
+            int: The row of the mood
+        """
+        slot = len(self.moods)
+        if slot == len(self.values):
+            values_copy = np.zeros((2 * len(self.values), 3))
+            values_copy[:slot] = self.values
+            self.values = values_copy
+        self.values[slot] = values
+        self.moods.append(mood)
+        return slot
+
+    def submit(self, slot, emotion):
+        """
+        This method is used to queue an emotion for a mood
+
+        Args:
+            slot (int): Row of the mood
+            emotion (tuple): Pleasure, arousal and dominance of the emotion
+        """
+        if not self.pending and self.on_pending is not None:
+            self.on_pending(self)
+        self.pending[slot].append(emotion)
+
+    def has_pending(self) -> bool:
+        """
+        This method is used to know if there are queued emotions
+
+        Returns:
+            bool: True if a mood has queued emotions, False otherwise
+        """
+        return bool(self.pending)
+
+    def flush(self, slot):
+        """
+        This method is used to apply the queued emotions of a mood before it is read
+
+        Args:
+            slot (int): Row of the mood
+        """
+        if not self.pending or slot not in self.pending:
+            return
+        emotions = self.pending.pop(slot)
+        update = type(self.moods[slot]).batch_update_affective_state
+        values = self.values[slot : slot + 1]
+        for emotion in emotions:
+            values = update(values, np.array([emotion], dtype=float))
+        self.values[slot] = values[0]
+        self.relabel([slot])
+
+    def step(self) -> int:
+        """
+        This method is used to apply every queued emotion and relabel the
+        updated moods
+
+        Emotions queued for the same mood are applied in order, one round
+        per emotion.
+
+        Returns:
+            int: Number of updated moods
+        """
+        pending, self.pending = self.pending, collections.defaultdict(list)
+        updated = list(pending)
+
+        round_number = 0
+        while pending:
+            # Group the moods of this round by affective model.
+            groups = collections.defaultdict(lambda: ([], []))
+            for slot, emotions in pending.items():
+                slots, group_emotions = groups[type(self.moods[slot])]
+                slots.append(slot)
+                group_emotions.append(emotions[round_number])
+            for mood_cls, (slots, emotions) in groups.items():
+                slots = np.array(slots)
+                self.values[slots] = mood_cls.batch_update_affective_state(
+                    self.values[slots], np.array(emotions, dtype=float)
+                )
+            round_number += 1
+            pending = {
+                slot: emotions
+                for slot, emotions in pending.items()
+                if len(emotions) > round_number
+            }
+
+        self.relabel(updated)
+        return len(updated)
+
+    def relabel(self, slots):
+        """
+        This method is used to update the affective labels of some moods
+
+        Moods are grouped by the parameters their labels depend on (see
+        label_key), so the labels of each group are computed at once.
+
+        Args:
+            slots (list): Rows of the moods to relabel
+        """
+        groups = collections.defaultdict(list)
+        for slot in slots:
+            mood = self.moods[slot]
+            groups[(type(mood), mood.label_key())].append(slot)
+        for group_slots in groups.values():
+            rows = np.array(group_slots)
+            labels = self.moods[group_slots[0]].batch_labels(self.values[rows])
+            for slot, mood_labels in zip(group_slots, labels):
+                self.moods[slot].affective_labels = mood_labels
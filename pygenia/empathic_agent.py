@@ -3,7 +3,7 @@ import math
 import agentspeak
 import pygenia.affective_agent
 from pygenia.affective_agent import AffectiveAgent
-import asyncio
+from pygenia.affective_links import AFFECTIVE_LINK, LinkedOthers
 
 LOGGER = agentspeak.get_logger(__name__)
 C = {}
@@ -22,6 +22,29 @@ class EmpathicAgent(pygenia.affective_agent.AffectiveAgent):
     ):
         super(EmpathicAgent, self).__init__(env, name, beliefs, rules, plans, concerns)
         self.others = others
+        # Store of the affective links, if any, and id of the agent in it
+        # (see bind_links)
+        self.links = None
+        self.link_id = None
+
+    def clone(self, name):
+        """
+        This method is used to create a new agent from this prototype.
+
+        The affective links with the other agents are copied.
+
+        Args:
+            name (str): Name of the new agent.
+
+        Returns:
+            EmpathicAgent: The new agent.
+        """
+        agent = super(EmpathicAgent, self).clone(name)
+        if self.others is not None:
+            agent.others = {
+                other: dict(attributes) for other, attributes in self.others.items()
+            }
+        return agent
 
     def set_others(self, others):
         self.others = others
@@ -32,7 +55,53 @@ class EmpathicAgent(pygenia.affective_agent.AffectiveAgent):
     def get_other(self, other_id: str):
         return self.others[other_id]
 
+    def bind_links(self, store):
+        """
+        This method is used to move the affective links of the agent into a link store
+
+        The others of the agent become a view of the store (see LinkedOthers).
+
+        Args:
+            store (AffectiveLinkStore): The link store
+        """
+        if self.links is not None:
+            return
+        self.link_id = store.id_of(self.name)
+        self.links = store
+        others = self.others
+        self.others = LinkedOthers(store, self.link_id)
+        for other, attributes in (others or {}).items():
+            self.others[other] = attributes
+
+    def get_affective_link(self, other_id: str) -> float:
+        """
+        This method is used to get the affective link of the agent with another agent
+
+        Args:
+            other_id (str): Name of the other agent
+
+        Raises:
+            KeyError: If the agent has no link with the other agent
+
+        Returns:
+            float: The affective link
+        """
+        if self.links is not None:
+            target = self.links.ids.get(other_id)
+            if target is None:
+                raise KeyError(other_id)
+            return self.links.link(self.link_id, target)
+        return self.others[other_id][AFFECTIVE_LINK]
+
     def update_affective_link(self, agent_id, interaction_value):
+        if self.links is not None:
+            self.links.update_link(
+                self.link_id,
+                self.links.id_of(agent_id),
+                interaction_value,
+                self.personality.get_empathic_level(),
+            )
+            return
         if self.others is not None:
             if agent_id in self.others.keys():
                 x = self.others[agent_id]["affective_link"] + (
@@ -43,55 +112,9 @@ class EmpathicAgent(pygenia.affective_agent.AffectiveAgent):
             else:
                 self.others.setdefault(agent_id, {"affective_link": interaction_value})
 
-    def run(self, affective_turns=1, rational_turns=1) -> None:
+    def affective_step(self) -> None:
         """
-        This method is used to run a cycle of the agent
+        This method is used to run a turn of the affective cycle
         """
-
-        async def main():
-
-            def release_sem(sem, turns, flag):
-                if flag:
-                    for i in range(turns):
-                        sem.release()
-
-            # Affective cycle
-            async def affective():
-                while not end_event.is_set():
-                    await sem_affective.acquire()
-                    self.emotional_engine.current_step_ast = "EvClass"
-                    self.emotional_engine.affective_transition_system()
-                    release_sem(sem_rational, rational_turns, sem_affective.locked())
-
-            # Rational cycle
-            async def rational():
-                while not end_event.is_set():
-                    await sem_rational.acquire()
-                    if len(self.circumstance.get_events()) > 0:
-                        for i in range(len(self.circumstance.get_events())):
-                            self.rational_cycle.set_current_step("SelEv")
-                            self.rational_cycle.applySemanticRuleDeliberate()
-
-                    self.rational_cycle.set_current_step("SelInt")
-                    if not self.rational_cycle.step():
-                        end_event.set()
-
-                    release_sem(sem_affective, affective_turns, sem_rational.locked())
-
-            # Create the semaphores that will be used to synchronize the two functions
-            sem_affective = asyncio.Semaphore(affective_turns)
-            sem_rational = asyncio.Semaphore(0)
-
-            # Create an event to finish the processes
-            end_event = asyncio.Event()
-
-            # Create the two tasks that will run the functions
-            task1 = asyncio.create_task(affective())
-            task2 = asyncio.create_task(rational())
-
-            # Wait for both tasks to complete
-            await asyncio.gather(task1, task2)
-
-        asyncio.run(main())
-
-        return False
+        self.emotional_engine.current_step_ast = "EvClass"
+        self.emotional_engine.affective_transition_system()
@@ -10,6 +10,7 @@ import agentspeak.util
 from agentspeak.runtime import Agent, BuildTermVisitor, Intention
 
 from agentspeak import UnaryOp
+import pygenia.agent_cache
 import pygenia.lexer
 import pygenia.parser
 import pygenia.stdlib
@@ -101,8 +102,7 @@ class EmpathicEnvironment(pygenia.environment.Environment):
     ):
         # Parse source.
         log = agentspeak.Log(LOGGER, 3)
-        tokens = pygenia.lexer.TokenStream(source, log)
-        ast_agent = pygenia.parser.parse(source.name, tokens, log)
+        ast_agent = pygenia.agent_cache.parse(source, log)
         log.throw()
 
         return self.build_agent_from_ast(
@@ -146,6 +146,15 @@ class EmpathicEnvironment(pygenia.environment.Environment):
         # callstacks. This is more efficient than making complete deep copies.
         agents = [prototype_agent]
 
+        if isinstance(prototype_agent, AffectiveAgent):
+            while len(agents) < n:
+                agents.append(
+                    self.clone_agent(
+                        prototype_agent, ast_agent, name or source.name
+                    )
+                )
+            return agents
+
         while len(agents) < n:
             agent = agent_cls(
                 self,
@@ -1,6 +1,10 @@
 from __future__ import print_function
 
+import collections
 import copy
+import heapq
+import math
+import os
 import time
 
 import agentspeak
@@ -9,7 +13,6 @@ import agentspeak.stdlib
 import agentspeak.util
 from agentspeak.runtime import Agent, BuildTermVisitor, Intention, Rule, noop, Plan
 
-
 import pygenia.lexer
 import pygenia.parser
 import pygenia.stdlib
@@ -19,6 +22,7 @@ from pygenia.utils import (
     Instruction,
     BuildInstructionsVisitor,
     BuildQueryVisitor,
+    ConcernDependencyVisitor,
     TrueQuery,
 )
 import pygenia.affective_agent
@@ -27,6 +31,19 @@ from pygenia.emotion_models.pad import PAD
 from pygenia.cognitive_engine.emotional_engine import Concern
 from pygenia.cognitive_engine.default_engine import DefaultEngine
 
+# The stores, the profiler, the recorder, the scheduler and the snapshots
+# are only imported when they are used, so importing the environment does
+# not import numpy, which is only needed by this fallback.
+try:
+    from math import nextafter as _nextafter
+except ImportError:  # Python < 3.9
+
+    def _nextafter(x, y):
+        import numpy as np
+
+        return float(np.nextafter(x, y))
+
+
 LOGGER = agentspeak.get_logger(__name__)
 C = {}
 
@@ -39,6 +56,59 @@ class Environment(agentspeak.runtime.Environment):
         agentspeak.runtime.Environment: The environment of the agent defined in the agentspeak library
     """
 
+    def __init__(self):
+        super(Environment, self).__init__()
+        self.scheduler = None
+        # Array-backed store of the moods, if enabled (see enable_population)
+        self.population = None
+        # Sparse store of the affective links, if enabled (see enable_affective_links)
+        self.links = None
+        # Profiler of the cycle steps, if enabled (see enable_profiling)
+        self.profiler = None
+        # Recorder of the affective trajectories, if enabled (see enable_tracing)
+        self.tracer = None
+        # Limits of the event queues of the agents, if any (see set_queue_limits)
+        self.queue_limits = None
+        # Retention of the affective memories of the agents, if any (see
+        # set_memory_limits)
+        self.memory_limits = None
+        # Next numeric suffix to try for each agent name (see _make_name)
+        self._name_suffixes = {}
+        # Simulated time, if enabled (see enable_virtual_time)
+        self.clock = None
+        # Heap of the deadlines of the blocked intentions of the agents
+        self._deadlines = []
+        self._deadline_sequence = 0
+        # Agents that do not report their deadlines (see track_deadlines)
+        self._polled_agents = []
+
+    def _make_name(self, path):
+        """
+        This method is used to get a unique name for a new agent
+
+        Same names as agentspeak.runtime.Environment._make_name, but the
+        numeric suffix is remembered for each base name, so building a
+        population does not scan the names already in use again and again.
+
+        Args:
+            path (str): Name or path of the source of the agent
+
+        Returns:
+            str: The name of the agent
+        """
+        base_name = agentspeak.sanitize_functor(
+            os.path.splitext(os.path.basename(path))[0]
+        )
+        if not base_name:
+            base_name = "agent"
+        name = base_name
+        i = self._name_suffixes.get(base_name, 1)
+        while name in self.agents:
+            name = base_name + str(i)
+            i += 1
+        self._name_suffixes[base_name] = i
+        return name
+
     def ast_plan_body_visit(self, ast_plan, variables, actions, body, log):
         ast_plan.body.accept(BuildInstructionsVisitor(variables, actions, body, log))
 
@@ -263,15 +333,27 @@ class Environment(agentspeak.runtime.Environment):
             agent.circumstance.add_event(f_event)
             # [f_event] if "E" not in agent.C else agent.C["E"] + [f_event]
 
-        # Add rules to agent prototype.
+        # Add concerns to agent prototype.
+        rule_bodies = collections.defaultdict(list)
+        for ast_rule in ast_agent.rules:
+            rule_bodies[
+                (ast_rule.head.functor, len(ast_rule.head.terms))
+            ].append(ast_rule.consequence)
         for concern in ast_agent.concerns:
             variables = {}
             head = concern.head.accept(agentspeak.runtime.BuildTermVisitor(variables))
             consequence = concern.consequence.accept(
                 BuildQueryVisitor(variables, actions, log)
             )
-            new_concern = Concern(head, consequence)
-            new_concern.predicates = concern.predicates
+            dependency_visitor = ConcernDependencyVisitor(actions, rule_bodies)
+            concern.consequence.accept(dependency_visitor)
+            new_concern = Concern(
+                head,
+                consequence,
+                variables,
+                dependency_visitor.get_dependencies(),
+                cacheable=not dependency_visitor.calls_actions,
+            )
             agent.add_concern(new_concern)
             concern_value = agent.emotional_engine.test_concern(
                 head, agentspeak.runtime.Intention(), new_concern
@@ -296,9 +378,10 @@ class Environment(agentspeak.runtime.Environment):
         personality_emotion_matrix=None,
     ):
         # Parse source.
+        from pygenia.agent_cache import parse
+
         log = agentspeak.Log(LOGGER, 3)
-        tokens = pygenia.lexer.TokenStream(source, log)
-        ast_agent = pygenia.parser.parse(source.name, tokens, log)
+        ast_agent = parse(source, log)
         log.throw()
 
         return self.build_agent_from_ast(
@@ -345,6 +428,15 @@ class Environment(agentspeak.runtime.Environment):
         # callstacks. This is more efficient than making complete deep copies.
         agents = [prototype_agent]
 
+        if isinstance(prototype_agent, AffectiveAgent):
+            while len(agents) < n:
+                agents.append(
+                    self.clone_agent(
+                        prototype_agent, ast_agent, name or source.name
+                    )
+                )
+            return agents
+
         while len(agents) < n:
             agent = agent_cls(
                 self,
@@ -369,6 +461,422 @@ class Environment(agentspeak.runtime.Environment):
 
         return agents
 
+    def clone_agent(self, prototype, ast_agent, name=None):
+        """
+        This method is used to create a new affective agent from a prototype
+
+        The new agent shares the plans, rules, concerns and language models of
+        the prototype (see AffectiveAgent.clone) and receives the initial
+        beliefs and goals of the ast, as if it had been built from it.
+
+        Args:
+            prototype (AffectiveAgent): The prototype agent
+            ast_agent (AstAgent): The ast the prototype was built from
+            name (str): Name of the new agent, the name of the prototype by default
+
+        Returns:
+            AffectiveAgent: The new agent
+        """
+        agent = prototype.clone(self._make_name(name or prototype.name))
+
+        # Add beliefs to agent.
+        for ast_belief in ast_agent.beliefs:
+            belief = ast_belief.accept(agentspeak.runtime.BuildTermVisitor({}))
+            agent.call(
+                agentspeak.Trigger.addition,
+                agentspeak.GoalType.belief,
+                belief,
+                agentspeak.runtime.Intention(),
+                delayed=True,
+            )
+
+        # Add initial goals to agent.
+        for ast_goal in ast_agent.goals:
+            agent.rational_cycle.set_current_step("SelEv")
+            term = ast_goal.atom.accept(agentspeak.runtime.BuildTermVisitor({}))
+            agent.circumstance.add_event(
+                agentspeak.runtime.Event(
+                    agentspeak.Trigger.addition, agentspeak.GoalType.achievement, term
+                )
+            )
+
+        self.agents[agent.name] = agent
+        return agent
+
+    def enable_population(self, capacity=1024):
+        """
+        This method is used to keep the moods of the agents in a population store
+
+        The moods of the affective agents are moved into the store when the
+        environment runs. Their updates are then queued and applied to the
+        whole population at once after each pass (see PopulationStore). A
+        mood read before the end of the pass applies its own updates first,
+        so the agents behave as without the store.
+
+        Args:
+            capacity (int): Initial number of moods of the store
+
+        Returns:
+            PopulationStore: The population store
+        """
+        from pygenia.emotion_models.population import PopulationStore
+
+        if self.population is None:
+            self.population = PopulationStore(capacity)
+        self.bind_population()
+        return self.population
+
+    def bind_population(self):
+        """
+        This method is used to move the moods of the new agents into the population store
+        """
+        if self.population is None:
+            return
+        for agent in self.agents.values():
+            if (
+                isinstance(agent, AffectiveAgent)
+                and agent.emotional_engine is not None
+            ):
+                agent.emotional_engine.affective_info.get_mood().bind_population(
+                    self.population
+                )
+
+    def enable_affective_links(self, merge_threshold=4096):
+        """
+        This method is used to keep the affective links of the empathic agents in a link store
+
+        The links of the empathic agents are moved into the store when the
+        environment runs, so the whole social graph can be updated in batch,
+        decayed, pruned and queried (see AffectiveLinkStore).
+
+        Args:
+            merge_threshold (int): Number of new links kept out of the arrays of the store
+
+        Returns:
+            AffectiveLinkStore: The link store
+        """
+        from pygenia.affective_links import AffectiveLinkStore
+
+        if self.links is None:
+            self.links = AffectiveLinkStore(merge_threshold)
+        self.bind_affective_links()
+        return self.links
+
+    def bind_affective_links(self):
+        """
+        This method is used to move the affective links of the new agents into the link store
+        """
+        if self.links is None:
+            return
+        from pygenia.empathic_agent import EmpathicAgent
+
+        for agent in self.agents.values():
+            if isinstance(agent, EmpathicAgent):
+                agent.bind_links(self.links)
+
+    def enable_profiling(self, profiler=None):
+        """
+        This method is used to record the calls and time of each step of the
+        cycles of the affective agents
+
+        Args:
+            profiler (PhaseProfiler): The profiler to use, a new one by default
+
+        Returns:
+            PhaseProfiler: The profiler of the environment
+        """
+        from pygenia.profiling import PhaseProfiler
+
+        if profiler is None:
+            profiler = self.profiler or PhaseProfiler()
+        self.profiler = profiler
+        self.attach_profiler()
+        return profiler
+
+    def disable_profiling(self):
+        """
+        This method is used to stop recording the steps of the cycles
+
+        Returns:
+            PhaseProfiler: The profiler that was used, with its records
+        """
+        profiler, self.profiler = self.profiler, None
+        for agent in self.agents.values():
+            if isinstance(agent, AffectiveAgent) and agent.profiler is profiler:
+                agent.profiler = None
+        return profiler
+
+    def attach_profiler(self):
+        """
+        This method is used to set the profiler of the environment on the new agents
+        """
+        if self.profiler is None:
+            return
+        for agent in self.agents.values():
+            if isinstance(agent, AffectiveAgent) and agent.profiler is None:
+                agent.profiler = self.profiler
+
+    def enable_tracing(self, tracer=None, **kwargs):
+        """
+        This method is used to record the mood, the affective labels, the
+        appraisal variables and the selected plan of each cycle of the
+        affective agents
+
+        Args:
+            tracer (TraceRecorder): The recorder to use, a new one by default
+            kwargs: Arguments of the new recorder (see TraceRecorder)
+
+        Returns:
+            TraceRecorder: The recorder of the environment
+        """
+        from pygenia.tracing import TraceRecorder
+
+        if tracer is None:
+            tracer = self.tracer or TraceRecorder(**kwargs)
+        self.tracer = tracer
+        self.attach_tracer()
+        return tracer
+
+    def disable_tracing(self):
+        """
+        This method is used to stop recording the trajectories and flush the recorded rows
+
+        Returns:
+            TraceRecorder: The recorder that was used
+        """
+        tracer, self.tracer = self.tracer, None
+        for agent in self.agents.values():
+            if isinstance(agent, AffectiveAgent) and agent.tracer is tracer:
+                agent.tracer = None
+        if tracer is not None:
+            tracer.close()
+        return tracer
+
+    def attach_tracer(self):
+        """
+        This method is used to set the recorder of the environment on the new agents
+        """
+        if self.tracer is None:
+            return
+        for agent in self.agents.values():
+            if isinstance(agent, AffectiveAgent) and agent.tracer is None:
+                agent.tracer = self.tracer
+
+    def set_queue_limits(
+        self,
+        capacity=None,
+        policy="drop_oldest",
+        affective_capacity=None,
+        affective_policy=None,
+    ):
+        """
+        This method is used to bound the event queues of the affective agents
+
+        Agents created later get the same limits when the environment runs.
+        See AffectiveAgent.set_queue_limits for the arguments.
+        """
+        self.queue_limits = (capacity, policy, affective_capacity, affective_policy)
+        for agent in self.agents.values():
+            if isinstance(agent, AffectiveAgent):
+                agent.set_queue_limits(*self.queue_limits)
+
+    def apply_queue_limits(self):
+        """
+        This method is used to set the queue limits of the environment on the new agents
+        """
+        if self.queue_limits is None:
+            return
+        for agent in self.agents.values():
+            if isinstance(agent, AffectiveAgent) and agent.queue_limits is None:
+                agent.set_queue_limits(*self.queue_limits)
+
+    def set_memory_limits(self, capacity=1024, max_age=None):
+        """
+        This method is used to set the retention of the affective memories of the affective agents
+
+        Agents created later get the same retention when the environment runs.
+        See AffectiveAgent.set_memory_limits for the arguments.
+        """
+        self.memory_limits = (capacity, max_age)
+        for agent in self.agents.values():
+            if isinstance(agent, AffectiveAgent):
+                agent.set_memory_limits(*self.memory_limits)
+
+    def apply_memory_limits(self):
+        """
+        This method is used to set the memory retention of the environment on the new agents
+        """
+        if self.memory_limits is None:
+            return
+        for agent in self.agents.values():
+            if isinstance(agent, AffectiveAgent) and agent.memory_limits is None:
+                agent.set_memory_limits(*self.memory_limits)
+
+    def queue_depths(self) -> dict:
+        """
+        This method is used to get the depth and the overflow counters of the
+        event queues of each affective agent
+
+        Returns:
+            dict: Queue stats of each agent (see AffectiveAgent.queue_depths)
+        """
+        return {
+            name: agent.queue_depths()
+            for name, agent in self.agents.items()
+            if isinstance(agent, AffectiveAgent)
+        }
+
+    def snapshot(self, path=None, actions=None, level=6) -> bytes:
+        """
+        This method is used to save the environment and its agents (beliefs,
+        intentions, circumstance, mood, affective memory...) while it is not running
+
+        Args:
+            path (str): File to write the snapshot to, if any
+            actions (list): Action registries of the agents, the standard library by default
+            level (int): zlib compression level
+
+        Raises:
+            SnapshotError: If an intention is iterating a query (see pygenia.snapshot)
+
+        Returns:
+            bytes: The snapshot
+        """
+        from pygenia.snapshot import dumps
+
+        data = dumps(self, actions, level)
+        if path is not None:
+            with open(path, "wb") as snapshot_file:
+                snapshot_file.write(data)
+        return data
+
+    @staticmethod
+    def restore(snapshot, actions=None):
+        """
+        This method is used to restore an environment saved with snapshot
+
+        The sources of the agents are not parsed again, and each call returns
+        an independent environment, so many runs can start from the same
+        snapshot. The trace recorder is not restored.
+
+        Args:
+            snapshot (Union[bytes, str]): The snapshot or the path of its file
+            actions (list): Action registries of the agents, the standard library by default
+
+        Returns:
+            Environment: The restored environment
+        """
+        from pygenia.snapshot import load, loads
+
+        if isinstance(snapshot, str):
+            return load(snapshot, actions)
+        return loads(snapshot, actions)
+
+    def enable_virtual_time(self, start=0.0):
+        """
+        This method is used to run the environment on a simulated clock
+
+        Instead of sleeping until the next deadline (e.g. of a .wait), the
+        clock jumps to it as soon as no agent can do more work, so long
+        simulated horizons run as fast as the agents can reason. Agents
+        waiting only for events that never come end the run.
+
+        Args:
+            start (float): Initial time of the clock, in seconds
+        """
+        self.clock = float(start)
+
+    def disable_virtual_time(self):
+        """
+        This method is used to go back to the wall clock
+        """
+        self.clock = None
+
+    def time(self):
+        if self.clock is not None:
+            return self.clock
+        return super(Environment, self).time()
+
+    def sleep_until(self, deadline):
+        """
+        This method is used to wait until a deadline has passed
+
+        On the simulated clock the time jumps just past the deadline, as
+        waiters only fire once the time is greater than their deadline.
+
+        Args:
+            deadline (float): The deadline
+        """
+        if self.clock is not None:
+            self.clock = max(self.clock, _nextafter(deadline, math.inf))
+        else:
+            delay = deadline - self.time()
+            if delay > 0:
+                time.sleep(delay)
+
+    def schedule_deadline(self, agent, deadline):
+        """
+        This method is used to record the deadline of a blocked intention of an agent
+
+        Args:
+            agent (AffectiveAgent): The agent
+            deadline (float): The deadline
+        """
+        self._deadline_sequence += 1
+        heapq.heappush(self._deadlines, (deadline, self._deadline_sequence, agent))
+
+    def track_deadlines(self):
+        """
+        This method is used to list the agents that do not report their deadlines
+
+        Affective agents push their deadlines to the environment (see
+        schedule_deadline), the others are asked for them by next_deadline.
+        """
+        self._polled_agents = [
+            agent
+            for agent in self.agents.values()
+            if not isinstance(agent, AffectiveAgent)
+        ]
+
+    def next_deadline(self):
+        """
+        This method is used to get the earliest deadline of the blocked intentions
+
+        Deadlines whose intention was resumed earlier (e.g. by an event) are
+        discarded. Only the agents that do not report their deadlines are
+        asked for them (see track_deadlines).
+
+        Returns:
+            float: The earliest deadline, None if no intention waits for one
+        """
+        earliest = None
+        deadlines = self._deadlines
+        while deadlines:
+            deadline, _, agent = deadlines[0]
+            agent_deadline = agent.circumstance.next_deadline()
+            if agent_deadline is not None and agent_deadline <= deadline:
+                earliest = agent_deadline
+                break
+            heapq.heappop(deadlines)
+        for agent in self._polled_agents:
+            deadline = agent.shortest_deadline()
+            if deadline is not None and (earliest is None or deadline < earliest):
+                earliest = deadline
+        return earliest
+
+    def is_idle(self) -> bool:
+        """
+        This method is used to know if every intention of the affective agents waits
+
+        Returns:
+            bool: True if no affective agent has pending work, False otherwise
+        """
+        return not any(
+            agent.has_pending_work()
+            for agent in self.agents.values()
+            if isinstance(agent, AffectiveAgent)
+        )
+
     def run_agent(self, agent: AffectiveAgent):
         """
         This method is used to run the agent
@@ -385,14 +893,34 @@ class Environment(agentspeak.runtime.Environment):
                 # Sleep until the next deadline.
                 wait_until = agent.shortest_deadline()
                 if wait_until:
-                    time.sleep(wait_until - self.time())
+                    self.sleep_until(wait_until)
                     more_work = True
 
-    def run(self):
+    def run(self, scheduled=False):
         """
         This method is used to run the environment
 
+        Args:
+            scheduled (bool): Run the agents on a persistent event loop that
+                resumes them by readiness (see pygenia.scheduler.Scheduler)
+                instead of running every agent on every pass
         """
+        self.bind_population()
+        self.bind_affective_links()
+        self.attach_profiler()
+        self.attach_tracer()
+        self.apply_queue_limits()
+        self.apply_memory_limits()
+        self.track_deadlines()
+
+        if scheduled:
+            if self.scheduler is None:
+                from pygenia.scheduler import Scheduler
+
+                self.scheduler = Scheduler(self)
+            self.scheduler.run()
+            return
+
         maybe_more_work = True
         while maybe_more_work:
             maybe_more_work = False
@@ -404,11 +932,14 @@ class Environment(agentspeak.runtime.Environment):
                     maybe_more_work = True
                 if agent.run():
                     maybe_more_work = True
-            if not maybe_more_work:
-                deadlines = (
-                    agent.shortest_deadline() for agent in self.agents.values()
-                )
-                deadlines = [deadline for deadline in deadlines if deadline is not None]
-                if deadlines:
-                    time.sleep(min(deadlines) - self.time())
+            if self.population is not None:
+                self.population.step()
+            if not maybe_more_work or self.is_idle():
+                # Every intention waits: sleep (or jump the simulated clock)
+                # until the next deadline.
+                deadline = self.next_deadline()
+                if deadline is not None:
+                    self.sleep_until(deadline)
                     maybe_more_work = True
+                elif self.clock is not None:
+                    maybe_more_work = False
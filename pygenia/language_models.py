@@ -0,0 +1,194 @@
+import csv
+import math
+
+
+class LanguageTable:
+    """
+    This class is used to represent a table of a language model.
+
+    Tables are shared by every agent that uses the same language, so their
+    columns are stored as read-only arrays. numpy is only imported when a
+    table is built (see read_columns to read a table without it).
+
+    Args:
+        columns (dict): Values of each column of the table
+    """
+
+    __slots__ = ("_columns",)
+
+    def __init__(self, columns):
+        import numpy as np
+
+        self._columns = {}
+        for name, values in columns.items():
+            array = np.array(values)
+            array.flags.writeable = False
+            self._columns[name] = array
+
+    def __getitem__(self, column):
+        return self._columns[column]
+
+    def __contains__(self, column):
+        return column in self._columns
+
+    def __len__(self):
+        for values in self._columns.values():
+            return len(values)
+        return 0
+
+    @property
+    def columns(self):
+        return tuple(self._columns)
+
+    def with_columns(self, **columns):
+        """
+        This method is used to get a copy of the table with more columns
+
+        Returns:
+            LanguageTable: The table with the new columns
+        """
+        merged = dict(self._columns)
+        merged.update(columns)
+        return LanguageTable(merged)
+
+
+# Cells read as missing values, as pandas.read_csv does by default
+NA_VALUES = frozenset(
+    [
+        "",
+        "#N/A",
+        "#N/A N/A",
+        "#NA",
+        "-1.#IND",
+        "-1.#QNAN",
+        "-NaN",
+        "-nan",
+        "1.#IND",
+        "1.#QNAN",
+        "<NA>",
+        "N/A",
+        "NA",
+        "NULL",
+        "NaN",
+        "None",
+        "n/a",
+        "nan",
+        "null",
+    ]
+)
+
+_BOOLEANS = {
+    "True": True,
+    "TRUE": True,
+    "true": True,
+    "False": False,
+    "FALSE": False,
+    "false": False,
+}
+
+
+def parse_cells(values) -> list:
+    """
+    This function is used to convert the cells of a CSV column to Python values
+
+    Columns are converted like pandas.read_csv does: missing cells (see
+    NA_VALUES) are NaN, a column of integers is a column of ints unless a
+    cell is missing, a column of numbers is a column of floats, a column of
+    booleans without missing cells is a column of bools and any other column
+    is a column of strings (and NaN for the missing cells).
+
+    Args:
+        values (list): Cells of the column
+
+    Returns:
+        list: The values of the column
+    """
+    missing = [value in NA_VALUES for value in values]
+    if not any(missing):
+        try:
+            return [int(value) for value in values]
+        except ValueError:
+            pass
+        if all(value in _BOOLEANS for value in values):
+            return [_BOOLEANS[value] for value in values]
+    cells = list(zip(values, missing))
+    try:
+        return [math.nan if na else float(value) for value, na in cells]
+    except ValueError:
+        pass
+    return [math.nan if na else value for value, na in cells]
+
+
+def parse_column(values):
+    """
+    This function is used to convert the cells of a CSV column to an array
+
+    The cells are converted as parse_cells does, and a column of strings is
+    an array of objects.
+
+    Args:
+        values (list): Cells of the column
+
+    Returns:
+        np.ndarray: The values of the column
+    """
+    import numpy as np
+
+    cells = parse_cells(values)
+    if any(isinstance(cell, str) for cell in cells):
+        return np.array(cells, dtype=object)
+    return np.array(cells)
+
+
+def read_rows(path) -> tuple:
+    """
+    This function is used to read the header and the rows of a CSV file
+
+    Args:
+        path (str): Path of the CSV file
+
+    Returns:
+        tuple: The names of the columns and the non-empty rows
+    """
+    with open(path, newline="") as csv_file:
+        reader = csv.reader(csv_file)
+        header = next(reader)
+        rows = [row for row in reader if row]
+    return header, rows
+
+
+def read_columns(path) -> dict:
+    """
+    This function is used to read a language model table from a CSV file
+    without numpy
+
+    Args:
+        path (str): Path of the CSV file
+
+    Returns:
+        dict: The values of each column, as tuples
+    """
+    header, rows = read_rows(path)
+    return {
+        column: tuple(parse_cells([row[i] for row in rows]))
+        for i, column in enumerate(header)
+    }
+
+
+def read_table(path):
+    """
+    This function is used to read a language model table from a CSV file
+
+    Args:
+        path (str): Path of the CSV file
+
+    Returns:
+        LanguageTable: The parsed table
+    """
+    header, rows = read_rows(path)
+    return LanguageTable(
+        {
+            column: parse_column([row[i] for row in rows])
+            for i, column in enumerate(header)
+        }
+    )
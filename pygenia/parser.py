@@ -22,7 +22,6 @@ from __future__ import print_function
 import errno
 import os.path
 import sys
-import re
 
 import agentspeak
 import agentspeak.util
@@ -254,6 +253,8 @@ class AstAgent(AstNode):
         self.concerns = []
         self.personality = None
         self.others = None
+        # Paths of the included files, as they were opened
+        self.includes = []
 
     def accept(self, visitor):
         return visitor.visit_agent(self)
@@ -454,19 +455,6 @@ def parse_concern(tok, tokens, log):
         concern.loc = tok.loc
         tok = next(tokens)
         tok, concern.consequence = parse_term(tok, tokens, log)
-        expression = str(concern.consequence)
-        pattern = r"\b\w+"
-        matches = re.findall(pattern, expression)
-        pattern_numbers = r"[0-9]\w*"
-        pattern_letters = r"[A-Z]\w*"
-        cleaned_expression = [
-            match
-            for match in matches
-            if not (
-                re.search(pattern_numbers, match) or (re.search(pattern_letters, match))
-            )
-        ]
-        concern.predicates = cleaned_expression
         return tok, concern
     else:
         # Just the belief atom.
@@ -732,7 +720,6 @@ class AstConcern(AstNode):
         super(AstConcern, self).__init__()
         self.head = None
         self.consequence = None
-        self.predicates = None
 
     def accept(self, visitor):
         return visitor.visit_concern(self)
@@ -879,6 +866,8 @@ def parse_agent(filename, tokens, log, included_files, directive=None):
                         agent.rules += included_agent.rules
                         agent.goals += included_agent.goals
                         agent.plans += included_agent.plans
+                        agent.includes.append(include)
+                        agent.includes += included_agent.includes
                         included_file.close()
             elif tok.lexeme == "begin":
                 begin_loc = tok.loc
@@ -897,6 +886,7 @@ def parse_agent(filename, tokens, log, included_files, directive=None):
                 agent.rules += sub_agent.rules
                 agent.goals += sub_agent.goals
                 agent.plans += sub_agent.plans
+                agent.includes += sub_agent.includes
             elif tok.lexeme == "end":
                 end_loc = tok.loc
                 tok = next(tokens)
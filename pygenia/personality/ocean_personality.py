@@ -1,15 +1,44 @@
+import functools
 import math
 import os
-import pandas as pd
 
-from pygenia.emotion_models.pa import Point
+from pygenia.emotion_models.point import Point
 from pygenia.personality.personality import Personality
+from pygenia.language_models import read_columns
 
 this_path = os.path.dirname(os.path.abspath(__file__))
 
 
+def stimate_personality_parameters_pa(personality_parameters):
+    pleasure = []
+    arousal = []
+    for i in range(len(personality_parameters["label"])):
+        pleasure.append(math.cos(personality_parameters["angle"][i]))
+        arousal.append(math.sin(personality_parameters["angle"][i]))
+    return dict(personality_parameters, p=tuple(pleasure), a=tuple(arousal))
+
+
+@functools.lru_cache(maxsize=None)
+def load_language_model(language):
+    """
+    This function is used to get the shared OCEAN language model of a language
+
+    Args:
+        language (str): Name of the language model
+
+    Returns:
+        dict: The parameters, by column, parsed on first use
+    """
+    return stimate_personality_parameters_pa(
+        read_columns(
+            os.path.join(this_path, "ocean_language_models/" + language + ".csv")
+        )
+    )
+
+
 class OceanPersonality(Personality):
     def __init__(self):
+        super().__init__()
         self.personality_parameters = None
 
     def init_attributes(self, attributes_dict):
@@ -32,34 +61,21 @@ class OceanPersonality(Personality):
                 "PA parameters must have 1 components give: '%d'" % len(parameters)
             )
 
-        self.personality_parameters = pd.read_csv(
-            os.path.join(this_path, "ocean_language_models/" + parameters[0] + ".csv"),
-            header=0,
-        )
-        self.stimate_personality_parameters_pa()
-
-    def stimate_personality_parameters_pa(self):
-        pleasure = []
-        arousal = []
-        for i in range(len(self.personality_parameters["label"])):
-            pleasure.append(math.cos(self.personality_parameters["angle"].iloc[i]))
-            arousal.append(math.sin(self.personality_parameters["angle"].iloc[i]))
-        self.personality_parameters.loc[:, "p"] = pleasure
-        self.personality_parameters.loc[:, "a"] = arousal
+        self.personality_parameters = load_language_model(parameters[0])
 
     def emotion_regulation(self, emotion: Point, weight=0.1):
         for i in range(len(self.personality_parameters["label"])):
             pleasure = (
                 weight
-                * self.traits[self.personality_parameters["label"].iloc[i]]
-                * self.personality_parameters["p"].iloc[i]
+                * self.traits[self.personality_parameters["label"][i]]
+                * self.personality_parameters["p"][i]
                 + emotion.get_pleasure()
             )
 
             arousal = (
                 weight
-                * self.traits[self.personality_parameters["label"].iloc[i]]
-                * self.personality_parameters["a"].iloc[i]
+                * self.traits[self.personality_parameters["label"][i]]
+                * self.personality_parameters["a"][i]
                 + emotion.get_arousal()
             )
 
@@ -1,3 +1,6 @@
+import copy
+
+
 class Personality:
     """
     This class is used to represent the personality of the agent.
@@ -42,8 +45,17 @@ class Personality:
     def clone(self):
         """
         This method is used to clone the personality of the agent.
+
+        The personality parameters are shared with the clone.
+
+        Returns:
+            Personality: Cloned personality.
         """
-        return self
+        personality = copy.copy(self)
+        if self.traits is not None:
+            personality.traits = dict(self.traits)
+        personality.copingStrategies = list(self.copingStrategies)
+        return personality
 
     def get_rationality_level(self):
         """
@@ -0,0 +1,108 @@
+import collections
+import time
+
+
+class PhaseProfiler:
+    """
+    This class is used to record the calls and the cumulative time of each
+    step of the affective and rational cycles.
+
+    Agents only pay for profiling when a profiler is set on them (see
+    Environment.enable_profiling): the dispatch loops of the cycles check
+    agent.profiler once and call the steps directly when it is None.
+
+    Times are inclusive: a step that makes another agent run steps (e.g.
+    ExecInt sending a message) also counts the time of those steps.
+
+    Args:
+        clock (callable): Clock used to time the steps
+    """
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        # (agent name, cycle, step) -> [calls, seconds]
+        self.stats = collections.defaultdict(lambda: [0, 0.0])
+
+    def call(self, agent_name, cycle, step, function, *args):
+        """
+        This method is used to run and time a step of a cycle
+
+        Args:
+            agent_name (str): Name of the agent
+            cycle (str): Name of the cycle, "affective" or "rational"
+            step (str): Name of the step
+            function (callable): The step
+            args: Arguments of the step
+
+        Returns:
+            The result of the step
+        """
+        start = self.clock()
+        try:
+            return function(*args)
+        finally:
+            stat = self.stats[(agent_name, cycle, step)]
+            stat[0] += 1
+            stat[1] += self.clock() - start
+
+    def reset(self):
+        """
+        This method is used to discard the recorded steps
+        """
+        self.stats.clear()
+
+    def summary(self, agent_name=None) -> dict:
+        """
+        This method is used to get the recorded steps
+
+        Args:
+            agent_name (str): Name of the agent, None for the whole environment
+
+        Returns:
+            dict: Calls and seconds of each step of each cycle
+        """
+        summary = {}
+        for (name, cycle, step), (calls, seconds) in self.stats.items():
+            if agent_name is not None and name != agent_name:
+                continue
+            stat = summary.setdefault(cycle, {}).setdefault(
+                step, {"calls": 0, "seconds": 0.0}
+            )
+            stat["calls"] += calls
+            stat["seconds"] += seconds
+        return summary
+
+    def per_agent(self) -> dict:
+        """
+        This method is used to get the recorded steps of each agent
+
+        Returns:
+            dict: Summary of each agent (see summary)
+        """
+        names = {name for name, _, _ in self.stats}
+        return {name: self.summary(name) for name in sorted(names)}
+
+    def report(self, agent_name=None) -> str:
+        """
+        This method is used to format the recorded steps, the slowest first
+
+        Args:
+            agent_name (str): Name of the agent, None for the whole environment
+
+        Returns:
+            str: A table with the calls, seconds and share of time of each step
+        """
+        rows = [
+            (cycle, step, stat["calls"], stat["seconds"])
+            for cycle, steps in self.summary(agent_name).items()
+            for step, stat in steps.items()
+        ]
+        rows.sort(key=lambda row: row[3], reverse=True)
+        total = sum(row[3] for row in rows) or 1.0
+        lines = ["%-10s %-9s %10s %12s %7s" % ("cycle", "step", "calls", "seconds", "%")]
+        for cycle, step, calls, seconds in rows:
+            lines.append(
+                "%-10s %-9s %10d %12.6f %6.1f%%"
+                % (cycle, step, calls, seconds, 100.0 * seconds / total)
+            )
+        return "\n".join(lines)
@@ -0,0 +1,219 @@
+from __future__ import print_function
+
+import asyncio
+
+import agentspeak
+
+import pygenia.affective_agent
+
+LOGGER = agentspeak.get_logger(__name__)
+
+
+class Scheduler:
+    """
+    This class is used to run the agents of an environment on a single,
+    long-lived event loop.
+
+    Every agent is driven by one coroutine that interleaves its affective and
+    rational turns. When the agent runs out of work the coroutine is parked
+    until the agent is woken up by a new event (see AffectiveAgent.call) or
+    until the deadline of one of its waiters expires.
+
+    Args:
+        env (agentspeak.runtime.Environment): The environment of the agents
+        affective_turns (int): Affective turns run before each rational turn
+        rational_turns (int): Rational turns run after each affective turn
+    """
+
+    def __init__(self, env, affective_turns=1, rational_turns=1):
+        self.env = env
+        self.affective_turns = affective_turns
+        self.rational_turns = rational_turns
+        self.loop = asyncio.new_event_loop()
+
+        self._tasks = {}
+        self._ready = {}
+        # Parked agents and the deadline they are waiting for
+        self._parked = {}
+        self._quiescent = None
+        self._failure = None
+        self._population_step = None
+
+    def add_agent(self, agent):
+        """
+        This method is used to start driving an agent
+
+        Args:
+            agent (AffectiveAgent): The agent to drive
+
+        Raises:
+            TypeError: If the agent is not an AffectiveAgent
+        """
+        if agent.name in self._tasks:
+            return
+        if not isinstance(agent, pygenia.affective_agent.AffectiveAgent):
+            raise TypeError(
+                "the scheduler can only drive affective agents, got: '%s'" % agent.name
+            )
+        agent.scheduler = self
+        self._tasks[agent.name] = self.loop.create_task(self._drive(agent))
+
+    def wake(self, agent):
+        """
+        This method is used to resume a parked agent
+
+        Args:
+            agent (AffectiveAgent): The agent to resume
+        """
+        self._parked.pop(agent.name, None)
+        ready = self._ready.get(agent.name)
+        if ready is not None:
+            ready.set()
+
+    def is_quiescent(self) -> bool:
+        """
+        This method is used to know if every agent is parked without deadline
+
+        Returns:
+            bool: True if no agent can do more work, False otherwise
+        """
+        return len(self._parked) == len(self._tasks) and all(
+            deadline is None for deadline in self._parked.values()
+        )
+
+    def run(self):
+        """
+        This method is used to run the agents until none of them can do more work
+        """
+        for agent in list(self.env.agents.values()):
+            self.add_agent(agent)
+
+        population = getattr(self.env, "population", None)
+        if population is not None:
+            population.on_pending = self._schedule_population_step
+
+        if self._tasks and self.is_quiescent():
+            return
+
+        self.loop.run_until_complete(self._main())
+
+        if population is not None and population.has_pending():
+            population.step()
+
+        if self._failure is not None:
+            failure, self._failure = self._failure, None
+            raise failure
+
+    def close(self):
+        """
+        This method is used to cancel the coroutines and close the event loop
+        """
+        for task in self._tasks.values():
+            task.cancel()
+        if self._tasks:
+            self.loop.run_until_complete(
+                asyncio.gather(*self._tasks.values(), return_exceptions=True)
+            )
+        for agent in self.env.agents.values():
+            if getattr(agent, "scheduler", None) is self:
+                agent.scheduler = None
+        population = getattr(self.env, "population", None)
+        if population is not None and population.on_pending == self._schedule_population_step:
+            population.on_pending = None
+        self._tasks = {}
+        self._ready = {}
+        self._parked = {}
+        self.loop.close()
+
+    def _schedule_population_step(self, population):
+        # Apply the queued mood updates once the agents that are ready now
+        # have run their burst.
+        if self._population_step is None:
+            self._population_step = self.loop.call_soon(
+                self._step_population, population
+            )
+
+    def _step_population(self, population):
+        self._population_step = None
+        try:
+            population.step()
+        except Exception as err:
+            self._failure = err
+            if self._quiescent is not None:
+                self._quiescent.set()
+
+    async def _main(self):
+        self._quiescent = asyncio.Event()
+        if self._failure is None and not self.is_quiescent():
+            await self._quiescent.wait()
+        self._quiescent = None
+
+    def _park(self, agent, deadline):
+        self._parked[agent.name] = deadline
+        if len(self._parked) == len(self._tasks) and self._uses_virtual_time():
+            self._advance_virtual_time()
+        if self._quiescent is not None and self.is_quiescent():
+            self._quiescent.set()
+
+    def _uses_virtual_time(self):
+        return getattr(self.env, "clock", None) is not None
+
+    def _advance_virtual_time(self):
+        # Every agent is parked: jump the simulated clock to the earliest
+        # deadline and resume the agents whose deadline has passed.
+        deadlines = [
+            deadline for deadline in self._parked.values() if deadline is not None
+        ]
+        if not deadlines:
+            return
+        self.env.sleep_until(min(deadlines))
+        now = self.env.time()
+        for name, deadline in list(self._parked.items()):
+            if deadline is not None and deadline < now:
+                self._parked.pop(name)
+                self._ready[name].set()
+
+    def _burst(self, agent):
+        # Same interleaving as AffectiveAgent.run: affective turns, then
+        # rational turns until no intention is selected, then a last
+        # affective turn.
+        more_work = True
+        while more_work:
+            for _ in range(self.affective_turns):
+                agent.affective_step()
+            for _ in range(self.rational_turns):
+                more_work = agent.rational_step()
+                if not more_work:
+                    break
+        agent.affective_step()
+
+    async def _drive(self, agent):
+        ready = self._ready[agent.name] = asyncio.Event()
+        try:
+            while True:
+                self._burst(agent)
+
+                if agent.has_pending_work():
+                    # Let the other agents run before the next burst.
+                    await asyncio.sleep(0)
+                    continue
+
+                deadline = agent.shortest_deadline()
+                ready.clear()
+                self._park(agent, deadline)
+                if deadline is None or self._uses_virtual_time():
+                    await ready.wait()
+                else:
+                    try:
+                        await asyncio.wait_for(
+                            ready.wait(), max(0.0, deadline - self.env.time())
+                        )
+                    except asyncio.TimeoutError:
+                        pass
+                self._parked.pop(agent.name, None)
+        except asyncio.CancelledError:
+            raise
+        except Exception as err:
+            self._failure = err
+            if self._quiescent is not None:
+                self._quiescent.set()
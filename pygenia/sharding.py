@@ -0,0 +1,530 @@
+from __future__ import print_function
+
+import multiprocessing
+import os
+import queue
+import sys
+import traceback
+
+import agentspeak
+import agentspeak.runtime
+
+import pygenia.affective_agent
+import pygenia.empathic_environment
+import pygenia.environment
+import pygenia.scheduler
+
+LOGGER = agentspeak.get_logger(__name__)
+
+# Messages of the inbox of a shard
+_MESSAGE = "message"
+_PROBE = "probe"
+_STOP = "stop"
+
+# Messages of the control queue
+_IDLE = "idle"
+_DONE = "done"
+_ERROR = "error"
+
+
+class RemoteAgent:
+    """
+    This class is used to represent, inside a shard, an agent that runs in
+    another shard.
+
+    .send looks the receivers up in env.agents and calls them: the call of a
+    remote agent is put in the inbox of its shard instead.
+
+    Args:
+        name (str): Name of the remote agent
+        shard (int): Shard of the remote agent
+        worker (ShardWorker): Worker of the local shard
+    """
+
+    def __init__(self, name, shard, worker):
+        self.name = name
+        self.shard = shard
+        self.worker = worker
+
+    def call(self, trigger, goal_type, term, calling_intention, delayed=False):
+        self.worker.route(self.shard, self.name, trigger, goal_type, term)
+        return True
+
+    def __repr__(self):
+        return "RemoteAgent(%r, shard=%d)" % (self.name, self.shard)
+
+
+class AgentDirectory(dict):
+    """
+    This class is used to represent the agents of a shard.
+
+    It only holds the local agents, so iterating over it (e.g. in the
+    scheduler) only yields them. Looking up an agent of another shard returns
+    its RemoteAgent.
+
+    Args:
+        agents (dict): Local agents by name
+        shard_of (dict): Shard of every agent by name
+        worker (ShardWorker): Worker of the local shard
+    """
+
+    def __init__(self, agents, shard_of, worker):
+        super(AgentDirectory, self).__init__(agents)
+        self.shard_of = shard_of
+        self.worker = worker
+        self._remotes = {}
+
+    def __missing__(self, name):
+        shard = self.shard_of.get(name)
+        if shard is None:
+            raise KeyError(name)
+        remote = self._remotes.get(name)
+        if remote is None:
+            remote = self._remotes[name] = RemoteAgent(name, shard, self.worker)
+        return remote
+
+
+class ShardWorker:
+    """
+    This class is used to run a shard of a ShardedEnvironment inside a worker
+    process.
+
+    The worker runs its agents on its own scheduler until they can do no
+    more work, reports that it is idle together with the number of messages
+    it has sent to and received from other shards, and waits for messages.
+    While the agents run, the inbox is polled every poll_interval seconds.
+
+    Each report carries the number of the last probe of the parent process
+    the shard has seen. An idle shard answers a probe with a new report, a
+    busy shard reports when it becomes idle (see ShardedEnvironment._coordinate).
+
+    Args:
+        env (ShardedEnvironment): The environment, forked with every agent
+        shard (int): Index of the shard
+        inboxes (list): Inbox of every shard
+        control (multiprocessing.Queue): Queue of the reports to the parent process
+        poll_interval (float): Seconds between two polls of the inbox while the agents run
+    """
+
+    def __init__(self, env, shard, inboxes, control, poll_interval=0.01):
+        self.env = env
+        self.shard = shard
+        self.inboxes = inboxes
+        self.inbox = inboxes[shard]
+        self.control = control
+        self.poll_interval = poll_interval
+        self.sent = 0
+        self.received = 0
+        # Number of the last probe received from the parent process
+        self.probe = 0
+        self._poll_handle = None
+
+        local = {
+            name: agent
+            for name, agent in env.agents.items()
+            if env.shard_of.get(name, shard) == shard
+        }
+        env.agents = AgentDirectory(local, env.shard_of, self)
+        # Each shard writes its own chunk files
+        if env.tracer is not None:
+            env.tracer.name = "%s-shard%d" % (env.tracer.name, shard)
+
+    def route(self, shard, name, trigger, goal_type, term):
+        """
+        This method is used to send a message to an agent of another shard
+
+        Args:
+            shard (int): Shard of the receiver
+            name (str): Name of the receiver
+            trigger (agentspeak.Trigger): Trigger of the message
+            goal_type (agentspeak.GoalType): Goal type of the message
+            term (agentspeak.Literal): Content of the message
+        """
+        self.sent += 1
+        self.inboxes[shard].put((_MESSAGE, name, trigger, goal_type, term))
+
+    def deliver(self, message) -> bool:
+        """
+        This method is used to deliver a message of the inbox to its local receiver
+
+        Args:
+            message (tuple): The message
+
+        Returns:
+            bool: False if the message is the stop signal, True otherwise
+        """
+        if message[0] == _STOP:
+            return False
+        if message[0] == _PROBE:
+            self.probe = max(self.probe, message[1])
+            return True
+        _, name, trigger, goal_type, term = message
+        self.received += 1
+        agent = dict.get(self.env.agents, name)
+        if agent is None:
+            LOGGER.error("shard %d has no agent named '%s'", self.shard, name)
+            return True
+        agent.call(trigger, goal_type, term, agentspeak.runtime.Intention())
+        return True
+
+    def run(self, collect=None):
+        """
+        This method is used to run the shard until the parent process stops it
+
+        Args:
+            collect (callable): Called with each local agent once the shard stops
+
+        Returns:
+            dict: Value returned by collect for each local agent
+        """
+        running = True
+        while running:
+            self._run_agents()
+            sys.stdout.flush()
+            self.report()
+            running = self.wait()
+
+        if self.env.scheduler is not None:
+            self.env.scheduler.close()
+            self.env.scheduler = None
+        if self.env.tracer is not None:
+            self.env.tracer.close()
+
+        if collect is None:
+            return {}
+        return {name: collect(agent) for name, agent in dict.items(self.env.agents)}
+
+    def report(self):
+        """
+        This method is used to report to the parent process that the shard is idle
+        """
+        self.control.put((_IDLE, self.shard, (self.sent, self.received), self.probe))
+
+    def wait(self) -> bool:
+        """
+        This method is used to wait, while the shard is idle, for messages to its agents
+
+        Probes received meanwhile are answered with a new report.
+
+        Returns:
+            bool: False if the stop signal was received, True if the agents received messages
+        """
+        while True:
+            message = self.inbox.get()
+            if not self.deliver(message):
+                return False
+            if message[0] == _MESSAGE:
+                break
+            self.report()
+        while True:
+            try:
+                message = self.inbox.get_nowait()
+            except queue.Empty:
+                return True
+            if not self.deliver(message):
+                return False
+
+    def _run_agents(self):
+        if self.env.scheduler is None:
+            self.env.scheduler = pygenia.scheduler.Scheduler(self.env)
+        loop = self.env.scheduler.loop
+        self._poll_handle = loop.call_later(self.poll_interval, self._poll, loop)
+        try:
+            super(ShardedEnvironment, self.env).run(scheduled=True)
+        finally:
+            self._poll_handle.cancel()
+            self._poll_handle = None
+
+    def _poll(self, loop):
+        # Deliver the messages that arrived while the agents run, the stop
+        # signal is left for the idle wait.
+        while True:
+            try:
+                message = self.inbox.get_nowait()
+            except queue.Empty:
+                break
+            if message[0] == _STOP:
+                self.inbox.put(message)
+                break
+            self.deliver(message)
+        self._poll_handle = loop.call_later(self.poll_interval, self._poll, loop)
+
+
+def final_state(agent) -> tuple:
+    """
+    This function is used to get the state of an agent that a sharded run sends back
+
+    Args:
+        agent (AffectiveAgent): The agent, in its worker process
+
+    Returns:
+        tuple: The beliefs of the agent, by functor and arity, and a copy of its mood
+    """
+    beliefs = {key: set(values) for key, values in agent.beliefs.items() if values}
+    mood = None
+    if getattr(agent, "emotional_engine", None) is not None:
+        mood = agent.emotional_engine.affective_info.get_mood()
+        if mood is not None:
+            # The copy is not bound to the population store of the shard
+            mood = mood.clone()
+    return beliefs, mood
+
+
+def apply_final_state(agent, state):
+    """
+    This function is used to set the state sent back by a sharded run on an agent
+
+    Args:
+        agent (AffectiveAgent): The agent, in the parent process
+        state (tuple): The beliefs and the mood of the agent (see final_state)
+    """
+    beliefs, mood = state
+    changed = set(agent.beliefs) | set(beliefs)
+    agent.beliefs.clear()
+    agent.beliefs.update(beliefs)
+    versions = getattr(agent, "belief_versions", None)
+    if versions is not None:
+        for key in changed:
+            versions[key] += 1
+    if mood is not None:
+        affective_info = agent.emotional_engine.affective_info
+        population = affective_info.get_mood().population
+        affective_info.set_mood(mood)
+        if population is not None:
+            mood.bind_population(population)
+
+
+def _worker_main(env, shard, inboxes, control, collect, poll_interval):
+    try:
+        worker = ShardWorker(env, shard, inboxes, control, poll_interval)
+        results = worker.run(collect)
+        states = {
+            name: final_state(agent) for name, agent in dict.items(worker.env.agents)
+        }
+        sys.stdout.flush()
+        control.put((_DONE, shard, (results, states), (worker.sent, worker.received)))
+    except BaseException:
+        sys.stdout.flush()
+        control.put((_ERROR, shard, traceback.format_exc(), None))
+
+
+class ShardedEnvironment(pygenia.environment.Environment):
+    """
+    This class is used to represent an environment whose agents run in a
+    pool of worker processes.
+
+    Agents are built as usual with build_agents and are assigned to the
+    shards in round robin when the environment runs. Each worker process
+    inherits the built agents (the environment is forked), keeps the agents
+    of its shard and runs them on its own scheduler. .send messages to agents
+    of other shards are routed through the inbox (a multiprocessing queue) of
+    the receiving shard.
+
+    The run ends when every shard is idle and every message sent between
+    shards has been received. The agents run in the workers: only their
+    final beliefs and mood are sent back and set on the agents of the
+    parent process (see run). Use the collect argument of run to get
+    anything else back from the workers.
+
+    Args:
+        workers (int): Number of worker processes, the number of CPUs by default
+        poll_interval (float): Seconds between two polls of the inbox of a busy shard
+    """
+
+    def __init__(self, workers=None, poll_interval=0.01):
+        super(ShardedEnvironment, self).__init__()
+        self.workers = workers or os.cpu_count() or 1
+        self.poll_interval = poll_interval
+        # Shard of each agent by name (see assign_shards)
+        self.shard_of = {}
+        # Messages sent and received by each shard in the last run
+        self.shard_stats = {}
+
+    def assign_shards(self, shard_of=None) -> dict:
+        """
+        This method is used to assign the agents to the shards
+
+        Agents that already have a shard keep it, the others are assigned in
+        round robin.
+
+        Args:
+            shard_of (dict): Shard of some agents by name
+
+        Returns:
+            dict: Shard of every agent by name
+        """
+        if shard_of is not None:
+            self.shard_of.update(shard_of)
+        shards = self.num_shards()
+        for i, name in enumerate(self.agents):
+            if name not in self.shard_of:
+                self.shard_of[name] = i % shards
+        return self.shard_of
+
+    def num_shards(self) -> int:
+        return max(1, min(self.workers, len(self.agents)))
+
+    def run(self, scheduled=True, collect=None, update_agents=True):
+        """
+        This method is used to run the agents in the worker processes
+
+        The agents of the parent process are forked into the workers, and the
+        run changes the copies in the workers. Once the run ends, the final
+        beliefs and mood of every agent are sent back and set on the agents
+        of the parent process (unless update_agents is False), so they can be
+        inspected in env.agents. The rest of their state (intentions, events,
+        affective memory, links...) is not sent back and is left as it was
+        before the run: get it with collect.
+
+        Args:
+            scheduled (bool): Kept for compatibility, the shards always run on a scheduler
+            collect (callable): Called in the workers with each agent once the
+                run ends, its result must be picklable
+            update_agents (bool): Set the final beliefs and mood on the agents of the parent process
+
+        Raises:
+            RuntimeError: If an agent raises an exception in a worker
+
+        Returns:
+            dict: Value returned by collect for each agent, empty if collect is None
+        """
+        try:
+            context = multiprocessing.get_context("fork")
+        except ValueError:
+            LOGGER.warning("fork is not available, running the agents in this process")
+            super(ShardedEnvironment, self).run(scheduled=True)
+            if collect is None:
+                return {}
+            return {name: collect(agent) for name, agent in self.agents.items()}
+
+        self.assign_shards()
+        shards = max(self.shard_of.values(), default=0) + 1
+        inboxes = [context.Queue() for _ in range(shards)]
+        control = context.Queue()
+
+        sys.stdout.flush()
+        processes = [
+            context.Process(
+                target=_worker_main,
+                args=(self, shard, inboxes, control, collect, self.poll_interval),
+                daemon=True,
+            )
+            for shard in range(shards)
+        ]
+        for process in processes:
+            process.start()
+
+        try:
+            results, states = self._coordinate(shards, inboxes, control)
+        finally:
+            for process in processes:
+                process.join(timeout=1.0)
+                if process.is_alive():
+                    process.terminate()
+        if update_agents:
+            for name, state in states.items():
+                apply_final_state(self.agents[name], state)
+        return results
+
+    def _coordinate(self, shards, inboxes, control):
+        """
+        This method is used to detect the end of the run and collect the results of the shards
+
+        The shards report their counters of messages sent and received when
+        they become idle, but those reports are taken at different times: a
+        shard may be busy again by the time the others report. The run ends
+        with two waves of reports (four-counter termination detection):
+
+        - first, every shard has reported and the counters add up;
+        - then every shard is probed, and every shard reports again, idle,
+          after receiving the probe, with the same counters as in the
+          first wave.
+
+        Every message sent before the second wave was then received before
+        the probes, so no message is in flight and no shard can do more
+        work.
+
+        Args:
+            shards (int): Number of shards
+            inboxes (list): Inbox of every shard
+            control (multiprocessing.Queue): Queue of the reports of the shards
+
+        Raises:
+            RuntimeError: If a shard fails, or if messages were lost
+
+        Returns:
+            tuple: Value returned by collect for each agent, and the final
+            state of each agent (see final_state)
+        """
+        counters = {}
+        probe = 0
+        while True:
+            while len(counters) < shards or not _balanced(counters):
+                shard, shard_counters, _ = self._report(control, inboxes)
+                counters[shard] = shard_counters
+
+            first_wave = dict(counters)
+            probe += 1
+            for inbox in inboxes:
+                inbox.put((_PROBE, probe))
+            second_wave = {}
+            while len(second_wave) < shards:
+                shard, shard_counters, shard_probe = self._report(control, inboxes)
+                counters[shard] = shard_counters
+                if shard_probe >= probe:
+                    second_wave[shard] = shard_counters
+            if second_wave == first_wave:
+                break
+
+        self._stop(inboxes)
+
+        results = {}
+        states = {}
+        self.shard_stats = {}
+        done = 0
+        while done < shards:
+            kind, shard, payload, stats = control.get()
+            if kind == _IDLE:
+                continue
+            if kind == _ERROR:
+                raise RuntimeError("shard %d failed:\n%s" % (shard, payload))
+            results.update(payload[0])
+            states.update(payload[1])
+            self.shard_stats[shard] = {"sent": stats[0], "received": stats[1]}
+            done += 1
+
+        sent = sum(stats["sent"] for stats in self.shard_stats.values())
+        received = sum(stats["received"] for stats in self.shard_stats.values())
+        if sent != received:
+            raise RuntimeError(
+                "%d messages between shards were sent but %d were received"
+                % (sent, received)
+            )
+        return results, states
+
+    def _report(self, control, inboxes):
+        # Next idle report of a shard: shard, (sent, received) and probe
+        kind, shard, payload, probe = control.get()
+        if kind == _ERROR:
+            self._stop(inboxes)
+            raise RuntimeError("shard %d failed:\n%s" % (shard, payload))
+        return shard, payload, probe
+
+    def _stop(self, inboxes):
+        for inbox in inboxes:
+            inbox.put((_STOP,))
+
+
+def _balanced(counters) -> bool:
+    return sum(sent for sent, _ in counters.values()) == sum(
+        received for _, received in counters.values()
+    )
+
+
+class ShardedEmpathicEnvironment(
+    ShardedEnvironment, pygenia.empathic_environment.EmpathicEnvironment
+):
+    """
+    This class is used to represent an empathic environment whose agents run
+    in a pool of worker processes (see ShardedEnvironment).
+    """
@@ -0,0 +1,377 @@
+from __future__ import print_function
+
+import collections
+import copy
+import copyreg
+import inspect
+import io
+import pickle
+import types
+import zlib
+
+import agentspeak
+import agentspeak.runtime
+import agentspeak.stdlib
+
+import pygenia.agent_cache
+import pygenia.scheduler
+import pygenia.tracing
+import pygenia.utils
+
+LOGGER = agentspeak.get_logger(__name__)
+
+MAGIC = b"PYGENIA-SNAPSHOT"
+VERSION = 2
+
+
+class SnapshotError(Exception):
+    """
+    This class is used to represent a state that can not be saved or restored
+    """
+
+
+class DefaultValue:
+    """
+    This class is used to replace the lambda of a saved defaultdict: it
+    returns a copy of the value the lambda returned
+
+    Args:
+        value: The default value
+    """
+
+    def __init__(self, value):
+        self.value = value
+
+    def __call__(self):
+        return copy.deepcopy(self.value)
+
+
+def _detached():
+    return None
+
+
+def _exhausted_query():
+    return iter(())
+
+
+def _execute(query, agent, intention):
+    return query.execute(agent, intention)
+
+
+def _action(actions, functor, arity):
+    if arity is None:
+        return actions.variadic_actions[functor]
+    return actions.actions[(functor, arity)]
+
+
+def _registries(actions):
+    # Each registry and its parents, the nearest first
+    registries = []
+    for registry in actions:
+        while registry is not None and registry not in registries:
+            registries.append(registry)
+            registry = registry.parent
+    return registries
+
+
+def _advanced_queries(intention):
+    """
+    This function is used to find the queries of an intention that may be
+    advanced again, e.g. the query of a for loop in progress
+
+    The instructions that follow the current one are walked counting the
+    queries of the stack that were popped and the new queries pushed above
+    them: a next_or_fail with no new query above advances the query below
+    the popped ones.
+
+    Args:
+        intention (agentspeak.runtime.Intention): The intention
+
+    Returns:
+        set: Positions, from the top of the query stack, of the queries that may be advanced
+    """
+    advanced = set()
+    size = len(intention.query_stack)
+    pending = [(intention.instr, 0, 0)]
+    visited = set()
+    while pending:
+        instr, popped, pushed = pending.pop()
+        if instr is None or popped >= size or (id(instr), popped, pushed) in visited:
+            continue
+        visited.add((id(instr), popped, pushed))
+        f = getattr(instr.f, "func", instr.f)
+        if f is agentspeak.runtime.push_query or f is pygenia.utils.push_query:
+            pushed += 1
+        elif f is agentspeak.runtime.pop_query:
+            if pushed:
+                pushed -= 1
+            else:
+                popped += 1
+        elif f is agentspeak.runtime.next_or_fail and not pushed:
+            advanced.add(popped)
+        pending.append((instr.success, popped, pushed))
+        pending.append((instr.failure, popped, pushed))
+    return advanced
+
+
+class SnapshotPickler(pygenia.agent_cache.AstPickler):
+    """
+    This class is used to pickle a running environment
+
+    - Actions are pickled by their functor and arity in the action registries
+      of the environment, many of them are closures that can not be pickled.
+    - The scheduler and the trace recorder are not saved (they hold an event
+      loop and a thread), the restored environment creates a new scheduler
+      when it runs.
+    - Defaultdicts of lambdas are saved with the type of their default
+      value, or with a copy of it (see DefaultValue).
+    - Instructions are saved without their links, which are saved in a
+      second pickle once every instruction is known: a long plan body is a
+      long linked list, it would be pickled recursively.
+    - A query that has not started is saved as the call that created it,
+      recorded by pygenia.utils.push_query. A query that has yielded is
+      saved as exhausted if it is never advanced again,
+      as in a test or an if, which is checked on the instructions of its
+      intention.
+
+    Args:
+        file (file): Binary file to write
+        actions (list): Action registries of the environment
+    """
+
+    def __init__(self, file, actions):
+        super(SnapshotPickler, self).__init__(file, pickle.HIGHEST_PROTOCOL)
+        self.instructions = []
+        self.query_calls = {}
+        self.action_ids = {}
+        for index, registry in enumerate(_registries(actions)):
+            for (functor, arity), f in registry.actions.items():
+                self.action_ids.setdefault(id(f), (index, functor, arity))
+            for functor, f in registry.variadic_actions.items():
+                self.action_ids.setdefault(id(f), (index, functor, None))
+
+    def dump(self, obj):
+        super(SnapshotPickler, self).dump(obj)
+        # Every instruction reachable from the saved ones, with its links
+        seen = {id(instr) for instr in self.instructions}
+        pending = list(self.instructions)
+        links = []
+        while pending:
+            instr = pending.pop()
+            links.append((instr, instr.success, instr.failure))
+            for linked in (instr.success, instr.failure):
+                if linked is not None and id(linked) not in seen:
+                    seen.add(id(linked))
+                    pending.append(linked)
+        super(SnapshotPickler, self).dump(links)
+
+    def persistent_id(self, obj):
+        if isinstance(obj, types.FunctionType):
+            return self.action_ids.get(id(obj))
+        return None
+
+    def reducer_override(self, obj):
+        if isinstance(obj, (pygenia.scheduler.Scheduler, pygenia.tracing.TraceRecorder)):
+            return _detached, ()
+        if isinstance(obj, types.MethodType) and isinstance(
+            obj.__self__, (pygenia.scheduler.Scheduler, pygenia.tracing.TraceRecorder)
+        ):
+            return _detached, ()
+        if isinstance(obj, types.GeneratorType):
+            return self._reduce_query(obj)
+        if isinstance(obj, agentspeak.runtime.Intention):
+            self._check_queries(obj)
+            return self._reduce_intention(obj)
+        if isinstance(obj, agentspeak.runtime.Instruction):
+            return self._reduce_instruction(obj)
+        if isinstance(obj, collections.defaultdict) and getattr(
+            obj.default_factory, "__name__", None
+        ) == "<lambda>":
+            default = obj.default_factory()
+            if type(default) in (list, set, dict) and not default:
+                default_factory = type(default)
+            else:
+                default_factory = DefaultValue(default)
+            return (
+                collections.defaultdict,
+                (default_factory,),
+                None,
+                None,
+                iter(obj.items()),
+            )
+        return super(SnapshotPickler, self).reducer_override(obj)
+
+    def _check_queries(self, intention):
+        suspended = [
+            position
+            for position, query in enumerate(reversed(intention.query_stack))
+            if inspect.getgeneratorstate(query) == inspect.GEN_SUSPENDED
+        ]
+        if not suspended:
+            return
+        advanced = _advanced_queries(intention)
+        if advanced.intersection(suspended):
+            raise SnapshotError(
+                "an intention is iterating a query (e.g. in a for loop), "
+                "save the environment once the loop ends"
+            )
+
+    def _reduce_intention(self, intention):
+        state = dict(intention.__dict__)
+        # The calls of the popped queries are dropped
+        calls = []
+        for call, query in zip(state.pop("query_calls", ()), intention.query_stack):
+            if call[0] is not query:
+                break
+            calls.append(call)
+            self.query_calls[id(query)] = (call[1], call[2], intention)
+        if calls:
+            state["query_calls"] = calls
+        return copyreg.__newobj__, (type(intention),), state
+
+    def _reduce_instruction(self, instr):
+        self.instructions.append(instr)
+        state = dict(instr.__dict__, success=None, failure=None)
+        slots = {
+            name: getattr(instr, name)
+            for cls in type(instr).__mro__
+            for name in cls.__dict__.get("__slots__", ())
+            if hasattr(instr, name)
+        }
+        return copyreg.__newobj__, (type(instr),), (state, slots) if slots else state
+
+    def _reduce_query(self, generator):
+        state = inspect.getgeneratorstate(generator)
+        if state == inspect.GEN_CREATED:
+            if id(generator) not in self.query_calls:
+                raise SnapshotError(
+                    "can not save a query of %s that has not started, "
+                    "it was not pushed by pygenia.utils.push_query"
+                    % generator.__qualname__
+                )
+            return _execute, self.query_calls[id(generator)]
+        if state == inspect.GEN_RUNNING:
+            raise SnapshotError("can not save a query while it runs")
+        # Suspended queries were checked with their intention
+        return _exhausted_query, ()
+
+
+class SnapshotUnpickler(pickle.Unpickler):
+    """
+    This class is used to unpickle an environment saved by SnapshotPickler
+
+    Args:
+        file (file): Binary file to read
+        actions (list): Action registries of the environment, the same as when it was saved
+    """
+
+    def __init__(self, file, actions):
+        super(SnapshotUnpickler, self).__init__(file)
+        self.registries = _registries(actions)
+
+    def load(self):
+        env = super(SnapshotUnpickler, self).load()
+        for instr, success, failure in super(SnapshotUnpickler, self).load():
+            instr.success = success
+            instr.failure = failure
+        return env
+
+    def persistent_load(self, pid):
+        index, functor, arity = pid
+        try:
+            return _action(self.registries[index], functor, arity)
+        except (IndexError, KeyError):
+            raise SnapshotError(
+                "no such action '%s/%s' to restore" % (functor, "*" if arity is None else arity)
+            )
+
+
+def dumps(env, actions=None, level=6) -> bytes:
+    """
+    This function is used to save an environment, with its agents, as bytes
+
+    Args:
+        env (Environment): The environment, not running
+        actions (list): Action registries of the agents, the standard library by default
+        level (int): zlib compression level
+
+    Raises:
+        SnapshotError: If an intention is iterating a query, or the state is
+            too deeply nested
+
+    Returns:
+        bytes: The snapshot
+    """
+    if actions is None:
+        actions = [agentspeak.stdlib.actions]
+    buffer = io.BytesIO()
+    try:
+        SnapshotPickler(buffer, actions).dump(env)
+    except RecursionError:
+        raise SnapshotError("the environment is too deeply nested to be saved")
+    return MAGIC + bytes([VERSION]) + zlib.compress(buffer.getvalue(), level)
+
+
+def loads(data, actions=None):
+    """
+    This function is used to restore an environment saved with dumps
+
+    The agents are restored as they were compiled, the sources are not parsed
+    again. Every call returns an independent copy, so many runs can start
+    from the same snapshot.
+
+    Args:
+        data (bytes): The snapshot
+        actions (list): Action registries of the agents, the standard library by default
+
+    Raises:
+        SnapshotError: If the data is not a snapshot of this version, or is
+            too deeply nested
+
+    Returns:
+        Environment: The restored environment
+    """
+    if actions is None:
+        actions = [agentspeak.stdlib.actions]
+    if data[: len(MAGIC)] != MAGIC:
+        raise SnapshotError("not a pygenia snapshot")
+    version = data[len(MAGIC)]
+    if version != VERSION:
+        raise SnapshotError("unsupported snapshot version %d" % version)
+    payload = zlib.decompress(data[len(MAGIC) + 1 :])
+    try:
+        return SnapshotUnpickler(io.BytesIO(payload), actions).load()
+    except RecursionError:
+        raise SnapshotError("the snapshot is too deeply nested to be restored")
+
+
+def save(env, path, actions=None, level=6):
+    """
+    This function is used to save an environment to a file (see dumps)
+
+    Only load snapshots from trusted files, since they are pickles.
+
+    Args:
+        env (Environment): The environment, not running
+        path (str): Path of the file
+        actions (list): Action registries of the agents, the standard library by default
+        level (int): zlib compression level
+    """
+    data = dumps(env, actions, level)
+    with open(path, "wb") as snapshot_file:
+        snapshot_file.write(data)
+
+
+def load(path, actions=None):
+    """
+    This function is used to restore an environment from a file (see loads)
+
+    Args:
+        path (str): Path of the file
+        actions (list): Action registries of the agents, the standard library by default
+
+    Returns:
+        Environment: The restored environment
+    """
+    with open(path, "rb") as snapshot_file:
+        return loads(snapshot_file.read(), actions)
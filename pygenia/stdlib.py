@@ -4,7 +4,6 @@ import agentspeak
 import agentspeak.optimizer
 import agentspeak.runtime
 from agentspeak.stdlib import actions
-from scipy.optimize import linprog
 import math
 
 
@@ -115,7 +114,7 @@ def _estimate_offer(agent, term, intention):
         ].get_pleasure()
     except:
         others_emotion = 0.0
-    affective_link = agent.others["responder"]["affective_link"]
+    affective_link = agent.get_affective_link("responder")
     mood = agent.emotional_engine.affective_info.get_mood().mood.get_pleasure()
     empathic_level = agent.personality.get_empathic_level()
     if response == "reject":
@@ -0,0 +1,354 @@
+from __future__ import print_function
+
+import collections
+import contextlib
+import io
+import itertools
+import multiprocessing
+import multiprocessing.connection
+import os
+import random
+import time
+import traceback
+
+import agentspeak
+
+import numpy as np
+
+import pygenia.affective_agent
+import pygenia.snapshot
+
+LOGGER = agentspeak.get_logger(__name__)
+
+# Result of a run of a sweep
+SweepResult = collections.namedtuple(
+    "SweepResult",
+    ["index", "parameters", "seed", "value", "error", "timed_out", "seconds", "output"],
+)
+
+
+def product(**axes) -> list:
+    """
+    This function is used to build the combinations of some parameter values
+
+    e.g. product(empathic_level=[0.2, 0.8], rationality_level=[0.0, 1.0])
+    returns the four combinations of both levels.
+
+    Args:
+        axes (list): Values of each parameter
+
+    Returns:
+        list: A dict of parameters for each combination
+    """
+    names = list(axes)
+    return [
+        dict(zip(names, values))
+        for values in itertools.product(*(axes[name] for name in names))
+    ]
+
+
+def apply_parameters(env, parameters):
+    """
+    This function is used to set the personality and affect parameters of the agents of an environment
+
+    Parameters are given by agent name, "*" for every affective agent:
+    {"proposer": {"traits": {"O": 0.1, ...}, "empathic_level": 0.8}}. The
+    parameters of an agent are:
+
+    - traits (dict): OCEAN traits of the personality
+    - rationality_level (float): Rationality level of the personality
+    - empathic_level (float): Empathic level of the personality
+    - affst_parameters: Parameters of the affective model (see Environment.build_agents)
+
+    Args:
+        env (Environment): The environment
+        parameters (dict): Parameters of each agent
+
+    Raises:
+        KeyError: If there is no agent with a given name
+        ValueError: If a parameter is unknown
+    """
+    for target, values in parameters.items():
+        if target == "*":
+            agents = [
+                agent
+                for agent in env.agents.values()
+                if isinstance(agent, pygenia.affective_agent.AffectiveAgent)
+            ]
+        else:
+            agents = [env.agents[target]]
+        for agent in agents:
+            for name, value in values.items():
+                if name == "traits":
+                    agent.personality.init_attributes(value)
+                elif name == "rationality_level":
+                    agent.personality.set_rationality_level(value)
+                elif name == "empathic_level":
+                    agent.personality.set_empathic_level(value)
+                elif name == "affst_parameters":
+                    mood = agent.emotional_engine.affective_info.get_mood()
+                    mood.init_parameters(value)
+                    agent.personality.set_personality(parameters=value)
+                else:
+                    raise ValueError("unknown agent parameter '%s'" % name)
+
+
+def final_moods(env) -> dict:
+    """
+    This function is used to get the mood and the affective labels of each affective agent
+
+    It is the default result of a run of a sweep.
+
+    Args:
+        env (Environment): The environment, after the run
+
+    Returns:
+        dict: Values and labels of the mood of each agent
+    """
+    moods = {}
+    for name, agent in env.agents.items():
+        if (
+            isinstance(agent, pygenia.affective_agent.AffectiveAgent)
+            and agent.emotional_engine is not None
+        ):
+            mood = agent.emotional_engine.affective_info.get_mood()
+            moods[name] = {
+                "values": mood.get_values(),
+                "labels": list(mood.get_affective_labels()),
+            }
+    return moods
+
+
+# Snapshot and settings of the sweep in each worker process
+_worker = {}
+
+
+def _init_worker(snapshot, actions, collect, scheduled, output):
+    _worker.update(
+        snapshot=snapshot,
+        actions=actions,
+        collect=collect,
+        scheduled=scheduled,
+        output=output,
+    )
+
+
+def _run(index, parameters, seed):
+    """
+    This function is used to run an environment of a sweep in a worker
+
+    Args:
+        index (int): Index of the run
+        parameters (dict): Parameters of the agents (see apply_parameters)
+        seed (int): Seed of random and numpy.random, None to keep them
+
+    Returns:
+        SweepResult: The result of the run
+    """
+    start = time.perf_counter()
+    value = error = None
+    stdout = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(stdout):
+            # The agents are restored compiled, the sources are not parsed
+            env = pygenia.snapshot.loads(_worker["snapshot"], _worker["actions"])
+            apply_parameters(env, parameters)
+            if seed is not None:
+                random.seed(seed)
+                np.random.seed(seed % 2**32)
+            env.run(scheduled=_worker["scheduled"])
+            value = _worker["collect"](env)
+    except Exception:
+        error = traceback.format_exc()
+    return SweepResult(
+        index,
+        parameters,
+        seed,
+        value,
+        error,
+        False,
+        time.perf_counter() - start,
+        stdout.getvalue() if _worker["output"] else None,
+    )
+
+
+def _serve(connection, settings):
+    """
+    This function is used to run the runs sent to a worker process, until it gets None
+
+    Args:
+        connection (multiprocessing.connection.Connection): Connection to the sweep
+        settings (tuple): Snapshot and settings of the sweep (see _init_worker)
+    """
+    _init_worker(*settings)
+    while True:
+        run = connection.recv()
+        if run is None:
+            break
+        connection.send(_run(*run))
+
+
+class SweepRunner:
+    """
+    This class is used to run an environment under many sets of parameters
+    in a pool of worker processes.
+
+    The environment is built once (e.g. by an example script) and saved as a
+    snapshot that every worker restores for each run, so the agent programs
+    are compiled once for the whole sweep (see pygenia.snapshot). Each run
+    sets the parameters of its agents (see apply_parameters), seeds random
+    and numpy.random, runs the environment and returns the result of collect.
+
+    Args:
+        env (Environment): The environment to run, not running
+        workers (int): Number of worker processes, the number of CPUs by default
+        collect (callable): Called with the environment after each run, its
+            result must be picklable, final_moods by default
+        actions (list): Action registries of the agents, the standard library by default
+        scheduled (bool): Run the environments on a scheduler (see Environment.run)
+        output (bool): Keep what each run prints in its result, it is discarded by default
+    """
+
+    def __init__(
+        self,
+        env,
+        workers=None,
+        collect=final_moods,
+        actions=None,
+        scheduled=False,
+        output=False,
+    ):
+        self.snapshot = pygenia.snapshot.dumps(env, actions)
+        self.workers = workers or os.cpu_count() or 1
+        self.collect = collect
+        self.actions = actions
+        self.scheduled = scheduled
+        self.output = output
+
+    def _settings(self):
+        return (self.snapshot, self.actions, self.collect, self.scheduled, self.output)
+
+    def _start_worker(self):
+        connection, worker_connection = multiprocessing.Pipe()
+        process = multiprocessing.Process(
+            target=_serve, args=(worker_connection, self._settings())
+        )
+        process.start()
+        worker_connection.close()
+        return connection, process
+
+    def _run_processes(self, runs, timeout):
+        """
+        This method is used to run the runs of a sweep in worker processes
+
+        The deadline of each run is kept by this process: a worker whose run
+        exceeds its timeout is killed and replaced by a new one.
+
+        Args:
+            runs (list): Index, parameters and seed of each run
+            timeout (float): Seconds each run may last, None for no limit
+
+        Returns:
+            Iterator[SweepResult]: The results, in the order the runs end
+        """
+        pending = collections.deque(runs)
+        idle = []
+        # Run, start and process of each busy worker, by its connection
+        busy = {}
+        try:
+            while pending or busy:
+                while pending and len(busy) < self.workers:
+                    connection, process = idle.pop() if idle else self._start_worker()
+                    run = pending.popleft()
+                    connection.send(run)
+                    busy[connection] = (run, time.perf_counter(), process)
+
+                wait = None
+                if timeout is not None:
+                    first_start = min(start for _, start, _ in busy.values())
+                    wait = max(0.0, first_start + timeout - time.perf_counter())
+                for connection in multiprocessing.connection.wait(list(busy), wait):
+                    run, start, process = busy.pop(connection)
+                    try:
+                        result = connection.recv()
+                    except EOFError:
+                        process.join()
+                        connection.close()
+                        result = SweepResult(
+                            *run,
+                            None,
+                            "worker exited with code %s" % process.exitcode,
+                            False,
+                            time.perf_counter() - start,
+                            None,
+                        )
+                    else:
+                        idle.append((connection, process))
+                    yield result
+
+                for connection, (run, start, process) in list(busy.items()):
+                    seconds = time.perf_counter() - start
+                    if timeout is not None and seconds >= timeout:
+                        del busy[connection]
+                        process.kill()
+                        process.join()
+                        connection.close()
+                        yield SweepResult(
+                            *run,
+                            None,
+                            "run timed out after %s seconds" % timeout,
+                            True,
+                            seconds,
+                            None,
+                        )
+        finally:
+            for connection, process in idle:
+                connection.send(None)
+            for _, _, process in busy.values():
+                process.kill()
+            workers = idle + [
+                (connection, process) for connection, (_, _, process) in busy.items()
+            ]
+            for connection, process in workers:
+                process.join()
+                connection.close()
+
+    def run(self, parameters, seed=0, timeout=None):
+        """
+        This method is used to run the sweep, yielding the result of each run as soon as it ends
+
+        The runs are run in worker processes, the timeout is kept by this
+        process, which kills the worker of a run that exceeds it: what the
+        run printed is lost. With a single worker, or a single run, and no
+        timeout, the runs are run in this process instead.
+
+        Args:
+            parameters (list): Parameters of the agents of each run (see apply_parameters)
+            seed (int): Seed of the first run, run i uses seed + i, None not to seed the runs
+            timeout (float): Seconds each run may last, None for no limit
+
+        Returns:
+            Iterator[SweepResult]: The results, in the order the runs end
+        """
+        runs = [
+            (index, run_parameters, None if seed is None else seed + index)
+            for index, run_parameters in enumerate(parameters)
+        ]
+        if timeout is None and (self.workers == 1 or len(runs) <= 1):
+            _init_worker(*self._settings())
+            for run in runs:
+                yield _run(*run)
+            return
+
+        yield from self._run_processes(runs, timeout)
+
+    def run_all(self, parameters, seed=0, timeout=None) -> list:
+        """
+        This method is used to run the sweep and wait for every run
+
+        Returns:
+            list: The results, in the order of the parameters (see run)
+        """
+        results = list(self.run(parameters, seed, timeout))
+        results.sort(key=lambda result: result.index)
+        return results
@@ -0,0 +1,304 @@
+import concurrent.futures
+import glob
+import math
+import os
+
+import numpy as np
+
+# Columns of a trace and their types
+COLUMNS = (
+    ("agent", np.int32),
+    ("tick", np.int64),
+    ("time", np.float64),
+    ("pleasure", np.float32),
+    ("arousal", np.float32),
+    ("dominance", np.float32),
+    ("labels", np.int32),
+    ("desirability", np.float32),
+    ("likelihood", np.float32),
+    ("controllability", np.float32),
+    ("expectedness", np.float32),
+    ("causal_attribution", np.int8),
+    ("plan", np.int32),
+    ("plans_selected", np.int32),
+)
+
+# Codes of the causal attribution column
+CAUSAL_ATTRIBUTIONS = (None, "self", "other")
+
+_APPRAISAL_VARIABLES = ("desirability", "likelihood", "controllability", "expectedness")
+_NO_VALUES = (math.nan, math.nan, math.nan)
+
+
+class TraceRecorder:
+    """
+    This class is used to record the trajectory of the affective agents: one
+    row per agent and cycle with the mood (pleasure, arousal and dominance),
+    the affective labels, the appraisal variables and the plan selected in
+    the cycle.
+
+    Rows are written into preallocated columnar buffers of chunk_size rows.
+    Labels, plans and agent names are stored as integer codes into
+    vocabularies. When the buffers are full they are flushed as a chunk, a
+    compressed NumPy file (trace-00000.npz, trace-00001.npz...) in path, by a
+    background thread so compression does not stall the agents. Without a
+    path the chunks are kept in memory.
+
+    Agents only pay for tracing when a recorder is set on them (see
+    Environment.enable_tracing).
+
+    Args:
+        path (str): Directory of the chunk files, None to keep the chunks in memory
+        chunk_size (int): Rows of each chunk
+        every (int): Only record one cycle out of every cycles of each agent
+        on_change (bool): Only record a cycle if the mood, the labels, the
+            appraisal variables or the selected plan changed
+        compress (bool): Compress the chunk files
+        name (str): Prefix of the chunk files
+
+    Attributes:
+        chunks (list): Columns of the flushed chunks, if path is None
+        rows (int): Number of recorded rows
+        skipped (int): Number of cycles not recorded because of the downsampling
+    """
+
+    def __init__(
+        self,
+        path=None,
+        chunk_size=65536,
+        every=1,
+        on_change=False,
+        compress=True,
+        name="trace",
+    ):
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be positive, got: %r" % chunk_size)
+        if every < 1:
+            raise ValueError("every must be positive, got: %r" % every)
+        self.path = path
+        self.chunk_size = chunk_size
+        self.every = every
+        self.on_change = on_change
+        self.compress = compress
+        self.name = name
+        self.chunks = []
+        self.rows = 0
+        self.skipped = 0
+
+        self.agents = []
+        self.labels = []
+        self.plans = []
+        self._agent_codes = {}
+        self._label_codes = {}
+        self._plan_codes = {}
+        # Per agent: [cycles, last recorded state, last plan, plans selected]
+        self._state = {}
+
+        self._buffers = None
+        self._size = 0
+        self._chunk = 0
+        self._executor = None
+        self._pending = []
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+        self._allocate()
+
+    def _allocate(self):
+        self._buffers = {
+            column: np.empty(self.chunk_size, dtype=dtype) for column, dtype in COLUMNS
+        }
+        self._size = 0
+
+    @staticmethod
+    def _code(codes, vocabulary, key, value):
+        code = codes.get(key)
+        if code is None:
+            code = codes[key] = len(vocabulary)
+            vocabulary.append(value)
+        return code
+
+    def _agent_state(self, agent):
+        state = self._state.get(agent.name)
+        if state is None:
+            self._code(self._agent_codes, self.agents, agent.name, agent.name)
+            state = self._state[agent.name] = [0, None, -1, 0]
+        return state
+
+    def select_plan(self, agent, plan):
+        """
+        This method is used to record the plan selected by an agent in its current cycle
+
+        Args:
+            agent (AffectiveAgent): The agent
+            plan (agentspeak.runtime.Plan): The selected plan
+        """
+        state = self._agent_state(agent)
+        code = self._plan_codes.get(plan)
+        if code is None:
+            code = self._code(self._plan_codes, self.plans, plan, plan.name())
+        state[2] = code
+        state[3] += 1
+
+    def record(self, agent):
+        """
+        This method is used to record the current cycle of an agent
+
+        Args:
+            agent (AffectiveAgent): The agent
+        """
+        state = self._agent_state(agent)
+        tick = state[0]
+        state[0] += 1
+        plan, plans_selected = state[2], state[3]
+        state[2], state[3] = -1, 0
+        if tick % self.every:
+            self.skipped += 1
+            return
+
+        engine = agent.emotional_engine
+        if engine is not None:
+            mood = engine.affective_info.get_mood()
+            values = mood.get_values() or _NO_VALUES
+            labels = tuple(mood.get_affective_labels())
+            appraisal = engine.affective_info.get_appraisal_variables()
+        else:
+            values, labels, appraisal = _NO_VALUES, (), {}
+        variables = tuple(
+            appraisal.get(variable) for variable in _APPRAISAL_VARIABLES
+        )
+        causal_attribution = appraisal.get("causal_attribution")
+
+        if self.on_change:
+            key = (values, labels, variables, causal_attribution, plan)
+            if key == state[1]:
+                self.skipped += 1
+                return
+            state[1] = key
+
+        buffers = self._buffers
+        i = self._size
+        buffers["agent"][i] = self._agent_codes[agent.name]
+        buffers["tick"][i] = tick
+        buffers["time"][i] = agent.env.time()
+        buffers["pleasure"][i], buffers["arousal"][i], buffers["dominance"][i] = values
+        buffers["labels"][i] = self._code(
+            self._label_codes, self.labels, labels, "|".join(map(str, labels))
+        )
+        for variable, value in zip(_APPRAISAL_VARIABLES, variables):
+            buffers[variable][i] = math.nan if value is None else value
+        buffers["causal_attribution"][i] = (
+            CAUSAL_ATTRIBUTIONS.index(causal_attribution)
+            if causal_attribution in CAUSAL_ATTRIBUTIONS
+            else -1
+        )
+        buffers["plan"][i] = plan
+        buffers["plans_selected"][i] = plans_selected
+        self._size = i + 1
+        self.rows += 1
+        if self._size == self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """
+        This method is used to write the recorded rows as a chunk
+        """
+        if self._size == 0:
+            return
+        columns = self._columns()
+        # The flushed buffers are handed over, new ones are filled meanwhile
+        self._allocate()
+
+        if self.path is None:
+            self.chunks.append(columns)
+            return
+        filename = os.path.join(self.path, "%s-%05d.npz" % (self.name, self._chunk))
+        self._chunk += 1
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self._pending = [future for future in self._pending if not future.done()]
+        self._pending.append(self._executor.submit(self._write, filename, columns))
+
+    def _columns(self):
+        columns = {
+            column: buffer[: self._size] for column, buffer in self._buffers.items()
+        }
+        columns["agent_names"] = np.array(self.agents, dtype=str)
+        columns["label_names"] = np.array(self.labels, dtype=str)
+        columns["plan_names"] = np.array(self.plans, dtype=str)
+        return columns
+
+    def _write(self, filename, columns):
+        if self.compress:
+            np.savez_compressed(filename, **columns)
+        else:
+            np.savez(filename, **columns)
+
+    def close(self):
+        """
+        This method is used to flush the remaining rows and wait for the chunk files to be written
+        """
+        self.flush()
+        for future in self._pending:
+            future.result()
+        self._pending = []
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def to_columns(self) -> dict:
+        """
+        This method is used to get the rows recorded in memory (see read_trace)
+
+        Returns:
+            dict: The columns of the trace
+        """
+        chunks = self.chunks
+        if self._size:
+            chunks = chunks + [self._columns()]
+        return concatenate_chunks(chunks)
+
+
+def concatenate_chunks(chunks) -> dict:
+    """
+    This function is used to join the chunks of a trace
+
+    The codes of the vocabularies never change, so the vocabularies of the
+    last chunk are valid for every chunk.
+
+    Args:
+        chunks (list): Columns of each chunk, in order
+
+    Returns:
+        dict: The columns of the trace and the vocabularies (agent_names,
+        label_names and plan_names)
+    """
+    if not chunks:
+        trace = {column: np.empty(0, dtype=dtype) for column, dtype in COLUMNS}
+        for vocabulary in ("agent_names", "label_names", "plan_names"):
+            trace[vocabulary] = np.empty(0, dtype=str)
+        return trace
+    trace = {
+        column: np.concatenate([chunk[column] for chunk in chunks])
+        for column, _ in COLUMNS
+    }
+    for vocabulary in ("agent_names", "label_names", "plan_names"):
+        trace[vocabulary] = chunks[-1][vocabulary]
+    return trace
+
+
+def read_trace(path, name="trace") -> dict:
+    """
+    This function is used to read the chunk files of a trace
+
+    Args:
+        path (str): Directory of the chunk files
+        name (str): Prefix of the chunk files
+
+    Returns:
+        dict: The columns of the trace (see concatenate_chunks)
+    """
+    chunks = []
+    for filename in sorted(glob.glob(os.path.join(path, "%s-[0-9]*.npz" % glob.escape(name)))):
+        with np.load(filename) as chunk:
+            chunks.append({key: chunk[key] for key in chunk.files})
+    return concatenate_chunks(chunks)
@@ -4,6 +4,7 @@ import copy
 import functools
 
 import agentspeak
+import agentspeak.parser
 import agentspeak.runtime
 import agentspeak.stdlib
 import agentspeak.util
@@ -15,6 +16,10 @@ C = {}
 
 
 class Instruction(agentspeak.runtime.Instruction):
+    # agentspeak.runtime.Instruction has no slots, so only the attributes
+    # added here are kept out of the instance dict
+    __slots__ = ("term", "goal_type")
+
     def __init__(
         self,
         f,
@@ -28,6 +33,31 @@ class Instruction(agentspeak.runtime.Instruction):
         self.goal_type = goal_type
 
 
+def push_query(query, agent, intention):
+    """
+    This function is used to push a query on the query stack of an intention
+
+    The call that created each query is kept in the query_calls of the
+    intention, at the same position, so a query that has not started yet
+    can be saved as that call (see pygenia.snapshot).
+
+    Args:
+        query (agentspeak.runtime.Query): The query
+        agent (Agent): The agent that runs the intention
+        intention (agentspeak.runtime.Intention): The intention
+
+    Returns:
+        bool: Always True
+    """
+    generator = query.execute(agent, intention)
+    calls = intention.__dict__.setdefault("query_calls", [])
+    # The calls above the top of the stack belong to popped queries
+    del calls[len(intention.query_stack) :]
+    calls.append((generator, query, agent))
+    intention.query_stack.append(generator)
+    return True
+
+
 class TermQuery(agentspeak.runtime.TermQuery):
 
     def execute_concern(self, agent, intention, concern):
@@ -41,7 +71,11 @@ class TermQuery(agentspeak.runtime.TermQuery):
 
         choicepoint = object()
 
-        concern = copy.deepcopy(concern)
+        # Concerns are compiled once and evaluated in place. A fresh copy is
+        # only needed when the scope already binds its variables, e.g. when
+        # the concern is tested again while an evaluation is in progress.
+        if concern.is_bound(intention.scope):
+            concern = copy.deepcopy(concern)
         intention.stack.append(choicepoint)
 
         if agentspeak.unify(term, concern.head, intention.scope, intention.stack):
@@ -71,6 +105,96 @@ class BuildQueryVisitor(agentspeak.runtime.BuildQueryVisitor):
             return agentspeak.runtime.TermQuery(term)
 
 
+class ConcernDependencyVisitor(agentspeak.parser.AstBaseVisitor):
+    """
+    This class is used to collect, from the ast of a query, the beliefs that
+    the query reads.
+
+    Queries of rules are followed into the bodies of the rules. Actions are
+    assumed to only read the beliefs written in their arguments (e.g.
+    .count(offer(_), N)). A variable used as a query can read any belief, so
+    the dependencies of the query are then unknown.
+
+    Args:
+        actions (agentspeak.Actions): Actions of the agent
+        rules (dict): Bodies of the rules of the agent by (functor, arity)
+
+    Attributes:
+        dependencies (set): (functor, arity) of the beliefs read by the query
+        unknown (bool): True if the beliefs read by the query can not be known statically
+        calls_actions (bool): True if the query calls actions, whose results
+            may not only depend on the beliefs
+    """
+
+    def __init__(self, actions, rules=None):
+        self.actions = actions
+        self.rules = rules or {}
+        self.dependencies = set()
+        self.unknown = False
+        self.calls_actions = False
+        self._visited_rules = set()
+
+    def get_dependencies(self):
+        """
+        This method is used to get the dependencies of the visited queries
+
+        Returns:
+            frozenset: (functor, arity) of the beliefs read, None if they are unknown
+        """
+        if self.unknown:
+            return None
+        return frozenset(self.dependencies)
+
+    def visit_literal(self, ast_literal):
+        signature = (ast_literal.functor, len(ast_literal.terms))
+        try:
+            self.actions.lookup(*signature)
+        except KeyError:
+            self.dependencies.add(signature)
+            if signature in self.rules and signature not in self._visited_rules:
+                self._visited_rules.add(signature)
+                for consequence in self.rules[signature]:
+                    consequence.accept(self)
+            return
+        self.calls_actions = True
+        for term in ast_literal.terms:
+            self._visit_term(term)
+
+    def _visit_term(self, ast_node):
+        # Literals nested in the arguments of an action.
+        if isinstance(ast_node, agentspeak.parser.AstLiteral):
+            self.dependencies.add((ast_node.functor, len(ast_node.terms)))
+            children = ast_node.terms
+        elif isinstance(ast_node, agentspeak.parser.AstList):
+            children = ast_node.terms
+        elif isinstance(ast_node, agentspeak.parser.AstLinkedList):
+            children = (ast_node.head, ast_node.tail)
+        elif isinstance(ast_node, agentspeak.parser.AstBinaryOp):
+            children = (ast_node.left, ast_node.right)
+        elif isinstance(ast_node, agentspeak.parser.AstUnaryOp):
+            children = (ast_node.operand,)
+        else:
+            children = ()
+        for child in children:
+            self._visit_term(child)
+
+    def visit_binary_op(self, ast_binary_op):
+        # Unifications and comparisons do not read beliefs.
+        if ast_binary_op.operator in (
+            agentspeak.BinaryOp.op_and,
+            agentspeak.BinaryOp.op_or,
+        ):
+            ast_binary_op.left.accept(self)
+            ast_binary_op.right.accept(self)
+
+    def visit_unary_op(self, ast_unary_op):
+        if ast_unary_op.operator == agentspeak.UnaryOp.op_not:
+            ast_unary_op.operand.accept(self)
+
+    def visit_variable(self, ast_variable):
+        self.unknown = True
+
+
 class TrueQuery(agentspeak.runtime.TrueQuery):
     def __str__(self):
         return "true"
@@ -93,6 +217,10 @@ class ActionQuery(agentspeak.runtime.ActionQuery):
 
 class BuildInstructionsVisitor(agentspeak.runtime.BuildInstructionsVisitor):
     def add_instr(self, f, loc=None, extra_locs=(), term=None, goal_type=None):
+        # The visitors inherited from agentspeak (if, while, for) push their
+        # queries with agentspeak.runtime.push_query
+        if getattr(f, "func", None) is agentspeak.runtime.push_query:
+            f = functools.partial(push_query, *f.args)
         self.tail.success = Instruction(f, loc, extra_locs, term, goal_type)
         self.tail = self.tail.success
         return self.tail
@@ -173,7 +301,7 @@ class BuildInstructionsVisitor(agentspeak.runtime.BuildInstructionsVisitor):
             query = ast_formula.term.accept(
                 BuildQueryVisitor(self.variables, self.actions, self.log)
             )
-            self.add_instr(functools.partial(agentspeak.runtime.push_query, query))
+            self.add_instr(functools.partial(push_query, query))
             self.add_instr(agentspeak.runtime.next_or_fail, loc=ast_formula.term.loc)
             self.add_instr(agentspeak.runtime.pop_query)
 
@@ -0,0 +1,121 @@
+"""Helpers shared by the tests of pygenia."""
+
+import contextlib
+import io
+import os
+import re
+import runpy
+import tempfile
+
+import agentspeak.stdlib
+
+import pygenia.affective_agent
+import pygenia.environment
+
+EXAMPLES = os.path.join(os.path.dirname(os.path.dirname(__file__)), "examples")
+
+# Addresses of objects and names of fresh variables change from run to run
+_VOLATILE = re.compile(r"0x[0-9a-f]+|_X_[0-9a-f_]+")
+
+
+def write_source(directory, name, text):
+    """
+    This function is used to write the source of an agent in a directory
+
+    Args:
+        directory (str): The directory
+        name (str): Name of the file, without the .asl extension
+        text (str): The source
+
+    Returns:
+        str: Path of the file
+    """
+    path = os.path.join(directory, name + ".asl")
+    with open(path, "w") as source:
+        source.write(text)
+    return path
+
+
+def build_agents(env, text, n=1, name="agent", agent_cls=None, **kwargs):
+    """
+    This function is used to build agents from the text of their source
+
+    Args:
+        env (Environment): The environment
+        text (str): The source of the agents
+        n (int): Number of agents
+        name (str): Name of the agents
+        agent_cls (type): Class of the agents, AffectiveAgent by default
+        kwargs: Other arguments of Environment.build_agents
+
+    Returns:
+        list: The agents
+    """
+    if agent_cls is None:
+        agent_cls = pygenia.affective_agent.AffectiveAgent
+    with tempfile.TemporaryDirectory() as directory:
+        with open(write_source(directory, name, text)) as source:
+            return env.build_agents(
+                source, n, agentspeak.stdlib.actions, agent_cls, **kwargs
+            )
+
+
+def make_environment(sources, cls=pygenia.environment.Environment, **kwargs):
+    """
+    This function is used to build an environment with an agent for each source
+
+    Args:
+        sources (dict): Source of each agent, by name
+        cls (type): Class of the environment
+        kwargs: Other arguments of Environment.build_agents
+
+    Returns:
+        Environment: The environment
+    """
+    env = cls()
+    for name, text in sources.items():
+        build_agents(env, text, name=name, **kwargs)
+    return env
+
+
+def run_output(env, **kwargs) -> list:
+    """
+    This function is used to run an environment and get what its agents print
+
+    Args:
+        env (Environment): The environment
+        kwargs: Arguments of Environment.run
+
+    Returns:
+        list: The printed lines
+    """
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        env.run(**kwargs)
+    return output.getvalue().splitlines()
+
+
+def normalize(lines) -> list:
+    """
+    This function is used to remove the parts of the output that change from run to run
+
+    Args:
+        lines (list): The printed lines
+
+    Returns:
+        list: The lines without object addresses and names of fresh variables
+    """
+    return [_VOLATILE.sub("_", line) for line in lines]
+
+
+def load_example(path):
+    """
+    This function is used to build the environment of an example without running it
+
+    Args:
+        path (str): Path of the script of the example, relative to the examples directory
+
+    Returns:
+        Environment: The environment of the example
+    """
+    return runpy.run_path(os.path.join(EXAMPLES, path), run_name="example")["env"]
@@ -0,0 +1,273 @@
+#!/usr/bin/env python
+
+"""Tests for `pygenia.affective_agent`."""
+
+
+import unittest
+import unittest.mock
+
+import agentspeak
+import agentspeak.runtime
+
+import pygenia.affective_agent  # noqa: F401
+import pygenia.environment
+from pygenia.cognitive_engine.emotional_engine import Concern
+from pygenia.utils import TermQuery
+
+from tests.helpers import build_agents, make_environment, run_output
+
+SOURCE = """
+concern__(X) :- me(3) & X = 0.4 | me(1) & X = 0.6.
+me(3).
++!start <- .print("start").
+"""
+
+
+class TestClone(unittest.TestCase):
+    """Clones of a prototype do not change it or their siblings."""
+
+    def setUp(self):
+        self.env = pygenia.environment.Environment()
+        self.prototype, self.clone, self.sibling = build_agents(self.env, SOURCE, 3)
+
+    def test_shared_items(self):
+        self.assertIsNot(self.clone.concerns, self.prototype.concerns)
+        self.assertIsNot(self.clone.plans, self.prototype.plans)
+        self.assertIsNot(self.clone.rules, self.prototype.rules)
+        # The compiled concerns themselves are shared
+        self.assertEqual(
+            [id(concern) for concern in self.clone.concerns[("concern__", 1)]],
+            [id(concern) for concern in self.prototype.concerns[("concern__", 1)]],
+        )
+
+    def test_add_concern(self):
+        head = agentspeak.Literal("extra__", (agentspeak.Var(),))
+        self.clone.add_concern(Concern(head, None))
+        self.assertIn(("extra__", 1), self.clone.concerns)
+        self.assertNotIn(("extra__", 1), self.prototype.concerns)
+        self.assertNotIn(("extra__", 1), self.sibling.concerns)
+        self.assertIs(self.clone.emotional_engine.concerns, self.clone.concerns)
+
+
+def indexed_waiters(agent):
+    return sum(len(waiting) for waiting in agent.waiting_intentions.values())
+
+
+class TestWaiters(unittest.TestCase):
+    """The index of the intentions waiting for an event does not grow without bound."""
+
+    def test_timeouts(self):
+        # 2000 waits for an event that never happens, each timing out
+        source = "!start.\n+!start <- %s; .print(done).\n+!w <- %s." % (
+            "; ".join(["!w"] * 200),
+            "; ".join(['.wait("+never", 1)'] * 10),
+        )
+        env = make_environment({"agent": source})
+        env.enable_virtual_time()
+        self.assertEqual(run_output(env), ["agent done"])
+        self.assertAlmostEqual(env.time(), 2.0)
+        agent = env.agents["agent"]
+        self.assertLessEqual(indexed_waiters(agent), 64)
+
+        agent.prune_waiters()
+        self.assertEqual(agent.waiting_intentions, {})
+
+    def test_woken(self):
+        source = """
+        !start.
+        !signal.
+        +!start <- .wait("+go"); .print(woken).
+        +!signal <- .wait(10); +go.
+        """
+        env = make_environment({"agent": source})
+        env.enable_virtual_time()
+        self.assertEqual(run_output(env), ["agent woken"])
+        self.assertEqual(env.agents["agent"].waiting_intentions, {})
+
+    def test_removed_intention(self):
+        source = """
+        !start.
+        !stop.
+        +!start <- .wait("+never").
+        +!stop <- .send(agent, unachieve, start).
+        """
+        env = make_environment({"agent": source})
+        run_output(env)
+        agent = env.agents["agent"]
+        self.assertEqual(indexed_waiters(agent), 1)
+        agent.prune_waiters()
+        self.assertEqual(agent.waiting_intentions, {})
+
+
+class TestBlockedQueue(unittest.TestCase):
+    """A message to a full event queue with the block policy waits for the next SelEv."""
+
+    def test_send_from_execint(self):
+        sender = """
+        !start.
+        +!start <- .send(receiver, achieve, m); .print(sent).
+        """
+        # The initial goal fills the queue of the receiver until it runs
+        receiver = """
+        !idle.
+        +!idle <- .print(idle).
+        +!m <- .print(m).
+        """
+        env = make_environment({"sender": sender, "receiver": receiver})
+        agent = env.agents["receiver"]
+        agent.set_queue_limits(1, "block")
+
+        # The rational cycle is never run from inside add_event
+        add_event = agent.circumstance.add_event
+        deliberate = agent.rational_cycle.applySemanticRuleDeliberate
+        adding = []
+        nested = []
+        held = []
+
+        def checked_add_event(event):
+            adding.append(event)
+            try:
+                add_event(event)
+                held.append(len(agent.circumstance.get_events().held))
+            finally:
+                adding.pop()
+
+        def checked_deliberate(*args):
+            nested.append(bool(adding))
+            return deliberate(*args)
+
+        agent.circumstance.add_event = checked_add_event
+        agent.rational_cycle.applySemanticRuleDeliberate = checked_deliberate
+
+        self.assertEqual(
+            run_output(env), ["sender sent", "receiver idle", "receiver m"]
+        )
+        self.assertEqual(held, [1])
+        self.assertTrue(nested)
+        self.assertNotIn(True, nested)
+        stats = agent.queue_depths()["events"]
+        self.assertEqual(
+            (stats["depth"], stats["max_depth"], stats["held"], stats["dropped"]),
+            (0, 1, 0, 0),
+        )
+
+
+class TestConcernRelevance(unittest.TestCase):
+    """Beliefs no concern reads are only appraised if the agent asks for it."""
+
+    def appraised(self, text, beliefs, appraise_irrelevant_events):
+        env = pygenia.environment.Environment()
+        (agent,) = build_agents(env, text)
+        agent.appraise_irrelevant_events = appraise_irrelevant_events
+        agent.event_queue.clear()
+        for belief in beliefs:
+            agent.call(
+                agentspeak.Trigger.addition,
+                agentspeak.GoalType.belief,
+                belief,
+                agentspeak.runtime.Intention(),
+            )
+        # Every belief is added, appraised or not
+        for belief in beliefs:
+            self.assertIn(belief, agent.beliefs[(belief.functor, len(belief.args))])
+        return [str(term) for term, _ in agent.event_queue]
+
+    def test_relevant(self):
+        beliefs = [
+            agentspeak.Literal("me", (1,)),
+            agentspeak.Literal("other", (1,)),
+            agentspeak.Literal("me", (1, 2)),
+        ]
+        self.assertEqual(self.appraised(SOURCE, beliefs, False), ["me(1)"])
+        self.assertEqual(
+            self.appraised(SOURCE, beliefs, True), ["me(1)", "other(1)", "me(1, 2)"]
+        )
+
+        (agent,) = build_agents(pygenia.environment.Environment(), SOURCE)
+        self.assertTrue(agent.is_concern_relevant(beliefs[0]))
+        self.assertFalse(agent.is_concern_relevant(beliefs[1]))
+
+    def test_unknown_dependencies(self):
+        # A variable query may read any belief
+        text = "concern__(X) :- B = me(3) & B & X = 1."
+        beliefs = [agentspeak.Literal("other", (1,))]
+        self.assertEqual(self.appraised(text, beliefs, False), ["other(1)"])
+
+
+class TestConcernCache(unittest.TestCase):
+    """The value of a concern is only computed again when a belief it reads changes."""
+
+    def setUp(self):
+        self.evaluations = 0
+        execute_concern = TermQuery.execute_concern
+
+        def counted(query, *args):
+            self.evaluations += 1
+            return execute_concern(query, *args)
+
+        patcher = unittest.mock.patch.object(TermQuery, "execute_concern", counted)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def build(self, text):
+        env = pygenia.environment.Environment()
+        (self.agent,) = build_agents(env, text)
+        (self.concern,) = self.agent.concerns[("concern__", 1)]
+        # Building the agent computes the value of its concern once
+        self.assertEqual(self.evaluations, 1)
+        self.evaluations = 0
+
+    def value(self):
+        return self.agent.emotional_engine.test_concern(
+            self.concern.head, agentspeak.runtime.Intention(), self.concern
+        )
+
+    def test_repeated(self):
+        self.build(SOURCE)
+        self.assertEqual([self.value() for _ in range(3)], ["0.4"] * 3)
+        self.assertEqual(self.evaluations, 0)
+        # A belief the concern does not read keeps the cached value
+        self.agent.add_belief(agentspeak.Literal("other", (1,)), {})
+        self.assertEqual(self.value(), "0.4")
+        self.assertEqual(self.evaluations, 0)
+
+    def test_direct_change(self):
+        self.build(SOURCE)
+        self.assertEqual(self.value(), "0.4")
+        self.agent.remove_belief(
+            agentspeak.Literal("me", (3,)), agentspeak.runtime.Intention()
+        )
+        self.assertIs(self.value(), False)
+        self.agent.add_belief(agentspeak.Literal("me", (1,)), {})
+        self.assertEqual(self.value(), "0.6")
+        self.assertEqual(self.value(), "0.6")
+        self.assertEqual(self.evaluations, 2)
+
+    def test_change_through_rule(self):
+        self.build(
+            """
+            count(1).
+            happy :- count(N) & N > 2.
+            concern__(X) :- happy & X = 1 | X = 0.
+            """
+        )
+        self.assertEqual(self.value(), "0")
+        self.agent.add_belief(agentspeak.Literal("count", (3,)), {})
+        self.assertEqual(self.value(), "1")
+        self.assertEqual(self.value(), "1")
+        self.assertEqual(self.evaluations, 1)
+
+    def test_action(self):
+        self.build(
+            """
+            me(1).
+            concern__(X) :- .count(me(_), N) & X = N.
+            """
+        )
+        self.assertEqual([self.value() for _ in range(3)], ["1"] * 3)
+        self.assertEqual(self.evaluations, 3)
+        self.assertEqual(self.agent.concern_cache, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
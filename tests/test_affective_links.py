@@ -0,0 +1,231 @@
+#!/usr/bin/env python
+
+"""Tests for `pygenia.affective_links`."""
+
+
+import random
+import unittest
+
+import pygenia.affective_agent  # noqa: F401
+import pygenia.environment
+from pygenia.affective_links import AffectiveLinkStore
+from pygenia.empathic_agent import EmpathicAgent
+
+from tests.helpers import build_agents, load_example, normalize, run_output
+
+AGENTS = 30
+
+
+def reference_update(others, source, target, interaction_value, empathic_level):
+    # The dict of dicts of EmpathicAgent.update_affective_link
+    links = others.setdefault(source, {})
+    if target in links:
+        links[target] = max(
+            -1, min(1, links[target] + interaction_value * empathic_level)
+        )
+    else:
+        links[target] = interaction_value
+
+
+def reference_links(others) -> dict:
+    return {
+        (source, target): weight
+        for source, links in others.items()
+        for target, weight in links.items()
+    }
+
+
+def store_links(store) -> dict:
+    links = {}
+    for source in range(len(store.names)):
+        targets, weights = store.links_of(source)
+        for target, weight in zip(targets.tolist(), weights.tolist()):
+            links[(source, target)] = weight
+    return links
+
+
+class TestAffectiveLinkStore(unittest.TestCase):
+    """A link store holds the links the dicts of the empathic agents held."""
+
+    def setUp(self):
+        generator = random.Random(7)
+        # Few targets, so many interactions update the same link, and values
+        # large enough to be clipped
+        self.interactions = [
+            (
+                generator.randrange(AGENTS),
+                generator.randrange(5),
+                generator.uniform(-1.5, 1.5),
+                generator.random(),
+            )
+            for _ in range(2000)
+        ]
+        self.others = {}
+        for interaction in self.interactions:
+            reference_update(self.others, *interaction)
+
+    def make_store(self, merge_threshold=4096):
+        store = AffectiveLinkStore(merge_threshold)
+        for i in range(AGENTS):
+            store.id_of("agent%d" % i)
+        return store
+
+    def assertSameLinks(self, links, expected):
+        self.assertEqual(sorted(links), sorted(expected))
+        for key, weight in expected.items():
+            self.assertAlmostEqual(links[key], weight, places=12)
+
+    def test_update_link(self):
+        for merge_threshold in (1, 16, 4096):
+            with self.subTest(merge_threshold=merge_threshold):
+                store = self.make_store(merge_threshold)
+                for interaction in self.interactions:
+                    store.update_link(*interaction)
+                self.assertSameLinks(store_links(store), reference_links(self.others))
+                self.assertEqual(len(store), len(reference_links(self.others)))
+
+    def test_update_links(self):
+        store = self.make_store()
+        # A first link kept out of the arrays before the batch
+        store.update_link(*self.interactions[0])
+        store.update_links(*zip(*self.interactions[1:]))
+        self.assertSameLinks(store_links(store), reference_links(self.others))
+
+        # A single empathic level for every interaction
+        store = self.make_store()
+        sources, targets, values, _ = zip(*self.interactions)
+        store.update_links(sources, targets, values, 0.5)
+        others = {}
+        for interaction in self.interactions:
+            reference_update(others, *interaction[:3], 0.5)
+        self.assertSameLinks(store_links(store), reference_links(others))
+
+    def test_link(self):
+        store = self.make_store(merge_threshold=1)
+        store.set_link(1, 2, 0.5)
+        store.set_link(3, 2, -0.25)
+        store.set_link(1, 2, 0.75)
+        self.assertEqual(store.link(1, 2), 0.75)
+        self.assertTrue(store.has_link(3, 2))
+        self.assertFalse(store.has_link(2, 3))
+        with self.assertRaises(KeyError):
+            store.link(2, 3)
+        store.remove_link(1, 2)
+        self.assertFalse(store.has_link(1, 2))
+        with self.assertRaises(KeyError):
+            store.remove_link(1, 2)
+
+    def test_decay_prune(self):
+        store = self.make_store()
+        store.update_links(*zip(*self.interactions))
+        expected = reference_links(self.others)
+
+        store.decay(0.5, source=3)
+        store.decay(0.8)
+        for key in expected:
+            expected[key] *= 0.4 if key[0] == 3 else 0.8
+        self.assertSameLinks(store_links(store), expected)
+
+        removed = store.prune(0.3)
+        kept = {key: weight for key, weight in expected.items() if abs(weight) >= 0.3}
+        self.assertEqual(removed, len(expected) - len(kept))
+        self.assertSameLinks(store_links(store), kept)
+
+    def test_top(self):
+        store = self.make_store()
+        store.update_links(*zip(*self.interactions))
+        links = reference_links(self.others)
+        named = [
+            ("agent%d" % source, "agent%d" % target, weight)
+            for (source, target), weight in links.items()
+        ]
+        by_weight = sorted(named, key=lambda link: link[2])
+        for k in (1, 10, len(named) + 1):
+            with self.subTest(k=k):
+                self.assertEqual(
+                    [link[2] for link in store.strongest(k)],
+                    [link[2] for link in by_weight[::-1][:k]],
+                )
+                self.assertEqual(
+                    [link[2] for link in store.weakest(k)],
+                    [link[2] for link in by_weight[:k]],
+                )
+        of_source = [link for link in by_weight if link[0] == "agent4"]
+        strongest = store.strongest(3, source=4)
+        self.assertEqual({link[0] for link in strongest}, {"agent4"})
+        self.assertEqual(
+            [link[2] for link in strongest], [link[2] for link in of_source[::-1][:3]]
+        )
+        self.assertEqual(
+            [link[2] for link in store.weakest(3, source=4)],
+            [link[2] for link in of_source[:3]],
+        )
+        self.assertEqual(store.strongest(0), [])
+
+
+class TestLinkedOthers(unittest.TestCase):
+    """The others of an empathic agent bound to a store read as a dict."""
+
+    def setUp(self):
+        self.env = pygenia.environment.Environment()
+        (self.agent,) = build_agents(self.env, "", name="me", agent_cls=EmpathicAgent)
+        self.agent.set_others(
+            {
+                "friend": {"affective_link": 0.5, "role": "responder"},
+                "stranger": {"role": "proposer"},
+            }
+        )
+        self.store = self.env.enable_affective_links()
+
+    def test_bind_links(self):
+        self.assertIs(self.agent.links, self.store)
+        others = self.agent.get_others()
+        self.assertEqual(sorted(others), ["friend", "stranger"])
+        self.assertEqual(
+            dict(others["friend"]), {"affective_link": 0.5, "role": "responder"}
+        )
+        self.assertEqual(dict(others["stranger"]), {"role": "proposer"})
+        self.assertEqual(self.agent.get_affective_link("friend"), 0.5)
+        with self.assertRaises(KeyError):
+            self.agent.get_affective_link("stranger")
+        with self.assertRaises(KeyError):
+            others["nobody"]
+
+    def test_update(self):
+        self.agent.personality.set_empathic_level(0.5)
+        self.agent.update_affective_link("friend", 2.0)
+        self.agent.update_affective_link("stranger", -0.25)
+        self.assertEqual(self.agent.get_affective_link("friend"), 1)
+        self.assertEqual(self.agent.get_other("stranger")["affective_link"], -0.25)
+        self.assertEqual(self.store.strongest(1), [("me", "friend", 1.0)])
+
+        others = self.agent.get_others()
+        others["friend"]["affective_link"] = 0.1
+        friend = self.store.ids["friend"]
+        self.assertEqual(self.store.link(self.agent.link_id, friend), 0.1)
+        del others["friend"]
+        self.assertEqual(sorted(others), ["stranger"])
+        self.assertEqual(len(self.store), 1)
+
+
+class TestExamples(unittest.TestCase):
+    """The examples print the same with their links in a store."""
+
+    def test_examples(self):
+        for path in (
+            "ultimatum_game/environment.py",
+            "prisoner_dilemma/environment.py",
+        ):
+            with self.subTest(example=path):
+                env = load_example(path)
+                env.enable_virtual_time()
+                expected = normalize(run_output(env))
+                env = load_example(path)
+                env.enable_virtual_time()
+                links = env.enable_affective_links()
+                self.assertEqual(normalize(run_output(env)), expected)
+                self.assertTrue(len(links))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+
+"""Tests for `pygenia.cognitive_engine.affective_memory`."""
+
+
+import unittest
+
+import agentspeak
+
+from pygenia.cognitive_engine.affective_memory import AffectiveMemory
+
+
+def event(functor, *args):
+    return (agentspeak.Literal(functor, args), agentspeak.Trigger.addition)
+
+
+def times(records) -> list:
+    return [record.time for record in records]
+
+
+class TestAffectiveMemory(unittest.TestCase):
+    """The memory keeps the last records and the summaries of every record."""
+
+    def test_capacity(self):
+        memory = AffectiveMemory(capacity=100)
+        for i in range(1000):
+            memory.append(event("a" if i % 2 else "b", i), i, value=i, emotions=["x"])
+        self.assertEqual(len(memory), 100)
+        self.assertEqual(memory.evicted, 900)
+        self.assertEqual(times(memory), list(range(900, 1000)))
+        self.assertEqual((memory[0].time, memory[-1].time), (900, 999))
+        with self.assertRaises(IndexError):
+            memory[100]
+        self.assertEqual(times(memory.by_functor("a", 1)), list(range(901, 1000, 2)))
+        self.assertEqual(times(memory.by_functor("b")), list(range(900, 1000, 2)))
+
+        memory.configure(capacity=10)
+        self.assertEqual(times(memory), list(range(990, 1000)))
+        self.assertEqual(memory.evicted, 990)
+
+    def test_max_age(self):
+        memory = AffectiveMemory(capacity=None, max_age=10)
+        for i in range(100):
+            memory.append(event("a"), i)
+        # A record is kept while it is at most max_age old
+        self.assertEqual(times(memory), list(range(89, 100)))
+        memory.expire(105)
+        self.assertEqual(times(memory), list(range(95, 100)))
+        memory.expire(200)
+        self.assertFalse(memory)
+        self.assertEqual(memory.evicted, 100)
+        self.assertEqual(memory.by_functor("a", 0), [])
+
+        memory.append(event("a"), 201)
+        memory.configure(capacity=None, max_age=0.5)
+        self.assertEqual(times(memory), [201])
+
+    def test_window(self):
+        memory = AffectiveMemory(capacity=50)
+        for i in range(200):
+            # Two records for each time
+            memory.append(event("a"), i // 2)
+        self.assertEqual(times(memory), [i // 2 for i in range(150, 200)])
+        self.assertEqual(times(memory.window(80, 82)), [80, 80, 81, 81, 82, 82])
+        self.assertEqual(times(memory.window(end=75)), [75, 75])
+        self.assertEqual(times(memory.window(start=99)), [99, 99])
+        self.assertEqual(times(memory.window()), times(memory))
+        self.assertEqual(memory.window(0, 74), [])
+        self.assertEqual(memory.window(82, 81), [])
+
+    def test_summaries_outlive_eviction(self):
+        memory = AffectiveMemory(capacity=2)
+        memory.append(event("offer", 1), 1.0, value=0.2, emotions=["happy"])
+        memory.append(event("offer", 2), 2.0, value=0.6, emotions=["happy", "sad"])
+        memory.append(event("response", 1), 3.0, emotions=["sad"])
+        memory.append(event("response", 2), 4.0)
+        self.assertEqual(memory.by_functor("offer", 1), [])
+        self.assertEqual(
+            memory.summary("offer", 1),
+            {"count": 2, "first": 1.0, "last": 2.0, "mean_value": 0.4},
+        )
+        self.assertEqual(
+            memory.summary(emotion="sad"),
+            {"count": 2, "first": 2.0, "last": 3.0, "mean_value": 0.6},
+        )
+        summary = memory.summary()
+        self.assertEqual((summary["records"], summary["evicted"]), (2, 2))
+        self.assertEqual(summary["functors"][("response", 1)]["mean_value"], None)
+
+        memory.clear()
+        self.assertEqual(memory.summary("offer", 1)["count"], 2)
+        memory.clear(summaries=True)
+        self.assertIsNone(memory.summary("offer", 1))
+        self.assertEqual(memory.summary()["evicted"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
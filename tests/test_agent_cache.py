@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+
+"""Tests for `pygenia.agent_cache`."""
+
+
+import os
+import pickle
+import tempfile
+import unittest
+from unittest import mock
+
+import agentspeak
+
+import pygenia.affective_agent  # noqa: F401
+import pygenia.agent_cache
+from pygenia.agent_cache import AgentCache
+
+from tests.helpers import write_source
+
+MAIN = """
+{ include("included.asl") }
+!start.
++!start <- ?foo(X); .print(X).
+"""
+
+
+def beliefs(ast_agent):
+    return [str(belief) for belief in ast_agent.beliefs]
+
+
+class TestAgentCache(unittest.TestCase):
+    """Tests of the cache of parsed agents."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = write_source(self.directory.name, "main", MAIN)
+        write_source(self.directory.name, "included", "foo(1).")
+
+    def parse(self, cache):
+        log = agentspeak.Log(pygenia.agent_cache.LOGGER, 3)
+        with open(self.path) as source:
+            return cache.parse(source, log)
+
+    def test_hits_and_misses(self):
+        cache = AgentCache()
+        first = self.parse(cache)
+        second = self.parse(cache)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertEqual(beliefs(first), ["foo(1)"])
+        self.assertEqual(beliefs(second), ["foo(1)"])
+        # Every lookup returns a new copy of the ast
+        self.assertIsNot(first, second)
+
+        write_source(self.directory.name, "main", MAIN + "bar.")
+        self.assertEqual(beliefs(self.parse(cache)), ["foo(1)", "bar"])
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+    def test_edited_include(self):
+        cache = AgentCache()
+        self.parse(cache)
+        write_source(self.directory.name, "included", "foo(2).")
+        self.assertEqual(beliefs(self.parse(cache)), ["foo(2)"])
+        self.assertEqual((cache.hits, cache.misses), (0, 2))
+
+    def test_removed_include(self):
+        cache = AgentCache()
+        self.parse(cache)
+        os.remove(os.path.join(self.directory.name, "included.asl"))
+        with self.assertRaises(agentspeak.AggregatedError):
+            self.parse(cache)
+
+    def test_disk(self):
+        with tempfile.TemporaryDirectory() as cache_directory:
+            self.parse(AgentCache(cache_directory))
+
+            # A later process reuses the entry
+            cache = AgentCache(cache_directory)
+            self.assertEqual(beliefs(self.parse(cache)), ["foo(1)"])
+            self.assertEqual((cache.hits, cache.misses), (1, 0))
+
+            # Until the included file is edited
+            write_source(self.directory.name, "included", "foo(2).")
+            cache = AgentCache(cache_directory)
+            self.assertEqual(beliefs(self.parse(cache)), ["foo(2)"])
+            self.assertEqual((cache.hits, cache.misses), (0, 1))
+
+    def test_disk_hit_decodes_once(self):
+        with tempfile.TemporaryDirectory() as cache_directory:
+            self.parse(AgentCache(cache_directory))
+            cache = AgentCache(cache_directory)
+            with mock.patch.object(pickle, "loads", wraps=pickle.loads) as loads:
+                self.assertEqual(beliefs(self.parse(cache)), ["foo(1)"])
+            # The entry, then the ast it holds
+            self.assertEqual(loads.call_count, 2)
+
+    def test_unreadable_entry(self):
+        with tempfile.TemporaryDirectory() as cache_directory:
+            cache = AgentCache(cache_directory)
+            self.parse(cache)
+            (key,) = cache.entries
+            with open(cache._path(key), "wb") as entry_file:
+                entry_file.write(b"not a pickle")
+            cache = AgentCache(cache_directory)
+            with self.assertLogs(pygenia.agent_cache.LOGGER, "WARNING"):
+                self.assertEqual(beliefs(self.parse(cache)), ["foo(1)"])
+            self.assertEqual((cache.hits, cache.misses), (0, 1))
+
+    def test_disk_is_opt_in(self):
+        with mock.patch.dict(os.environ):
+            os.environ.pop("PYGENIA_CACHE_DIR", None)
+            self.assertIsNone(pygenia.agent_cache.default_directory())
+            os.environ["PYGENIA_CACHE_DIR"] = self.directory.name
+            self.assertEqual(
+                pygenia.agent_cache.default_directory(), self.directory.name
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
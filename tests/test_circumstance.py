@@ -0,0 +1,252 @@
+#!/usr/bin/env python
+
+"""Tests for `pygenia.cognitive_engine.circumstance`."""
+
+
+import collections
+import unittest
+import weakref
+
+import agentspeak
+from agentspeak.runtime import Event, Intention, Waiter
+
+import pygenia.affective_agent  # noqa: F401
+from pygenia.cognitive_engine.circumstance import (
+    BoundedQueue,
+    Circumstance,
+    OverflowPolicy,
+    event_key,
+)
+
+from tests.helpers import make_environment, run_output
+
+
+def belief_event(functor, *args):
+    return Event(
+        agentspeak.Trigger.addition,
+        agentspeak.GoalType.belief,
+        agentspeak.Literal(functor, args),
+    )
+
+
+class TestBoundedQueue(unittest.TestCase):
+    """Overflow policies of the bounded queues."""
+
+    def test_unbounded(self):
+        queue = BoundedQueue()
+        for i in range(100):
+            queue.append(i)
+        self.assertEqual(len(queue), 100)
+        self.assertEqual(queue.popleft(), 0)
+        self.assertEqual(queue.pop(), 99)
+
+    def test_drop_oldest(self):
+        queue = BoundedQueue(3)
+        for i in range(5):
+            queue.append(i)
+        self.assertEqual(list(queue), [2, 3, 4])
+        self.assertEqual(
+            queue.stats(),
+            {
+                "depth": 3,
+                "capacity": 3,
+                "max_depth": 3,
+                "held": 0,
+                "dropped": 2,
+                "coalesced": 0,
+            },
+        )
+
+    def test_coalesce(self):
+        queue = BoundedQueue(2, "coalesce", key=event_key)
+        queue.append(belief_event("a", 1))
+        queue.append(belief_event("b", 1))
+        queue.append(belief_event("a", 2))
+        self.assertEqual([str(event.head) for event in queue], ["b(1)", "a(2)"])
+        self.assertEqual(queue.coalesced, 1)
+
+        # Without an event of the same key, the oldest one is dropped
+        queue.append(belief_event("c", 1))
+        self.assertEqual([str(event.head) for event in queue], ["a(2)", "c(1)"])
+        self.assertEqual(queue.dropped, 1)
+
+    def test_coalesce_goals(self):
+        # Goals are never coalesced
+        goal = Event(
+            agentspeak.Trigger.addition,
+            agentspeak.GoalType.achievement,
+            agentspeak.Literal("a", (1,)),
+        )
+        self.assertIsNone(event_key(goal))
+        queue = BoundedQueue(1, OverflowPolicy.coalesce, key=event_key)
+        queue.append(goal)
+        queue.append(belief_event("a", 2))
+        self.assertEqual([str(event.head) for event in queue], ["a(2)"])
+        self.assertEqual((queue.dropped, queue.coalesced), (1, 0))
+
+    def test_block(self):
+        queue = BoundedQueue(2, "block", name="test queue")
+        for i in range(5):
+            queue.append(i)
+        # Nothing is lost: the items over the capacity are held back
+        self.assertEqual(list(queue), [0, 1])
+        self.assertEqual(list(queue.held), [2, 3, 4])
+        self.assertEqual(queue.stats()["held"], 3)
+
+        # and enter the queue, in order, as items leave it
+        self.assertEqual(queue.popleft(), 0)
+        self.assertEqual(list(queue), [1, 2])
+        queue.append(5)
+        self.assertEqual(list(queue.held), [3, 4, 5])
+        self.assertEqual([queue.popleft() for _ in range(5)], [1, 2, 3, 4, 5])
+        self.assertFalse(queue.held)
+        self.assertEqual((queue.max_depth, queue.dropped), (2, 0))
+
+    def test_block_on_full(self):
+        # on_full may make room
+        queue = BoundedQueue(2, "block")
+        queue.append(1)
+        queue.append(2)
+        queue.on_full = lambda full_queue: full_queue.popleft()
+        queue.append(3)
+        self.assertEqual(list(queue), [2, 3])
+        self.assertFalse(queue.held)
+        self.assertEqual(queue.dropped, 0)
+
+    def test_configure(self):
+        queue = BoundedQueue()
+        for i in range(5):
+            queue.append(i)
+        queue.configure(2)
+        self.assertEqual(list(queue), [3, 4])
+        self.assertEqual(queue.dropped, 3)
+
+        # A larger capacity lets the held items in
+        queue.configure(2, "block")
+        queue.append(5)
+        queue.configure(3, "block")
+        self.assertEqual(list(queue), [3, 4, 5])
+        self.assertFalse(queue.held)
+
+        # and a smaller one holds the newest items back
+        queue.configure(1, "block")
+        self.assertEqual((list(queue), list(queue.held)), ([3], [4, 5]))
+        queue.configure(2)
+        self.assertEqual((list(queue), list(queue.held)), ([4, 5], []))
+        self.assertEqual(queue.dropped, 4)
+        with self.assertRaises(ValueError):
+            queue.configure(0)
+        with self.assertRaises(ValueError):
+            queue.configure(2, "unknown")
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def time(self):
+        return self.now
+
+
+class TestScheduling(unittest.TestCase):
+    """Intentions run in round robin, and the ones that wait are skipped."""
+
+    def setUp(self):
+        self.env = Clock()
+        self.circumstance = Circumstance()
+        self.deadlines = []
+        self.circumstance.on_timer = self.deadlines.append
+        self.stacks = {}
+        for name in "abc":
+            self.stacks[name] = collections.deque([Intention()])
+            self.circumstance.add_intention(self.stacks[name])
+
+    def selected(self, n) -> list:
+        names = {id(stack): name for name, stack in self.stacks.items()}
+        selected = []
+        for _ in range(n):
+            intention_stack = self.circumstance.select_intention(self.env)
+            selected.append(names.get(id(intention_stack)))
+        return selected
+
+    def wait(self, name, until=None):
+        intention = self.stacks[name][-1]
+        intention.waiter = Waiter(belief_event("never"), until)
+        return intention
+
+    def test_round_robin(self):
+        self.assertEqual(self.selected(7), list("abcabca"))
+        self.circumstance.delete_intention(self.stacks["b"])
+        self.assertEqual(self.selected(4), list("caca"))
+
+    def test_wake(self):
+        intention = self.wait("b")
+        self.assertEqual(self.selected(4), list("acac"))
+        self.assertTrue(self.circumstance.is_blocked(intention))
+        self.assertFalse(self.circumstance.is_blocked(Intention()))
+        self.assertIsNone(self.circumstance.next_deadline())
+
+        intention.waiter = None
+        self.circumstance.resume_intention(intention)
+        self.assertFalse(self.circumstance.is_blocked(intention))
+        # A woken stack is queued after the runnable ones
+        self.assertEqual(self.selected(3), list("acb"))
+
+        # Every intention waits
+        for name in "abc":
+            self.wait(name)
+        self.assertEqual(self.selected(1), [None])
+        self.assertFalse(self.circumstance.has_runnable_intention(self.env))
+
+    def test_timer(self):
+        intention = self.wait("b", until=5.0)
+        self.assertEqual(self.selected(2), list("ac"))
+        self.assertEqual(self.deadlines, [5.0])
+        self.assertEqual(self.circumstance.next_deadline(), 5.0)
+
+        self.env.now = 5.0
+        self.assertEqual(self.selected(2), list("ac"))
+        self.env.now = 6.0
+        self.assertEqual(self.selected(3), list("acb"))
+        self.assertIsNone(intention.waiter)
+        self.assertIsNone(self.circumstance.next_deadline())
+
+        # A deadline of an intention woken before it is dropped
+        intention = self.wait("a", until=10.0)
+        self.assertEqual(self.selected(2), list("cb"))
+        intention.waiter = None
+        self.circumstance.resume_intention(intention)
+        self.assertIsNone(self.circumstance.next_deadline())
+
+    def test_blocked_intention_is_kept(self):
+        intention = self.wait("b")
+        self.selected(2)
+        # The stack drops its intention while it waits: the id of the
+        # intention can not be reused by a new one while it is blocked
+        self.stacks["b"].pop()
+        reference = weakref.ref(intention)
+        del intention
+        self.assertIsNotNone(reference())
+        self.assertTrue(self.circumstance.is_blocked(reference()))
+
+        self.circumstance.set_intentions(collections.deque())
+        self.assertIsNone(reference())
+
+    def test_unachieve(self):
+        source = """
+        !start.
+        !stop.
+        +!start <- .wait("+never", 100000); .print(never).
+        +!stop <- .print(stop); .send(agent, unachieve, start).
+        """
+        env = make_environment({"agent": source})
+        env.enable_virtual_time()
+        self.assertEqual(run_output(env), ["agent stop"])
+        circumstance = env.agents["agent"].circumstance
+        self.assertEqual(len(circumstance.get_intentions()), 0)
+        self.assertIsNone(circumstance.next_deadline())
+        self.assertFalse(circumstance.has_runnable_intention(env))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+
+"""Tests for `pygenia.environment`."""
+
+
+import unittest
+import unittest.mock
+
+import agentspeak.runtime
+
+import pygenia.affective_agent
+import pygenia.environment
+
+from tests.helpers import build_agents, run_output
+
+
+class TestDeadlines(unittest.TestCase):
+    """The environment sleeps until the earliest deadline of any agent."""
+
+    def test_mixed_agents(self):
+        env = pygenia.environment.Environment()
+        env.enable_virtual_time()
+        build_agents(
+            env,
+            "!start. +!start <- .wait(2000); .print(plain).",
+            name="plain",
+            agent_cls=agentspeak.runtime.Agent,
+        )
+        build_agents(env, "!start. +!start <- .wait(1000); .print(affective).", n=3)
+        # Affective agents report their deadlines, they are never asked for them
+        with unittest.mock.patch.object(
+            pygenia.affective_agent.AffectiveAgent,
+            "shortest_deadline",
+            side_effect=AssertionError,
+        ):
+            output = run_output(env)
+        self.assertEqual(
+            output,
+            ["agent affective", "agent1 affective", "agent2 affective", "plain plain"],
+        )
+        self.assertEqual(env._polled_agents, [env.agents["plain"]])
+        self.assertGreater(env.clock, 2.0)
+        self.assertIsNone(env.next_deadline())
+
+
+if __name__ == "__main__":
+    unittest.main()
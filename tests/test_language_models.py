@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+
+"""Tests for `pygenia.language_models`."""
+
+
+import glob
+import math
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import pygenia
+from pygenia.language_models import read_columns, read_table
+
+try:
+    import pandas
+except ImportError:
+    pandas = None
+
+LANGUAGE_MODELS = sorted(
+    glob.glob(
+        os.path.join(os.path.dirname(pygenia.__file__), "**", "*.csv"), recursive=True
+    )
+)
+
+
+class TestReadTable(unittest.TestCase):
+    """Language-model tables are read as pandas.read_csv reads them."""
+
+    def read(self, text):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "table.csv")
+            with open(path, "w") as csv_file:
+                csv_file.write(text)
+            return read_table(path)
+
+    def test_shipped_language_models(self):
+        self.assertTrue(LANGUAGE_MODELS)
+        for path in LANGUAGE_MODELS:
+            with self.subTest(path=os.path.relpath(path)):
+                table = read_table(path)
+                self.assertTrue(len(table))
+                for column in table.columns:
+                    if column == "label":
+                        self.assertEqual(table[column].dtype, object)
+                    else:
+                        self.assertEqual(table[column].dtype.kind, "f")
+                        self.assertFalse(table[column].flags.writeable)
+
+    @unittest.skipIf(pandas is None, "pandas is not installed")
+    def test_same_as_pandas(self):
+        for path in LANGUAGE_MODELS:
+            with self.subTest(path=os.path.relpath(path)):
+                table = read_table(path)
+                frame = pandas.read_csv(path)
+                self.assertEqual(table.columns, tuple(frame.columns))
+                for column in table.columns:
+                    expected = frame[column].to_numpy()
+                    if expected.dtype.kind in "biuf":
+                        self.assertEqual(table[column].dtype, expected.dtype)
+                        np.testing.assert_array_equal(table[column], expected)
+                    else:
+                        self.assertEqual(list(table[column]), list(expected))
+
+    def test_read_columns(self):
+        for path in LANGUAGE_MODELS:
+            with self.subTest(path=os.path.relpath(path)):
+                table = read_table(path)
+                columns = read_columns(path)
+                self.assertEqual(tuple(columns), table.columns)
+                for column in table.columns:
+                    self.assertEqual(columns[column], tuple(table[column].tolist()))
+
+    def test_types(self):
+        table = self.read("i,f,b,s\n1,0.5,True,a\n2,1,false,b\n")
+        self.assertEqual(table["i"].dtype.kind, "i")
+        self.assertEqual(table["f"].dtype.kind, "f")
+        self.assertEqual(table["b"].dtype.kind, "b")
+        self.assertEqual(list(table["s"]), ["a", "b"])
+
+    def test_missing_cells(self):
+        table = self.read("i,f,s,e\n1,,a,\n,2.5,,NA\n3,NaN,c,\n")
+        self.assertEqual(table["i"].dtype.kind, "f")
+        np.testing.assert_array_equal(table["i"], [1.0, math.nan, 3.0])
+        self.assertEqual(table["f"].dtype.kind, "f")
+        np.testing.assert_array_equal(table["f"], [math.nan, 2.5, math.nan])
+        self.assertEqual(table["s"][0], "a")
+        self.assertTrue(math.isnan(table["s"][1]))
+        self.assertEqual(table["e"].dtype.kind, "f")
+        self.assertTrue(np.isnan(table["e"]).all())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+
+"""Tests for `pygenia.emotion_models.population`."""
+
+
+import unittest
+
+import pygenia.affective_agent  # noqa: F401
+from pygenia.emotion_models.pad import PAD
+from pygenia.emotion_models.population import PopulationStore
+
+from tests.helpers import load_example, normalize, run_output
+
+
+def make_pad(p, a, d):
+    pad = PAD()
+    pad.init_parameters()
+    pad.setP(p)
+    pad.setA(a)
+    pad.setD(d)
+    return pad
+
+
+class TestPopulationStore(unittest.TestCase):
+    """Moods in a store update as moods outside it."""
+
+    def setUp(self):
+        self.emotions = [make_pad(0.8, 0.6, 0.1), make_pad(-0.4, 0.9, -0.7)]
+
+    def updated(self, mood):
+        for emotion in self.emotions:
+            mood.update_affective_state(emotion)
+
+    def test_step(self):
+        plain = [make_pad(0.1 * i, -0.1 * i, 0.0) for i in range(5)]
+        store = PopulationStore(capacity=2)
+        bound = [mood.clone() for mood in plain]
+        for mood in bound:
+            mood.bind_population(store)
+        for mood in plain + bound:
+            self.updated(mood)
+
+        self.assertTrue(store.has_pending())
+        self.assertEqual(store.step(), len(bound))
+        self.assertFalse(store.has_pending())
+        for plain_mood, bound_mood in zip(plain, bound):
+            self.assertEqual(plain_mood.get_values(), bound_mood.get_values())
+            self.assertEqual(
+                plain_mood.get_affective_labels(), bound_mood.get_affective_labels()
+            )
+
+    def test_read_before_step(self):
+        plain = make_pad(0.2, 0.2, 0.0)
+        store = PopulationStore()
+        bound = plain.clone()
+        bound.bind_population(store)
+        self.updated(plain)
+        self.updated(bound)
+
+        # Reading the mood applies its queued emotions
+        self.assertEqual(bound.get_affective_labels(), plain.get_affective_labels())
+        self.assertEqual(bound.get_values(), plain.get_values())
+        self.assertFalse(store.has_pending())
+        self.assertEqual(store.step(), 0)
+
+    def test_examples(self):
+        for path in (
+            "desirability/test.py",
+            "affect_categories/env_affect_categories.py",
+            "ultimatum_game/environment.py",
+        ):
+            for scheduled in (False, True):
+                with self.subTest(example=path, scheduled=scheduled):
+                    expected = normalize(
+                        run_output(load_example(path), scheduled=scheduled)
+                    )
+                    env = load_example(path)
+                    env.enable_population()
+                    self.assertEqual(
+                        normalize(run_output(env, scheduled=scheduled)), expected
+                    )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -5,7 +5,7 @@
 
 import unittest
 
-from pygenia import pygenia
+import pygenia  # noqa: F401
 
 
 class TestPygenia(unittest.TestCase):
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+
+"""Tests for the run modes of `pygenia.environment.Environment`."""
+
+
+import unittest
+
+import agentspeak.runtime
+
+from tests.helpers import load_example, make_environment, normalize, run_output
+
+PING = """
+!start.
++!start <- .print("start"); .send(pong, achieve, ping(1)).
++!pong(N) : N < 3 <- .print("pong", N); .send(pong, achieve, ping(N + 1)).
++!pong(N) <- .print("done", N).
+"""
+
+PONG = """
++!ping(N) <- .print("ping", N); .wait(50); .send(ping, achieve, pong(N)).
+"""
+
+EXPECTED = [
+    "ping start",
+    "pong ping 1",
+    "ping pong 1",
+    "pong ping 2",
+    "ping pong 2",
+    "pong ping 3",
+    "ping done 3",
+]
+
+
+class TestRunModes(unittest.TestCase):
+    """Plain, scheduled and virtual-time runs give the same output."""
+
+    def run_ping_pong(self, virtual=False, **kwargs):
+        env = make_environment({"ping": PING, "pong": PONG})
+        if virtual:
+            env.enable_virtual_time()
+        return env, run_output(env, **kwargs)
+
+    def test_plain(self):
+        _, output = self.run_ping_pong()
+        self.assertEqual(output, EXPECTED)
+
+    def test_scheduled(self):
+        _, output = self.run_ping_pong(scheduled=True)
+        self.assertEqual(output, EXPECTED)
+
+    def test_virtual(self):
+        for scheduled in (False, True):
+            with self.subTest(scheduled=scheduled):
+                env, output = self.run_ping_pong(virtual=True, scheduled=scheduled)
+                self.assertEqual(output, EXPECTED)
+                # Three waits of 50 ms, on the simulated clock
+                self.assertAlmostEqual(env.time(), 0.15)
+
+    def test_wait_of_plain_agent(self):
+        env = make_environment(
+            {"sleeper": '!start.\n+!start <- .print("a"); .wait(20); .print("b").'},
+            agent_cls=agentspeak.runtime.Agent,
+        )
+        self.assertEqual(run_output(env), ["sleeper a", "sleeper b"])
+
+    def test_examples(self):
+        for path in (
+            "desirability/test.py",
+            "affect_categories/env_affect_categories.py",
+            "ultimatum_game/environment.py",
+        ):
+            with self.subTest(example=path):
+                plain = normalize(run_output(load_example(path)))
+                scheduled = normalize(run_output(load_example(path), scheduled=True))
+                self.assertTrue(plain)
+                self.assertEqual(plain, scheduled)
+
+    def test_examples_virtual(self):
+        outputs = []
+        for scheduled in (False, True):
+            env = load_example("prisoner_dilemma/environment.py")
+            env.enable_virtual_time()
+            outputs.append(normalize(run_output(env, scheduled=scheduled)))
+        self.assertTrue(outputs[0])
+        self.assertEqual(outputs[0], outputs[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
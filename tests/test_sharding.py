@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+
+"""Tests for `pygenia.sharding`."""
+
+
+import multiprocessing
+import unittest
+
+import pygenia.affective_agent  # noqa: F401
+import pygenia.sharding
+
+from tests.helpers import build_agents, make_environment, run_output
+
+# x keeps working after its first message to y, so y becomes idle while x
+# is busy
+X = """
++go <- .send(y, tell, m2); %s; .send(y, tell, m4).
++!work <- +busy; -busy.
+""" % "; ".join(["!work"] * 300)
+
+Y = """
++m2 <- .print("m2").
++m4 <- .print("m4").
+"""
+
+Z = """
+!start.
++!start <- .send(x, tell, go).
+"""
+
+
+def received(agent):
+    return sorted(
+        str(belief)
+        for beliefs in agent.beliefs.values()
+        for belief in beliefs
+        if belief.functor != "busy"
+    )
+
+
+@unittest.skipUnless(
+    "fork" in multiprocessing.get_all_start_methods(), "sharding needs fork"
+)
+class TestShardedEnvironment(unittest.TestCase):
+    """The shards only stop once every message has been delivered."""
+
+    def make_environment(self):
+        env = pygenia.sharding.ShardedEnvironment(workers=3)
+        for name, source in (("x", X), ("y", Y), ("z", Z)):
+            build_agents(env, source, name=name)
+        env.assign_shards({"x": 0, "y": 1, "z": 2})
+        return env
+
+    def test_busy_sender(self):
+        expected = {
+            "x": ["go[source(z)]"],
+            "y": ["m2[source(x)]", "m4[source(x)]"],
+            "z": [],
+        }
+        for _ in range(3):
+            env = self.make_environment()
+            self.assertEqual(env.run(collect=received), expected)
+            self.assertEqual(
+                env.shard_stats,
+                {
+                    0: {"sent": 2, "received": 1},
+                    1: {"sent": 0, "received": 2},
+                    2: {"sent": 1, "received": 0},
+                },
+            )
+
+    def test_update_agents(self):
+        env = self.make_environment()
+        mood = env.agents["y"].emotional_engine.affective_info.get_mood()
+        env.run()
+        self.assertEqual(received(env.agents["y"]), ["m2[source(x)]", "m4[source(x)]"])
+        self.assertEqual(received(env.agents["x"]), ["go[source(z)]"])
+        self.assertIsNot(
+            env.agents["y"].emotional_engine.affective_info.get_mood(), mood
+        )
+
+        env = self.make_environment()
+        env.run(update_agents=False)
+        self.assertEqual(received(env.agents["y"]), [])
+
+    def test_same_as_scheduled(self):
+        env = make_environment({"x": X, "y": Y, "z": Z})
+        self.assertEqual(run_output(env, scheduled=True), ["y m2", "y m4"])
+
+
+if __name__ == "__main__":
+    unittest.main()
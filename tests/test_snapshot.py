@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+
+"""Tests for `pygenia.snapshot`."""
+
+
+import contextlib
+import inspect
+import io
+import os
+import tempfile
+import unittest
+
+import pygenia.affective_agent  # noqa: F401
+import pygenia.environment
+import pygenia.snapshot
+
+from tests.helpers import load_example, make_environment, normalize, run_output
+
+# The belief test of the if stays on the query stack while its body waits
+SOURCE = """
+!start.
+foo(1).
++!start <- .print(a); if (foo(Y)) { .print(b); .wait(10); .print(Y) }; .print(c).
+"""
+
+
+def run_steps(env, steps) -> list:
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        for _ in range(steps):
+            for agent in list(env.agents.values()):
+                agent.affective_step()
+                agent.rational_step()
+    return output.getvalue().splitlines()
+
+
+def belief_tests(agent) -> list:
+    return [
+        inspect.getgeneratorstate(query)
+        for intention_stack in agent.circumstance.get_intentions()
+        for intention in intention_stack
+        for query in intention.query_stack
+        if query.__qualname__ == "TermQuery.execute"
+    ]
+
+
+class TestSnapshot(unittest.TestCase):
+    """A restored environment runs as the environment it was saved from."""
+
+    def test_pending_belief_test(self):
+        expected = ["agent a", "agent b", "agent 1", "agent c"]
+        self.assertEqual(run_output(make_environment({"agent": SOURCE})), expected)
+
+        states = set()
+        for steps in range(20):
+            with self.subTest(steps=steps):
+                env = make_environment({"agent": SOURCE})
+                output = run_steps(env, steps)
+                states.update(belief_tests(env.agents["agent"]))
+                restored = pygenia.snapshot.loads(pygenia.snapshot.dumps(env))
+                self.assertEqual(output + run_output(restored), expected)
+        # Saved both before and after the belief test yields
+        self.assertEqual(states, {inspect.GEN_CREATED, inspect.GEN_SUSPENDED})
+
+    def test_example(self):
+        env = load_example("ultimatum_game/environment.py")
+        run_steps(env, 30)
+        data = env.snapshot()
+        expected = normalize(run_output(env))
+        self.assertTrue(expected)
+        # Every restore is an independent copy
+        for _ in range(2):
+            restored = pygenia.environment.Environment.restore(data)
+            self.assertEqual(normalize(run_output(restored)), expected)
+
+    def test_file(self):
+        env = make_environment({"agent": SOURCE})
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "agents.snapshot")
+            env.snapshot(path)
+            restored = pygenia.environment.Environment.restore(path)
+        self.assertEqual(
+            run_output(restored), ["agent a", "agent b", "agent 1", "agent c"]
+        )
+
+    def test_long_plan(self):
+        # Far more instructions than the recursion limit
+        body = "; ".join("+b(%d)" % i for i in range(5000))
+        env = make_environment(
+            {"agent": "!start. +!start <- %s; .count(b(_), N); .print(N)." % body}
+        )
+        run_steps(env, 1)
+        restored = pygenia.snapshot.loads(pygenia.snapshot.dumps(env))
+        self.assertEqual(run_output(restored), ["agent 5000"])
+
+    def test_invalid(self):
+        with self.assertRaises(pygenia.snapshot.SnapshotError):
+            pygenia.snapshot.loads(b"not a snapshot")
+        data = pygenia.snapshot.dumps(make_environment({"agent": SOURCE}))
+        position = len(pygenia.snapshot.MAGIC)
+        newer = bytes([pygenia.snapshot.VERSION + 1])
+        with self.assertRaisesRegex(pygenia.snapshot.SnapshotError, "version"):
+            pygenia.snapshot.loads(data[:position] + newer + data[position + 1 :])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+
+"""Tests for `pygenia.sweep`."""
+
+
+import random
+import unittest
+
+import pygenia.affective_agent  # noqa: F401
+from pygenia.sweep import SweepRunner, apply_parameters, product
+
+from tests.helpers import load_example, make_environment
+
+LOOP = """
+!loop.
++!loop <- +x; -x; !loop.
+"""
+
+DONE = """
+!start.
++!start <- .print(done).
+"""
+
+
+def draws(env) -> list:
+    return [random.random() for _ in range(3)]
+
+
+class TestSweep(unittest.TestCase):
+    """Runs of a sweep are isolated, reproducible and stopped on time."""
+
+    def test_product(self):
+        self.assertEqual(
+            product(empathic_level=[0.2, 0.8], rationality_level=[0.0]),
+            [
+                {"empathic_level": 0.2, "rationality_level": 0.0},
+                {"empathic_level": 0.8, "rationality_level": 0.0},
+            ],
+        )
+        self.assertEqual(product(), [{}])
+
+    def test_apply_parameters(self):
+        env = make_environment({"a": DONE, "b": DONE})
+        rationality_level = env.agents["a"].personality.get_rationality_level()
+        apply_parameters(
+            env, {"*": {"empathic_level": 0.3}, "b": {"rationality_level": 0.9}}
+        )
+        for agent in env.agents.values():
+            self.assertEqual(agent.personality.get_empathic_level(), 0.3)
+        self.assertEqual(
+            env.agents["a"].personality.get_rationality_level(), rationality_level
+        )
+        self.assertEqual(env.agents["b"].personality.get_rationality_level(), 0.9)
+
+        with self.assertRaises(ValueError):
+            apply_parameters(env, {"a": {"unknown": 1}})
+        with self.assertRaises(KeyError):
+            apply_parameters(env, {"c": {"empathic_level": 0.3}})
+
+    def test_timeout(self):
+        runner = SweepRunner(make_environment({"agent": LOOP}), workers=1)
+        # The worker of the first run is killed, the second run gets a new one
+        results = runner.run_all([{}, {}], timeout=0.2)
+        for result in results:
+            self.assertTrue(result.timed_out)
+            self.assertIsNone(result.value)
+            self.assertIn("timed out", result.error)
+            self.assertLess(result.seconds, 5)
+
+        runner = SweepRunner(make_environment({"agent": DONE}), workers=1)
+        (result,) = runner.run_all([{}], timeout=30)
+        self.assertFalse(result.timed_out)
+        self.assertEqual(list(result.value), ["agent"])
+
+    def test_error(self):
+        env = make_environment({"agent": DONE})
+        runner = SweepRunner(env, workers=1, output=True)
+        ok, failed = runner.run_all([{}, {"*": {"unknown": 1}}])
+        self.assertEqual(list(ok.value), ["agent"])
+        self.assertIsNone(ok.error)
+        self.assertEqual(ok.output, "agent done\n")
+        self.assertFalse(failed.timed_out)
+        self.assertIn("ValueError", failed.error)
+
+    def test_seeds(self):
+        env = make_environment({"agent": DONE})
+        runner = SweepRunner(env, workers=1, collect=draws)
+        first = runner.run_all([{}, {}], seed=5)
+        self.assertEqual([result.seed for result in first], [5, 6])
+        random.seed(5)
+        self.assertEqual(first[0].value, draws(None))
+        self.assertNotEqual(first[0].value, first[1].value)
+
+        again = runner.run_all([{}, {}], seed=5)
+        self.assertEqual(
+            [result.value for result in again], [result.value for result in first]
+        )
+
+    def test_workers(self):
+        env = load_example("ultimatum_game/environment.py")
+        parameters = [{"*": values} for values in product(empathic_level=[0.1, 0.9])]
+        results = []
+        for workers in (1, 2):
+            runner = SweepRunner(env, workers=workers)
+            results.append(
+                [result.value for result in runner.run_all(parameters, seed=3)]
+            )
+        self.assertEqual(results[0], results[1])
+        self.assertNotEqual(results[0][0], results[0][1])
+        self.assertEqual(set(results[0][0]), {"proposer", "responder"})
+
+
+if __name__ == "__main__":
+    unittest.main()
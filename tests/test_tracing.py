@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+
+"""Tests for `pygenia.tracing`."""
+
+
+import math
+import os
+import tempfile
+import types
+import unittest
+
+import numpy as np
+
+import pygenia.affective_agent  # noqa: F401
+from pygenia.tracing import CAUSAL_ATTRIBUTIONS, COLUMNS, TraceRecorder, read_trace
+
+from tests.helpers import make_environment, run_output
+
+
+class Plan:
+    def __init__(self, name):
+        self._name = name
+
+    def name(self):
+        return self._name
+
+
+class Agent:
+    """An agent whose mood, appraisal variables and clock are set by the test."""
+
+    def __init__(self, name):
+        self.name = name
+        self.now = 0.0
+        self.env = types.SimpleNamespace(time=lambda: self.now)
+        self.values = (0.0, 0.0, 0.0)
+        self.labels = []
+        self.appraisal = {}
+        mood = types.SimpleNamespace(
+            get_values=lambda: self.values,
+            get_affective_labels=lambda: self.labels,
+        )
+        self.emotional_engine = types.SimpleNamespace(
+            affective_info=types.SimpleNamespace(
+                get_mood=lambda: mood,
+                get_appraisal_variables=lambda: self.appraisal,
+            )
+        )
+
+
+def rows(trace) -> list:
+    # The rows of a trace, with the codes replaced by the names
+    names = {
+        "agent": trace["agent_names"],
+        "labels": trace["label_names"],
+        "plan": trace["plan_names"],
+    }
+    return [
+        {
+            column: names[column][value] if value >= 0 else value
+            for column, value in zip(names, values)
+        }
+        for values in zip(*(trace[column].tolist() for column in names))
+    ]
+
+
+class TestTraceRecorder(unittest.TestCase):
+    """A recorder writes one row per recorded cycle."""
+
+    def setUp(self):
+        self.a = Agent("a")
+        self.b = Agent("b")
+        self.plans = [Plan("+!start"), Plan("+!go")]
+
+    def record(self, recorder, cycles=5):
+        for cycle in range(cycles):
+            self.a.now = self.b.now = float(cycle)
+            self.a.values = (cycle / 10, -cycle / 10, 0.5)
+            self.a.labels = ["happy"] if cycle % 2 else ["happy", "sad"]
+            self.a.appraisal = {"desirability": 0.25, "causal_attribution": "other"}
+            recorder.select_plan(self.a, self.plans[cycle % 2])
+            if cycle == 3:
+                recorder.select_plan(self.a, self.plans[0])
+            recorder.record(self.a)
+            recorder.record(self.b)
+
+    def assertTrace(self, trace, cycles=5):
+        self.assertEqual(
+            set(trace),
+            {column for column, _ in COLUMNS}
+            | {"agent_names", "label_names", "plan_names"},
+        )
+        for column, dtype in COLUMNS:
+            self.assertEqual(trace[column].dtype, dtype)
+        self.assertEqual(list(trace["agent_names"]), ["a", "b"])
+        self.assertEqual(list(trace["label_names"]), ["happy|sad", "", "happy"])
+        self.assertEqual(list(trace["plan_names"]), ["+!start", "+!go"])
+        self.assertEqual(
+            rows(trace),
+            [
+                row
+                for cycle in range(cycles)
+                for row in (
+                    {
+                        "agent": "a",
+                        "labels": "happy" if cycle % 2 else "happy|sad",
+                        "plan": "+!start" if cycle in (0, 2, 3, 4) else "+!go",
+                    },
+                    {"agent": "b", "labels": "", "plan": -1},
+                )
+            ],
+        )
+        a = trace["agent"] == 0
+        self.assertEqual(trace["tick"][a].tolist(), list(range(cycles)))
+        self.assertEqual(trace["time"][a].tolist(), [float(i) for i in range(cycles)])
+        np.testing.assert_allclose(
+            trace["pleasure"][a], [i / 10 for i in range(cycles)], rtol=1e-6
+        )
+        self.assertEqual(trace["dominance"][a].tolist(), [0.5] * cycles)
+        self.assertEqual(trace["desirability"][a].tolist(), [0.25] * cycles)
+        self.assertTrue(np.isnan(trace["likelihood"]).all())
+        self.assertEqual(
+            trace["causal_attribution"][a].tolist(),
+            [CAUSAL_ATTRIBUTIONS.index("other")] * cycles,
+        )
+        self.assertEqual(
+            trace["plans_selected"][a].tolist(),
+            [2 if i == 3 else 1 for i in range(cycles)],
+        )
+        self.assertEqual(trace["plans_selected"][~a].tolist(), [0] * cycles)
+
+    def test_in_memory(self):
+        recorder = TraceRecorder(chunk_size=4)
+        self.record(recorder)
+        self.assertEqual(recorder.rows, 10)
+        # Two full chunks, the last rows are still in the buffers
+        self.assertEqual([len(chunk["tick"]) for chunk in recorder.chunks], [4, 4])
+        self.assertTrace(recorder.to_columns())
+        recorder.close()
+        self.assertEqual([len(chunk["tick"]) for chunk in recorder.chunks], [4, 4, 2])
+        self.assertTrace(recorder.to_columns())
+
+    def test_files(self):
+        for compress in (True, False):
+            with tempfile.TemporaryDirectory() as path, self.subTest(compress=compress):
+                recorder = TraceRecorder(path, chunk_size=3, compress=compress)
+                self.record(recorder)
+                recorder.close()
+                self.assertEqual(
+                    sorted(os.listdir(path)),
+                    ["trace-%05d.npz" % i for i in range(4)],
+                )
+                self.assertEqual(recorder.chunks, [])
+                self.assertTrace(read_trace(path))
+                self.assertEqual(len(read_trace(path, name="other")["tick"]), 0)
+
+    def test_every(self):
+        recorder = TraceRecorder(every=2)
+        self.record(recorder)
+        trace = recorder.to_columns()
+        self.assertEqual(trace["tick"].tolist(), [0, 0, 2, 2, 4, 4])
+        self.assertEqual(recorder.skipped, 4)
+        # The plans of the skipped cycles are not carried over
+        self.assertEqual(trace["plans_selected"].tolist(), [1, 0, 1, 0, 1, 0])
+
+        with self.assertRaises(ValueError):
+            TraceRecorder(every=0)
+        with self.assertRaises(ValueError):
+            TraceRecorder(chunk_size=0)
+
+    def test_on_change(self):
+        recorder = TraceRecorder(on_change=True)
+        for values, plan in [
+            ((0.0, 0.0, 0.0), None),
+            ((0.0, 0.0, 0.0), None),
+            ((0.1, 0.0, 0.0), None),
+            ((0.1, 0.0, 0.0), self.plans[0]),
+            ((0.1, 0.0, 0.0), None),
+            ((0.1, 0.0, 0.0), None),
+        ]:
+            self.a.values = values
+            if plan is not None:
+                recorder.select_plan(self.a, plan)
+            recorder.record(self.a)
+        trace = recorder.to_columns()
+        self.assertEqual(trace["tick"].tolist(), [0, 2, 3, 4])
+        self.assertEqual(trace["plan"].tolist(), [-1, -1, 0, -1])
+        self.assertEqual(recorder.skipped, 2)
+
+    def test_environment(self):
+        env = make_environment(
+            {
+                "a": "!start. +!start <- +x; .print(done).",
+                "b": "!go. +!go <- .print(go).",
+            }
+        )
+        recorder = env.enable_tracing()
+        self.assertEqual(run_output(env), ["a done", "b go"])
+        self.assertIs(env.disable_tracing(), recorder)
+        trace = recorder.to_columns()
+        self.assertEqual(list(trace["agent_names"]), ["a", "b"])
+        self.assertEqual(list(trace["plan_names"]), ["+!start", "+!go"])
+        for code in range(len(trace["agent_names"])):
+            ticks = trace["tick"][trace["agent"] == code]
+            self.assertEqual(ticks.tolist(), list(range(len(ticks))))
+            self.assertEqual(trace["plans_selected"][trace["agent"] == code].sum(), 1)
+        self.assertFalse(math.isnan(trace["pleasure"][0]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+
+"""Tests for `pygenia.utils`."""
+
+
+import unittest
+
+import pygenia.affective_agent  # noqa: F401
+import pygenia.environment
+
+from tests.helpers import build_agents
+
+
+def compiled_concern(text):
+    env = pygenia.environment.Environment()
+    (agent,) = build_agents(env, text)
+    (concern,) = agent.concerns[("concern__", 1)]
+    return concern
+
+
+class TestConcernDependencyVisitor(unittest.TestCase):
+    """A concern depends on the beliefs its body reads."""
+
+    def test_belief(self):
+        concern = compiled_concern(
+            "concern__(X) :- me(3) & X = 0.4 | not you(_, 1) & X = 1."
+        )
+        self.assertEqual(concern.dependencies, {("me", 1), ("you", 2)})
+        self.assertTrue(concern.cacheable)
+
+    def test_rule(self):
+        concern = compiled_concern(
+            """
+            happy :- count(N) & N > 2 | happy(me).
+            happy(A) :- friend(A) & happy.
+            concern__(X) :- happy & X = 1 | X = 0.
+            """
+        )
+        # The rules are followed once, even when they call each other
+        self.assertEqual(
+            concern.dependencies,
+            {("happy", 0), ("count", 1), ("happy", 1), ("friend", 1)},
+        )
+        self.assertTrue(concern.cacheable)
+
+    def test_action_argument(self):
+        concern = compiled_concern("concern__(X) :- .count(offer(_), N) & X = N.")
+        self.assertEqual(concern.dependencies, {("offer", 1)})
+        # An action may not only read its arguments
+        self.assertFalse(concern.cacheable)
+
+    def test_variable_query(self):
+        concern = compiled_concern("concern__(X) :- B = me(3) & B & X = 1.")
+        self.assertIsNone(concern.dependencies)
+        self.assertFalse(concern.cacheable)
+
+
+if __name__ == "__main__":
+    unittest.main()